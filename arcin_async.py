@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+# asyncio facade over the blocking HID calls.
+#
+# Every operation runs on a bounded thread pool and has its own deadline; a
+# caller that times out or is cancelled gets control back right away. The
+# blocking call itself can't be interrupted (a wedged pywinusb transfer may
+# never return), so its device is marked busy until that call finishes: later
+# calls for the same serial fail fast with DeviceBusy instead of piling more
+# stuck threads onto the pool. Operations on one device are serialized, while
+# different devices run concurrently, so one stuck controller never holds up
+# the others. Loads of a device that is already being read share that read
+# instead of queueing another transfer.
+#
+#   async with AsyncArcin() as arcin:
+#       conf = await arcin.load("SIM00000", timeout=2)
+#       ok, message = await arcin.save("SIM00000", conf._replace(label="x"))
+
+import argparse
+import asyncio
+import sys
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from arcin_config import VID, PID, label_text
+from arcin_device import get_devices, with_device, save_to_device
+from arcin_device import read_config_report, parse_device
+from device_lock import DeviceLock, reboot_locked
+from device_pool import DevicePool
+from hid_metrics import METRICS
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 5.0
+# a save includes the read-compare, the write and the reboot request
+DEFAULT_SAVE_TIMEOUT = 10.0
+
+class DeviceBusy(IOError):
+    pass
+
+class DeviceTimeout(TimeoutError):
+    pass
+
+class AsyncArcin:
+
+    def __init__(self, vendor_id=VID, product_id=PID, transport=None,
+                 max_workers=DEFAULT_WORKERS, pool=None):
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.transport = transport
+        self.pool = pool if pool is not None else DevicePool(vendor_id, product_id, transport)
+        # a pool passed in is shared with its owner, who closes it
+        self.owns_pool = pool is None
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="arcin-hid")
+        # serial number => asyncio.Lock serializing calls to that device
+        self.locks = {}
+        # serial number => concurrent future its caller gave up on
+        self.wedged = {}
+        # serial number => device object from the last enumeration
+        self.known = {}
+        # serial number => task of the load in flight
+        self.loading = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # stuck calls can't be joined, so don't wait for them
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.owns_pool:
+            self.pool.close_all()
+
+    def is_busy(self, serial_number):
+        stuck = self.wedged.get(serial_number)
+        return stuck is not None and not stuck.done()
+
+    async def __run__(self, key, operation, timeout, func, *args):
+        if self.is_busy(key):
+            raise DeviceBusy(f"{key}: a previous {operation} is still blocked")
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        try:
+            # waiting behind another call on the same device counts too
+            await asyncio.wait_for(lock.acquire(), timeout)
+        except asyncio.TimeoutError:
+            METRICS.record(f"async_{operation}", loop.time() - start, "Timeout")
+            raise DeviceTimeout(f"{key}: {operation} timed out waiting for the device")
+
+        try:
+            if self.is_busy(key):
+                raise DeviceBusy(f"{key}: a previous {operation} is still blocked")
+            future = self.executor.submit(func, *args)
+            try:
+                remaining = max(0.0, timeout - (loop.time() - start))
+                result = await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                # a call that never started is simply dropped; one that is
+                # running keeps its worker until the device lets go
+                if not future.done():
+                    self.wedged[key] = future
+                if isinstance(e, asyncio.CancelledError):
+                    METRICS.record(f"async_{operation}", loop.time() - start, "Cancelled")
+                    raise
+                METRICS.record(f"async_{operation}", loop.time() - start, "Timeout")
+                raise DeviceTimeout(f"{key}: {operation} timed out after {timeout:.1f} s")
+            METRICS.record(f"async_{operation}", loop.time() - start)
+            return result
+        finally:
+            lock.release()
+
+    async def devices(self, timeout=DEFAULT_TIMEOUT):
+        devices = await self.__run__(
+            None, "enumerate", timeout,
+            get_devices, self.vendor_id, self.product_id, self.transport)
+        self.known = {d.serial_number: d for d in devices}
+        return devices
+
+    # use this device object for its serial instead of enumerating, e.g. one
+    # reported by a DeviceWatcher
+    def add_device(self, device):
+        self.known[device.serial_number] = device
+
+    async def __device__(self, serial_number, timeout):
+        device = self.known.get(serial_number)
+        if device is None:
+            await self.devices(timeout)
+            device = self.known.get(serial_number)
+        if device is None:
+            raise IOError(f"{serial_number}: device not connected")
+        return device
+
+    def __load__(self, device):
+        return parse_device(with_device(device, read_config_report, self.pool))
+
+    async def __load_once__(self, serial_number, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        device = await self.__device__(serial_number, timeout)
+        return await self.__run__(
+            serial_number, "load", max(0.0, deadline - loop.time()),
+            self.__load__, device)
+
+    def __load_done__(self, serial_number, task):
+        self.loading.pop(serial_number, None)
+        # every caller may have given up already; don't warn about the result
+        if not task.cancelled():
+            task.exception()
+
+    # Callers share the read in flight, but each waits only for its own
+    # timeout. The shared read gets at least DEFAULT_TIMEOUT, so a short first
+    # caller doesn't cut it short for the rest; should it still give up before
+    # a longer-waiting caller, that caller starts another read.
+    async def load(self, serial_number, timeout=DEFAULT_TIMEOUT):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            task = self.loading.get(serial_number)
+            if task is None:
+                task = asyncio.ensure_future(
+                    self.__load_once__(serial_number, max(remaining, DEFAULT_TIMEOUT)))
+                self.loading[serial_number] = task
+                task.add_done_callback(partial(self.__load_done__, serial_number))
+            else:
+                METRICS.record("async_load_coalesced", 0.0)
+            # a caller giving up must not cancel the read for the others
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), max(0.0, remaining))
+            except (asyncio.TimeoutError, DeviceTimeout):
+                if not task.done() or loop.time() >= deadline:
+                    raise DeviceTimeout(
+                        f"{serial_number}: load timed out after {timeout:.1f} s")
+
+    def __save__(self, device, conf, force):
+        with DeviceLock(device.serial_number):
+            return save_to_device(device, conf, self.pool, force)
+
+    # raises DeviceLocked while another process is writing to the device,
+    # like reboot() does
+    async def save(self, serial_number, conf, timeout=DEFAULT_SAVE_TIMEOUT, force=False):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        device = await self.__device__(serial_number, timeout)
+        try:
+            return await self.__run__(
+                serial_number, "save", max(0.0, deadline - loop.time()),
+                self.__save__, device, conf, force)
+        finally:
+            # a write reboots the device, so this device object is gone
+            self.known.pop(serial_number, None)
+
+    async def reboot(self, serial_number, timeout=DEFAULT_TIMEOUT):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        device = await self.__device__(serial_number, timeout)
+        try:
+            await self.__run__(
+                serial_number, "reboot", max(0.0, deadline - loop.time()),
+                reboot_locked, device, self.pool)
+        finally:
+            self.known.pop(serial_number, None)
+
+    # serial number => config, or the exception that call ended with
+    async def load_many(self, serial_numbers, timeout=DEFAULT_TIMEOUT):
+        results = await asyncio.gather(
+            *(self.load(s, timeout) for s in serial_numbers), return_exceptions=True)
+        return dict(zip(serial_numbers, results))
+
+async def load_all(args):
+    async with AsyncArcin(transport=args.transport, max_workers=args.workers) as arcin:
+        devices = await arcin.devices(args.timeout)
+        start = time.perf_counter()
+        results = await arcin.load_many([d.serial_number for d in devices], args.timeout)
+        elapsed = time.perf_counter() - start
+
+    failed = 0
+    for serial_number, result in results.items():
+        if isinstance(result, BaseException):
+            failed += 1
+            print(f"{serial_number}\tFAIL\t{result}")
+        else:
+            print(f"{serial_number}\tOK\t{label_text(result.label)}")
+    print(f"{len(results) - failed} ok, {failed} failed in {elapsed:.2f} s")
+    return 1 if failed else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Read the config of every attached controller concurrently.")
+    parser.add_argument("--transport", default=None)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+        help="deadline per device in seconds")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+    return asyncio.run(load_all(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
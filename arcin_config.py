@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+import struct
+from collections import namedtuple
+from dataclasses import dataclass
+# palette names come from palettes/*.css, see gradient.py
+from palette_data import RGB_TT_PALETTES
+
+Rgb = namedtuple("Rgb", "r g b")
+
+RgbConfig = namedtuple(
+    "RgbConfig",
+    "flags rgb1 darkness rgb2 rgb3 mode "
+    "num_leds idle_speed idle_brightness tt_speed mode_options")
+
+ARCIN_CONFIG_VALID_KEYCODES = 13
+ARCIN_RGB_MAX_DARKNESS = 255
+
+ARCIN_RGB_NUM_LEDS_MAX = 180
+ARCIN_RGB_NUM_LEDS_DEFAULT = 12
+
+# Infinitas controller VID/PID = 0x1ccf / 0x8048
+VID = 0x1ccf
+PID = 0x8048
+
+# display name => qe1_sens value; negative values divide the encoder
+# count, positive values multiply it
+SENS_OPTIONS = {
+    "1:1": 0,
+    "1:2": -2,
+    "1:3": -3,
+    "1:4": -4,
+    "1:6": -6,
+    "1:8": -8,
+    "1:11": -11,
+    "1:16": -16,
+    "2:1": 2,
+    "3:1": 3,
+    "4:1": 4,
+    "6:1": 6,
+    "8:1": 8,
+    "11:1": 11,
+    "16:1": 16
+}
+
+# Layout of the config struct, see definition of arcin_conf_t in the
+# firmware. Everything else (STRUCT_FMT_EX, ArcinConfig, the packers below)
+# is generated from this table. Reserved bytes have no field name.
+CONFIG_FIELDS = [
+    # (field name, struct format, C declaration)
+    ("label",               "12s", "uint8 label[12]"),
+    ("flags",               "L",   "uint32 flags"),
+    ("qe1_sens",            "b",   "int8 qe1_sens"),
+    ("qe2_sens",            "b",   "int8 qe2_sens"),
+    (None,                  "x",   "uint8 reserved (was: effector_mode)"),
+    ("debounce_ticks",      "B",   "uint8 debounce_ticks"),
+    ("keycodes",            "16s", "char keycodes[16]"),
+    ("remap_start_sel",     "B",   "uint8 remap_start_sel"),
+    ("remap_b8_b9",         "B",   "uint8 remap_b8_b9"),
+    (None,                  "2x",  "uint8 reserved[2]"),
+
+    ("rgb_flags",           "B",   "uint8 rgb_flags"),
+    ("rgb_red",             "B",   "uint8 red (primary)"),
+    ("rgb_green",           "B",   "uint8 green (primary)"),
+    ("rgb_blue",            "B",   "uint8 blue (primary)"),
+    ("rgb_darkness",        "B",   "uint8 rgb_darkness"),
+    ("rgb_red_2",           "B",   "uint8 red (secondary)"),
+    ("rgb_green_2",         "B",   "uint8 green (secondary)"),
+    ("rgb_blue_2",          "B",   "uint8 blue (secondary)"),
+    ("rgb_red_3",           "B",   "uint8 red (tertiary)"),
+    ("rgb_green_3",         "B",   "uint8 green (tertiary)"),
+    ("rgb_blue_3",          "B",   "uint8 blue (tertiary)"),
+    ("rgb_mode",            "B",   "uint8 rgb_mode"),
+    ("rgb_num_leds",        "B",   "uint8 rgb_num_leds"),
+    ("rgb_idle_speed",      "B",   "uint8 rgb_idle_speed"),
+    ("rgb_idle_brightness", "B",   "uint8 rgb_idle_brightness"),
+    ("rgb_tt_speed",        "b",   "int8 rgb_tt_speed"),
+    ("rgb_mode_options",    "B",   "uint8 rgb_mode_options"),
+    (None,                  "3x",  "uint8 reserved[3]"),
+]
+
+# little-endian with no implicit padding, so the layout (and "L" being
+# 4 bytes) is the same on every host as on the firmware side
+STRUCT_FMT_EX = "<" + "".join(fmt for _, fmt, _ in CONFIG_FIELDS)
+
+CONFIG_STRUCT = struct.Struct(STRUCT_FMT_EX)
+CONFIG_SIZE = CONFIG_STRUCT.size
+
+ArcinConfig = namedtuple(
+    "ArcinConfig", [name for name, _, _ in CONFIG_FIELDS if name is not None])
+
+# positions within ArcinConfig of the byte-string fields, which also accept
+# str (label from a text box) or a list of ints (keycodes)
+_BYTES_FIELDS = [
+    ArcinConfig._fields.index(name)
+    for name, fmt, _ in CONFIG_FIELDS
+    if name is not None and fmt.endswith("s")]
+
+ARCIN_CONFIG_FLAG_SEL_MULTI_TAP          = (1 << 0)
+ARCIN_CONFIG_FLAG_INVERT_QE1             = (1 << 1)
+# removed in favor of complete remapping of E buttons
+# ARCIN_CONFIG_FLAG_SWAP_8_9               = (1 << 2)
+ARCIN_CONFIG_FLAG_DIGITAL_TT_ENABLE      = (1 << 3)
+ARCIN_CONFIG_FLAG_DEBOUNCE               = (1 << 4)
+ARCIN_CONFIG_FLAG_250HZ_MODE             = (1 << 5)
+ARCIN_CONFIG_FLAG_ANALOG_TT_FORCE_ENABLE = (1 << 6)
+ARCIN_CONFIG_FLAG_KEYBOARD_ENABLE        = (1 << 7)
+ARCIN_CONFIG_FLAG_JOYINPUT_DISABLE       = (1 << 8)
+ARCIN_CONFIG_FLAG_MODE_SWITCHING_ENABLE  = (1 << 9)
+ARCIN_CONFIG_FLAG_LED_OFF                = (1 << 10)
+ARCIN_CONFIG_FLAG_TT_LED_REACTIVE        = (1 << 11)
+ARCIN_CONFIG_FLAG_TT_LED_HID             = (1 << 12)
+ARCIN_CONFIG_FLAG_WS2812B                = (1 << 13)
+
+ARCIN_RGB_FLAG_ENABLE_HID                = (1 << 0)
+ARCIN_RGB_FLAG_REACT_TO_TT               = (1 << 1)
+ARCIN_RGB_FLAG_FLIP_DIRECTION            = (1 << 2)
+# 00 = instant
+# 01 = 200ms
+# 10 = 400ms
+# 11 = 600ms
+ARCIN_RGB_FLAG_FADE_OUT_FAST             = (1 << 3)
+ARCIN_RGB_FLAG_FADE_OUT_SLOW             = (1 << 4)
+
+@dataclass
+class RgbMode:
+    display_name: str = "???"
+    num_custom_color: int = 0
+    has_idle_animation: bool = True
+    idle_animation_unit: str = ""
+    tt_animation_speed: bool = True
+    idle_animation_with_tt_react: bool = True
+    use_palettes: bool = False
+    multiplicity_label: str = "???"
+    multiplicity_tooltip: str = ""
+    multiplicity_min: int = -1
+    multiplicity_max: int = -1
+
+RGB_MODE_OPTIONS = [
+    RgbMode(
+        "Single-color / breathe",
+        1,
+        idle_animation_with_tt_react=False,
+        idle_animation_unit="BPM",
+        ),
+    RgbMode(
+        "Flash (two colors)",
+        2,
+        idle_animation_with_tt_react=False,
+        idle_animation_unit="BPM",
+        ),
+    RgbMode(
+        "Flash (random color)",
+        0,
+        tt_animation_speed=False,
+        use_palettes=True,
+        idle_animation_unit="BPM",
+        ),
+    RgbMode(
+        "Tricolor",
+        3,
+        idle_animation_unit="RPM",
+        ),
+    RgbMode(
+        "Color dots",
+        3,
+        multiplicity_label="Number of dots",
+        multiplicity_tooltip="Specifies number of dots shown",
+        multiplicity_min=1,
+        multiplicity_max=3,
+        idle_animation_unit="RPM",
+        ),
+    RgbMode(
+        "Color divisions",
+        3,
+        multiplicity_label="Number of colors",
+        multiplicity_tooltip="Specifies number of colors used",
+        multiplicity_min=2,
+        multiplicity_max=3,
+        idle_animation_unit="RPM",
+        ),
+    RgbMode(
+        "Rainbow glow",
+        0,
+        use_palettes=True,
+        idle_animation_unit="RPM",
+        ),
+    RgbMode(
+        "Rainbow spiral",
+        0,
+        use_palettes=True,
+        multiplicity_label="Wave length",
+        multiplicity_tooltip="1 makes a full circle, 2+ makes the wave effect longer",
+        multiplicity_min=1,
+        multiplicity_max=6,
+        idle_animation_unit="RPM",
+        ),
+    RgbMode(
+        "Pride (animation only)",
+        0,
+        has_idle_animation=False,
+        tt_animation_speed=False,
+        ),
+    RgbMode(
+        "Pacifica (animation only)",
+        0,
+        has_idle_animation=False,
+        tt_animation_speed=False,
+        ),
+]
+
+# Idle animation speed shown for (and rendered from) the raw rgb_idle_speed
+# value; must match FW calculation
+def idle_speed_value(raw, unit):
+    if unit == "RPM":
+        return raw / 2
+    if unit == "BPM":
+        return raw * raw / 255
+    return raw
+
+# TT animation speed multiplier shown for the raw rgb_tt_speed value
+def tt_speed_value(raw):
+    return raw / 10
+
+def _as_bytes(value):
+    if type(value) is bytes:
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    return bytes(value)
+
+def _pack_values(conf):
+    values = list(conf)
+    for i in _BYTES_FIELDS:
+        values[i] = _as_bytes(values[i])
+    return values
+
+def pack_config(conf):
+    return CONFIG_STRUCT.pack(*_pack_values(conf))
+
+# Packs straight into an existing buffer, e.g. a feature report
+def pack_config_into(buffer, offset, conf):
+    CONFIG_STRUCT.pack_into(buffer, offset, *_pack_values(conf))
+
+# byte-string field => its size; struct silently cuts longer values short
+_FIELD_SIZES = {
+    name: int(fmt[:-1]) for name, fmt, _ in CONFIG_FIELDS
+    if name is not None and fmt.endswith("s")}
+
+# Raises ValueError, TypeError or struct.error for a config that can't be
+# written as it is, e.g. one built from a user's profile
+def check_config(conf):
+    for name, size in _FIELD_SIZES.items():
+        value = getattr(conf, name)
+        length = len(value.encode() if isinstance(value, str) else value)
+        if length > size:
+            raise ValueError(f"{name} is {length} bytes, at most {size} fit")
+    pack_config(conf)
+
+# Reads from any buffer (bytes, bytearray, memoryview) without copying it;
+# trailing data past the struct is ignored.
+def unpack_config(data, offset=0):
+    return ArcinConfig._make(CONFIG_STRUCT.unpack_from(data, offset))
+
+# label field (NUL-padded bytes, or str from a text box) as text
+def label_text(label):
+    if isinstance(label, bytes):
+        label = label.split(b'\0', 1)[0].decode(errors="replace")
+    return label
+
+# JSON-friendly form used for profiles: label as text, keycodes as a list
+def conf_to_dict(conf):
+    d = conf._asdict()
+    d["label"] = label_text(conf.label)
+    d["keycodes"] = list(conf.keycodes)
+    return d
+
+def conf_from_dict(d):
+    d = dict(d)
+    d["keycodes"] = bytes(d["keycodes"])
+    return ArcinConfig(**d)
+
+# [(field, old, new)] for every field that differs once both sides are packed,
+# so padding differences in label/keycodes don't count
+def diff_configs(old, new):
+    old = unpack_config(pack_config(old))
+    new = unpack_config(pack_config(new))
+    return [
+        (field, getattr(old, field), getattr(new, field))
+        for field in ArcinConfig._fields
+        if getattr(old, field) != getattr(new, field)]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import struct
+from arcin_config import VID, PID
+from arcin_config import pack_config_into, unpack_config, diff_configs
+from arcin_config import CONFIG_SIZE
+from hid_transport import get_transport
+from hid_metrics import span
+
+# see definition of config_report_t in report_desc.h
+CONFIG_REPORT_ID = 0xc0
+CONFIG_REPORT_SIZE = 64
+CONFIG_DATA_OFFSET = 4
+CONFIG_DATA_SIZE = 0x3C
+
+assert CONFIG_SIZE == CONFIG_DATA_SIZE
+
+REBOOT_REPORT_ID = 0xb0
+REBOOT_COMMAND = 0x20
+
+# joystick input report, see definition of input_report_t in report_desc.h
+INPUT_REPORT_ID = 0x01
+INPUT_REPORT = struct.Struct(
+    "<"
+    "B"    # uint8 report_id
+    "H"    # uint16 buttons
+    "B"    # uint8 axis_x (QE1)
+    "B")   # uint8 axis_y (QE2)
+INPUT_REPORT_MAX_SIZE = 64
+
+# save_to_device message when the device already had the requested config
+SAVE_UNCHANGED = "Unchanged"
+
+def get_devices(vendor_id=VID, product_id=PID, transport=None):
+    with span("enumerate"):
+        return get_transport(transport).enumerate(vendor_id, product_id)
+
+# Opens the device around func(device), or borrows an already open handle from
+# the pool when one is given.
+def with_device(device, func, pool=None, retry=True):
+    if pool is not None:
+        return pool.call(device, func, retry)
+
+    with span("open"):
+        device.open()
+    try:
+        return func(device)
+    finally:
+        with span("close"):
+            device.close()
+
+def read_config_report(device):
+    with span("get_feature_report"):
+        return device.get_feature_report(CONFIG_REPORT_ID, CONFIG_REPORT_SIZE)
+
+def restart_device(device):
+    with span("reboot"):
+        device.send_feature_report([REBOOT_REPORT_ID, REBOOT_COMMAND])
+
+def reboot_device(device, pool=None):
+    try:
+        # the board drops off the bus while restarting, so never resend
+        with_device(device, restart_device, pool, retry=False)
+    finally:
+        if pool is not None:
+            pool.invalidate(device.serial_number)
+
+def load_from_device(device, pool=None):
+    conf = None
+    try:
+        print("Loading from device:")
+        print(f"Name:\t {device.product_name}")
+        print(f"Serial:\t {device.serial_number}")
+
+        with span("load"):
+            report = with_device(device, read_config_report, pool)
+            conf = parse_device(report)
+
+    except Exception as e:
+        print(f"{device.serial_number}: load failed: {e!r}")
+        return None
+
+    return conf
+
+def parse_device(report):
+    return unpack_config(report, CONFIG_DATA_OFFSET)
+
+def save_to_device(device, conf, pool=None, force=False):
+    with span("save"):
+        return _save_to_device(device, conf, pool, force)
+
+def _save_to_device(device, conf, pool, force):
+    feature = bytearray(CONFIG_REPORT_SIZE)
+
+    feature[0] = CONFIG_REPORT_ID # report id
+    feature[1] = 0x00 # segment
+    feature[2] = CONFIG_DATA_SIZE # size
+    feature[3] = 0x00 # padding
+
+    try:
+        pack_config_into(feature, CONFIG_DATA_OFFSET, conf)
+    except (struct.error, TypeError, ValueError, AttributeError) as e:
+        print(f"{device.serial_number}: cannot pack config: {e}")
+        return (False, "Format error")
+
+    packed = memoryview(feature)[CONFIG_DATA_OFFSET:CONFIG_DATA_OFFSET+CONFIG_SIZE]
+
+    # Skip the write, and more importantly the reboot, when the device already
+    # holds these exact bytes. If the read fails, fall back to writing.
+    changes = None
+    if not force:
+        try:
+            current = with_device(device, read_config_report, pool)
+            current = memoryview(current)[CONFIG_DATA_OFFSET:CONFIG_DATA_OFFSET+CONFIG_SIZE]
+            if len(current) != CONFIG_SIZE:
+                current = None
+        except Exception as e:
+            print(f"{device.serial_number}: reading current config failed: {e!r}")
+            current = None
+
+        if current == packed:
+            print(f"{device.serial_number}: config unchanged, skipping write")
+            return (True, SAVE_UNCHANGED)
+
+        if current is not None:
+            changes = diff_configs(unpack_config(current), conf)
+            for field, old, new in changes:
+                print(f"{device.serial_number}: {field}: {old!r} -> {new!r}")
+
+    def write_config(device):
+        with span("send_feature_report"):
+            device.send_feature_report(feature)
+
+    def write_and_restart(device):
+        write_config(device)
+        restart_device(device)
+
+    try:
+        if pool is None:
+            with_device(device, write_and_restart)
+        else:
+            with_device(device, write_config, pool)
+            # the board drops off the bus while restarting, so never resend
+            with_device(device, restart_device, pool, retry=False)
+
+    except Exception as e:
+        print(f"{device.serial_number}: write failed: {e!r}")
+        return (False, "Failed to write to device")
+    finally:
+        if pool is not None:
+            # the handle is gone after the restart
+            pool.invalidate(device.serial_number)
+
+    if changes:
+        return (True, "Success (changed: " + ", ".join(c[0] for c in changes) + ")")
+    return (True, "Success")
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+
+# In-process stand-in for arcin-infinitas controllers, used as the "sim"
+# transport (ARCIN_TRANSPORT=sim) to exercise the GUI and the batch tools
+# without hardware.
+#
+# The bus is configured from the environment:
+#   ARCIN_SIM_DEVICES    number of virtual controllers (default 4)
+#   ARCIN_SIM_LATENCY_MS mean latency of a single transfer (default 2)
+#   ARCIN_SIM_JITTER_MS  standard deviation of the latency (default 0.5)
+#   ARCIN_SIM_REBOOT_MS  time a controller is gone after a reboot (default 1500)
+#   ARCIN_SIM_FAIL_RATE  probability of a transfer failing (default 0)
+#   ARCIN_SIM_HANG_RATE  probability of a transfer hanging (default 0)
+#   ARCIN_SIM_HANG_MS    how long a hung transfer blocks (default 30000)
+#   ARCIN_SIM_DROP_RATE  probability of an input report going missing (default 0)
+#   ARCIN_SIM_BUSES      USB buses the controllers are spread over (default 1)
+#   ARCIN_SIM_HUB_PORTS  controllers per hub before the next hub (default 7)
+#   ARCIN_SIM_HUB_SLOTS  transfers a hub carries at once, 0 for no limit (default 0)
+#
+# Input reports are produced at the poll rate the stored config asks for
+# (1000 Hz, or 250 Hz with ARCIN_CONFIG_FLAG_250HZ_MODE). Their contents come
+# from SimulatedArcin.input_state(t) -> (buttons, axis_x, axis_y), which can be
+# replaced to script button presses or turntable spins.
+
+import os
+import random
+import threading
+import time
+from arcin_config import VID, PID
+from arcin_config import ArcinConfig, pack_config, unpack_config
+from arcin_config import ARCIN_CONFIG_FLAG_DEBOUNCE, ARCIN_CONFIG_FLAG_250HZ_MODE
+from arcin_config import ARCIN_RGB_NUM_LEDS_DEFAULT
+from arcin_device import CONFIG_REPORT_ID, CONFIG_DATA_SIZE
+from arcin_device import REBOOT_REPORT_ID, REBOOT_COMMAND
+from arcin_device import INPUT_REPORT_ID, INPUT_REPORT
+
+PRODUCT_NAME = "arcin-infinitas (simulated)"
+
+DEFAULT_CONFIG = ArcinConfig(
+    label="arcin",
+    flags=ARCIN_CONFIG_FLAG_DEBOUNCE,
+    qe1_sens=-4,
+    qe2_sens=0,
+    debounce_ticks=2,
+    keycodes=bytes(16),
+    remap_start_sel=0x12,
+    remap_b8_b9=0x34,
+    rgb_flags=0,
+    rgb_red=255,
+    rgb_green=0,
+    rgb_blue=0,
+    rgb_darkness=0,
+    rgb_red_2=0,
+    rgb_green_2=255,
+    rgb_blue_2=0,
+    rgb_red_3=0,
+    rgb_green_3=0,
+    rgb_blue_3=255,
+    rgb_mode=0,
+    rgb_num_leds=ARCIN_RGB_NUM_LEDS_DEFAULT,
+    rgb_idle_speed=0,
+    rgb_idle_brightness=0,
+    rgb_tt_speed=0,
+    rgb_mode_options=0,
+)
+
+def idle_input_state(t):
+    return (0, 0, 0)
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+class SimulatedFault(IOError):
+    pass
+
+# Firmware-side state of one virtual controller. The config survives reboots;
+# the USB handle does not. Every reboot bumps the generation, which
+# invalidates handles enumerated before it.
+class SimulatedArcin:
+
+    def __init__(self, serial_number, latency=0.002, jitter=0.0005,
+                 reboot_time=1.5, fail_rate=0.0, hang_rate=0.0, hang_time=30.0,
+                 drop_rate=0.0, vendor_id=VID, product_id=PID, usb_location=None,
+                 hub=None):
+        self.serial_number = serial_number
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.latency = latency
+        self.jitter = jitter
+        self.reboot_time = reboot_time
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_time = hang_time
+        self.drop_rate = drop_rate
+        # port path like "1-2.3", see usb_topology.py
+        self.usb_location = usb_location
+        # semaphore shared by the controllers behind one hub, or None
+        self.hub = hub
+        self.input_state = idle_input_state
+
+        self.config = bytearray(pack_config(DEFAULT_CONFIG))
+        self.generation = 0
+        self.offline_until = 0.0
+        self.reads = 0
+        self.writes = 0
+        self.reboots = 0
+        self.lock = threading.Lock()
+
+    def poll_interval(self):
+        if unpack_config(self.config).flags & ARCIN_CONFIG_FLAG_250HZ_MODE:
+            return 0.004
+        return 0.001
+
+    def is_online(self):
+        return time.monotonic() >= self.offline_until
+
+    def reboot(self):
+        self.reboots += 1
+        self.generation += 1
+        self.offline_until = time.monotonic() + self.reboot_time
+
+    def transfer_delay(self):
+        if self.hang_rate and random.random() < self.hang_rate:
+            time.sleep(self.hang_time)
+        delay = random.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            if self.hub is None:
+                time.sleep(delay)
+            else:
+                with self.hub:
+                    time.sleep(delay)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise SimulatedFault(f"{self.serial_number}: injected transfer failure")
+
+# Handle returned by enumeration; stale once the controller reboots
+class SimulatedDevice:
+
+    def __init__(self, arcin):
+        self.arcin = arcin
+        self.generation = arcin.generation
+        self.product_name = PRODUCT_NAME
+        self.serial_number = arcin.serial_number
+        self.path = f"sim://{arcin.serial_number}/{arcin.generation}"
+        self.usb_location = arcin.usb_location
+        # simulated controllers start over in every process
+        self.enumeration_id = f"sim:{os.getpid()}:{arcin.generation}"
+        self.opened = False
+        self.next_report = 0.0
+        self.report_interval = 0.001
+
+    def __check_connected__(self):
+        if self.generation != self.arcin.generation or not self.arcin.is_online():
+            raise IOError(f"{self.serial_number}: device disconnected")
+
+    def open(self):
+        self.__check_connected__()
+        self.opened = True
+        # the poll rate only changes with a config write, which reboots
+        self.report_interval = self.arcin.poll_interval()
+        self.next_report = time.monotonic()
+
+    def close(self):
+        self.opened = False
+
+    def get_feature_report(self, report_id, size):
+        if not self.opened:
+            raise IOError(f"{self.serial_number}: device not open")
+        self.arcin.transfer_delay()
+        with self.arcin.lock:
+            self.__check_connected__()
+            if report_id != CONFIG_REPORT_ID:
+                raise IOError(f"Feature report 0x{report_id:02x} not found")
+            self.arcin.reads += 1
+            report = bytearray(size)
+            report[0:4] = bytes([CONFIG_REPORT_ID, 0x00, CONFIG_DATA_SIZE, 0x00])
+            report[4:4 + CONFIG_DATA_SIZE] = self.arcin.config
+            return bytes(report[0:size])
+
+    def send_feature_report(self, data):
+        if not self.opened:
+            raise IOError(f"{self.serial_number}: device not open")
+        data = bytes(data)
+        self.arcin.transfer_delay()
+        with self.arcin.lock:
+            self.__check_connected__()
+            if data[0] == CONFIG_REPORT_ID:
+                # segment 0 is the only one the firmware knows about
+                segment, size = data[1], data[2]
+                if segment != 0 or size != CONFIG_DATA_SIZE or len(data) < 4 + size:
+                    raise IOError(f"{self.serial_number}: malformed config report")
+                self.arcin.writes += 1
+                self.arcin.config[:] = data[4:4 + size]
+            elif data[0] == REBOOT_REPORT_ID and data[1:2] == bytes([REBOOT_COMMAND]):
+                self.arcin.reboot()
+                self.opened = False
+            else:
+                raise IOError(f"Feature report 0x{data[0]:02x} not supported")
+
+    def read_input_report(self, buffer, timeout):
+        if not self.opened:
+            raise IOError(f"{self.serial_number}: device not open")
+        deadline = time.monotonic() + timeout
+        while True:
+            self.__check_connected__()
+            now = time.monotonic()
+            # like the kernel queue, don't build up an unbounded backlog
+            if self.next_report < now - 0.05:
+                self.next_report = now
+            if self.next_report > deadline:
+                time.sleep(max(0.0, deadline - now))
+                return 0
+            if self.next_report > now:
+                time.sleep(self.next_report - now)
+            t = self.next_report
+            self.next_report += self.report_interval
+            if self.arcin.drop_rate and random.random() < self.arcin.drop_rate:
+                continue
+            buttons, axis_x, axis_y = self.arcin.input_state(t)
+            INPUT_REPORT.pack_into(
+                buffer, 0, INPUT_REPORT_ID, buttons & 0xffff, axis_x & 0xff, axis_y & 0xff)
+            return INPUT_REPORT.size
+
+class SimulatedBus:
+
+    def __init__(self):
+        self.arcins = []
+        self.lock = threading.Lock()
+
+    def add(self, arcin):
+        with self.lock:
+            self.arcins.append(arcin)
+        return arcin
+
+    def remove(self, serial_number):
+        with self.lock:
+            self.arcins = [a for a in self.arcins if a.serial_number != serial_number]
+
+    def find(self, serial_number):
+        with self.lock:
+            for arcin in self.arcins:
+                if arcin.serial_number == serial_number:
+                    return arcin
+        return None
+
+    # Controller i goes on bus i % buses, filling hubs of hub_ports ports one
+    # after another, each hub chained off the root hub's next port.
+    def populate(self, count, buses=1, hub_ports=7, hub_slots=0, **kw):
+        hubs = {}
+        for i in range(count):
+            bus = i % buses + 1
+            hub, port = divmod(i // buses, hub_ports)
+            if hub_slots and (bus, hub) not in hubs:
+                hubs[(bus, hub)] = threading.Semaphore(hub_slots)
+            self.add(SimulatedArcin(
+                f"SIM{i:05d}", usb_location=f"{bus}-{hub + 1}.{port + 1}",
+                hub=hubs.get((bus, hub)), **kw))
+
+    def enumerate(self, vendor_id, product_id):
+        with self.lock:
+            arcins = list(self.arcins)
+        return [
+            SimulatedDevice(a) for a in arcins
+            if a.vendor_id == vendor_id and a.product_id == product_id and a.is_online()]
+
+def bus_from_environment():
+    bus = SimulatedBus()
+    bus.populate(
+        int(os.environ.get("ARCIN_SIM_DEVICES", 4)),
+        latency=_env_float("ARCIN_SIM_LATENCY_MS", 2) / 1000,
+        jitter=_env_float("ARCIN_SIM_JITTER_MS", 0.5) / 1000,
+        reboot_time=_env_float("ARCIN_SIM_REBOOT_MS", 1500) / 1000,
+        fail_rate=_env_float("ARCIN_SIM_FAIL_RATE", 0),
+        hang_rate=_env_float("ARCIN_SIM_HANG_RATE", 0),
+        hang_time=_env_float("ARCIN_SIM_HANG_MS", 30000) / 1000,
+        drop_rate=_env_float("ARCIN_SIM_DROP_RATE", 0),
+        buses=int(os.environ.get("ARCIN_SIM_BUSES", 1)),
+        hub_ports=int(os.environ.get("ARCIN_SIM_HUB_PORTS", 7)),
+        hub_slots=int(os.environ.get("ARCIN_SIM_HUB_SLOTS", 0)),
+    )
+    return bus
+
+class SimulatedTransport:
+
+    name = "sim"
+
+    def __init__(self, bus=None):
+        self.bus = bus if bus is not None else bus_from_environment()
+
+    def enumerate(self, vendor_id, product_id):
+        return self.bus.enumerate(vendor_id, product_id)
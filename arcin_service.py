@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+# Local HTTP control service for every attached controller, for cabinet
+# management systems that can't drive the GUI.
+#
+#   GET  /devices                      attached controllers
+#   GET  /devices/<serial>/config      config as JSON (the profile format)
+#   PUT  /devices/<serial>/config      write a full config, ?force=1 to write
+#                                      and reboot even if unchanged
+#   POST /devices/<serial>/reboot      restart the controller
+#   GET  /metrics                      HID timings, Prometheus text format
+#
+# All requests go through one AsyncArcin, so device handles are shared and
+# concurrent reads of one controller become a single HID transfer. Binds to
+# localhost unless told otherwise: there is no authentication.
+#
+# Binding to localhost doesn't keep web pages in a browser on the same PC
+# out, so requests must name this server in Host (against DNS rebinding)
+# and must not carry an Origin header, which browsers add to every
+# cross-origin POST/PUT and fetch(); plain HTTP clients don't send it.
+# Bound to every interface (0.0.0.0, ::), the service can't tell which names
+# clients reach it by, so those have to be listed with --allow-host.
+#
+#   python arcin_service.py --port 8048
+#   python arcin_service.py --host 0.0.0.0 --allow-host cabinet-3.local
+#   ARCIN_TRANSPORT=sim python arcin_service.py
+
+import argparse
+import asyncio
+import json
+import struct
+import sys
+from functools import partial
+from urllib.parse import urlsplit, parse_qs, unquote
+from arcin_async import AsyncArcin, DeviceBusy, DeviceTimeout
+from arcin_async import DEFAULT_TIMEOUT, DEFAULT_SAVE_TIMEOUT, DEFAULT_WORKERS
+from arcin_config import VID, PID, conf_to_dict, conf_from_dict, check_config
+from device_lock import DeviceLocked
+from hid_metrics import METRICS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8048
+
+# bind addresses that listen on every interface
+WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+MAX_BODY_SIZE = 64 * 1024
+# for the request line and headers
+READ_TIMEOUT = 10.0
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+    502: "Bad Gateway", 504: "Gateway Timeout",
+}
+
+class HttpError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _device_info(device, arcin):
+    return {
+        "serial_number": device.serial_number,
+        "product_name": device.product_name,
+        "usb_location": getattr(device, "usb_location", None),
+        "busy": arcin.is_busy(device.serial_number),
+    }
+
+# Host header value naming host:port; IPv6 literals go in brackets
+def _host_header(host, port):
+    if ":" in host and not host.startswith("["):
+        host = f"[{host}]"
+    return f"{host}:{port}".lower()
+
+def _flag(query, name):
+    return query.get(name, ["0"])[-1].lower() in ("1", "true", "yes")
+
+class ArcinService:
+
+    def __init__(self, arcin, timeout=DEFAULT_TIMEOUT, save_timeout=DEFAULT_SAVE_TIMEOUT):
+        self.arcin = arcin
+        self.timeout = timeout
+        self.save_timeout = save_timeout
+        # accepted Host header values, set by start()
+        self.allowed_hosts = set()
+
+    # allow_hosts: more names or addresses clients may use in Host, needed
+    # when binding to a wildcard address
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, allow_hosts=()):
+        names = list(LOOPBACK_HOSTS) + list(allow_hosts)
+        if host in WILDCARD_HOSTS:
+            if not allow_hosts:
+                raise ValueError(
+                    f"binding to {host or 'every interface'!r} needs the names clients "
+                    "use for this machine (--allow-host)")
+        else:
+            names.append(host)
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        for s in server.sockets:
+            bound = s.getsockname()[1]
+            for name in names:
+                self.allowed_hosts.add(_host_header(name, bound))
+        return server
+
+    def __check_headers__(self, headers):
+        if "origin" in headers:
+            raise HttpError(403, "cross-origin requests are not allowed")
+        if headers.get("host", "").lower() not in self.allowed_hosts:
+            raise HttpError(403, f"unexpected Host header: {headers.get('host', '')!r}")
+
+    async def __known__(self, serial_number):
+        if serial_number not in self.arcin.known:
+            await self.arcin.devices(self.timeout)
+        if serial_number not in self.arcin.known:
+            raise HttpError(404, f"{serial_number}: device not connected")
+
+    async def list_devices(self):
+        devices = await self.arcin.devices(self.timeout)
+        return 200, [_device_info(d, self.arcin) for d in devices]
+
+    async def get_config(self, serial_number):
+        await self.__known__(serial_number)
+        conf = await self.arcin.load(serial_number, self.timeout)
+        return 200, conf_to_dict(conf)
+
+    async def put_config(self, serial_number, body, force):
+        try:
+            conf = conf_from_dict(json.loads(body))
+            check_config(conf)
+        except (ValueError, TypeError, KeyError, AttributeError, struct.error) as e:
+            raise HttpError(400, f"invalid config: {e}")
+        await self.__known__(serial_number)
+        ok, message = await self.arcin.save(serial_number, conf, self.save_timeout, force)
+        return (200 if ok else 502), {"ok": ok, "message": message}
+
+    async def reboot(self, serial_number):
+        await self.__known__(serial_number)
+        await self.arcin.reboot(serial_number, self.timeout)
+        return 200, {"ok": True, "message": "Rebooting"}
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+
+        if parts == ["devices"]:
+            routes = {"GET": self.list_devices}
+        elif len(parts) == 3 and parts[0] == "devices" and parts[2] == "config":
+            routes = {
+                "GET": partial(self.get_config, parts[1]),
+                "PUT": partial(self.put_config, parts[1], body, _flag(query, "force")),
+            }
+        elif len(parts) == 3 and parts[0] == "devices" and parts[2] == "reboot":
+            routes = {"POST": partial(self.reboot, parts[1])}
+        elif parts == ["metrics"]:
+            routes = {"GET": self.metrics}
+        else:
+            raise HttpError(404, f"no such resource: {url.path}")
+
+        handler = routes.get(method)
+        if handler is None:
+            raise HttpError(405, f"{method} not allowed on {url.path}")
+        try:
+            return await handler()
+        except DeviceTimeout as e:
+            raise HttpError(504, str(e))
+        except (DeviceBusy, DeviceLocked) as e:
+            raise HttpError(409, str(e))
+        except OSError as e:
+            raise HttpError(502, str(e))
+
+    async def metrics(self):
+        return 200, METRICS.to_prometheus()
+
+    async def handle_connection(self, reader, writer):
+        method = target = None
+        try:
+            try:
+                method, target, headers, body = await asyncio.wait_for(
+                    _read_request(reader), READ_TIMEOUT)
+                self.__check_headers__(headers)
+                status, payload = await self.dispatch(method, target, body)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                if method is None:
+                    return
+                raise
+            except HttpError as e:
+                status, payload = e.status, {"error": str(e)}
+            except Exception as e:
+                print(f"{method} {target}: {e!r}")
+                status, payload = 500, {"error": repr(e)}
+            writer.write(_response(status, payload))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+    try:
+        method, target, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HttpError(400, "invalid Content-Length")
+    if length < 0 or length > MAX_BODY_SIZE:
+        raise HttpError(413, f"body larger than {MAX_BODY_SIZE} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+def _response(status, payload):
+    if isinstance(payload, str):
+        body = payload.encode()
+        content_type = "text/plain; version=0.0.4"
+    else:
+        body = (json.dumps(payload, indent=2) + "\n").encode()
+        content_type = "application/json"
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n")
+    return head.encode() + body
+
+async def serve(args):
+    async with AsyncArcin(args.vid, args.pid, args.transport, args.workers) as arcin:
+        service = ArcinService(arcin, args.timeout)
+        server = await service.start(args.host, args.port, args.allow_host)
+        addresses = ", ".join(
+            f"http://{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+        print(f"Serving on {addresses}")
+        async with server:
+            await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="HTTP service for reading and writing controller configs.")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+        help=f"address to bind (default {DEFAULT_HOST}; there is no authentication)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--allow-host", action="append", default=[],
+        help="name or address clients reach this machine by, accepted in Host "
+             "(repeatable; required with a wildcard --host)")
+    parser.add_argument("--vid", type=lambda x: int(x, 0), default=VID)
+    parser.add_argument("--pid", type=lambda x: int(x, 0), default=PID)
+    parser.add_argument("--transport", default=None)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+        help="deadline of a device read or reboot in seconds")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args(argv)
+    if args.host in WILDCARD_HOSTS and not args.allow_host:
+        parser.error(f"--host {args.host!r} listens on every interface; "
+                     "name the hosts clients use with --allow-host")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Config encode/decode throughput: the schema-generated codec in arcin_config
+# against the previous hand-written struct.pack / calcsize + slice code.
+#
+#   python -m bench.codec -n 200000
+
+import argparse
+import struct
+import timeit
+from arcin_config import ArcinConfig, STRUCT_FMT_EX
+from arcin_config import pack_config, pack_config_into, unpack_config
+from arcin_emulator import DEFAULT_CONFIG
+from arcin_device import CONFIG_DATA_OFFSET, CONFIG_REPORT_SIZE
+
+def legacy_pack(conf):
+    return struct.pack(
+        STRUCT_FMT_EX,
+        conf.label[0:12].encode(),
+        conf.flags,
+        conf.qe1_sens,
+        conf.qe2_sens,
+        conf.debounce_ticks,
+        conf.keycodes[0:16],
+        conf.remap_start_sel,
+        conf.remap_b8_b9,
+        conf.rgb_flags,
+        conf.rgb_red,
+        conf.rgb_green,
+        conf.rgb_blue,
+        conf.rgb_darkness,
+        conf.rgb_red_2,
+        conf.rgb_green_2,
+        conf.rgb_blue_2,
+        conf.rgb_red_3,
+        conf.rgb_green_3,
+        conf.rgb_blue_3,
+        conf.rgb_mode,
+        conf.rgb_num_leds,
+        conf.rgb_idle_speed,
+        conf.rgb_idle_brightness,
+        conf.rgb_tt_speed,
+        conf.rgb_mode_options,
+        )
+
+def legacy_unpack(report):
+    data = bytes(report[CONFIG_DATA_OFFSET:])
+    expected_size = struct.calcsize(STRUCT_FMT_EX)
+    truncated = bytes(data[0:expected_size])
+    unpacked = struct.unpack(STRUCT_FMT_EX, truncated)
+    return ArcinConfig._make(unpacked)
+
+def report(name, seconds, rounds):
+    print(f"{name:<24} {rounds / seconds:12,.0f} ops/s  {seconds / rounds * 1e9:8.0f} ns/op")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Config encode/decode throughput, schema codec vs legacy.")
+    parser.add_argument("-n", "--rounds", type=int, default=100000)
+    args = parser.parse_args(argv)
+    n = args.rounds
+
+    conf = DEFAULT_CONFIG
+    feature = bytearray(CONFIG_REPORT_SIZE)
+    pack_config_into(feature, CONFIG_DATA_OFFSET, conf)
+    raw = bytes(feature)
+
+    assert legacy_pack(conf) == pack_config(conf)
+    assert legacy_unpack(raw) == unpack_config(raw, CONFIG_DATA_OFFSET)
+
+    report("encode legacy", timeit.timeit(lambda: legacy_pack(conf), number=n), n)
+    report("encode pack_config", timeit.timeit(lambda: pack_config(conf), number=n), n)
+    report("encode pack_config_into", timeit.timeit(
+        lambda: pack_config_into(feature, CONFIG_DATA_OFFSET, conf), number=n), n)
+    report("decode legacy", timeit.timeit(lambda: legacy_unpack(raw), number=n), n)
+    report("decode unpack_config", timeit.timeit(
+        lambda: unpack_config(raw, CONFIG_DATA_OFFSET), number=n), n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+# Frame time of the off-device RGB renderer for every mode, against the
+# 16.7 ms a 60 fps preview has per frame.
+#
+#   python -m bench.render --leds 180 -n 600
+
+import argparse
+import time
+from arcin_config import RGB_MODE_OPTIONS, RgbConfig, Rgb
+from arcin_config import ARCIN_RGB_NUM_LEDS_MAX
+from rgb_render import RgbRenderer
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Frame time of rgb_render for every RGB mode.")
+    parser.add_argument("--leds", type=int, default=ARCIN_RGB_NUM_LEDS_MAX)
+    parser.add_argument("-n", "--frames", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    for mode, option in enumerate(RGB_MODE_OPTIONS):
+        config = RgbConfig(
+            0, Rgb(255, 0, 0), 0, Rgb(0, 255, 0), Rgb(0, 0, 255), mode,
+            args.leds, 120, 0, 0, 3 << 5)
+        renderer = RgbRenderer(config)
+        start = time.perf_counter()
+        for i in range(args.frames):
+            renderer.render(i / 60)
+        frame_time = (time.perf_counter() - start) / args.frames
+        print(f"{option.display_name:<28} {frame_time * 1e6:8.1f} us/frame  "
+              f"{1 / frame_time:10,.0f} fps")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# Compare config report round-trip times between HID transports.
+#
+#   python -m bench.transport --transport hidraw --transport pywinusb -n 200
+
+import argparse
+import statistics
+import time
+from arcin_device import get_devices, CONFIG_REPORT_ID, CONFIG_REPORT_SIZE
+
+def bench_device(device, rounds):
+    samples = []
+    start = time.perf_counter()
+    device.open()
+    open_time = time.perf_counter() - start
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            device.get_feature_report(CONFIG_REPORT_ID, CONFIG_REPORT_SIZE)
+            samples.append(time.perf_counter() - start)
+    finally:
+        device.close()
+    return (open_time, samples)
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare config report round-trip times between HID transports.")
+    parser.add_argument("--transport", action="append", default=[])
+    parser.add_argument("-n", "--rounds", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    transports = args.transport or [None]
+
+    print(f"{'transport':<10} {'serial':<16} {'open ms':>8} "
+          f"{'min ms':>8} {'median':>8} {'p99':>8}")
+    for transport in transports:
+        try:
+            devices = get_devices(transport=transport)
+        except Exception as e:
+            print(f"{transport}: unavailable ({e})")
+            continue
+        for device in devices:
+            open_time, samples = bench_device(device, args.rounds)
+            print(
+                f"{transport or 'default':<10} {device.serial_number:<16} "
+                f"{open_time * 1000:8.3f} "
+                f"{min(samples) * 1000:8.3f} "
+                f"{statistics.median(samples) * 1000:8.3f} "
+                f"{percentile(samples, 99) * 1000:8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+
+# Append-only history of configs pushed to controllers.
+#
+# <path> holds fixed-size records in the order they were appended:
+#   serial number, timestamp, firmware tag, packed STRUCT_FMT_EX payload.
+# <path>.idx holds one entry per record: first a run sorted by (serial
+# number, timestamp), whose length is in the index header, then entries
+# appended since, unsorted. Lookups are a binary search over the
+# memory-mapped sorted run plus one over the appended entries, which are also
+# kept sorted in memory; either way one record read gets the config. Appends
+# cost one write to each file, and the appended entries are merged into the
+# sorted run once there are MAX_UNSORTED of them, and on open.
+#
+# Records are written and fsynced before their index entry. On open only the
+# index header, the file sizes and the last entries are checked against the
+# records; entries missing after a crash are added, and an index that doesn't
+# match (damaged, or from another version) is rebuilt from the records, which
+# are the only thing that has to survive. rebuild_index() checks everything.
+#
+# The data file grows by DATA_CHUNK_RECORDS zeroed records at a time so it
+# isn't remapped on every append; close() cuts off the unused part, and after
+# a crash the zeroed records (no serial number) are skipped on open.
+
+import bisect
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from arcin_config import CONFIG_SIZE
+from arcin_config import pack_config, unpack_config
+
+ARCHIVE_MAGIC = b"ARCNCONF"
+INDEX_MAGIC = b"ARCNCIDX"
+ARCHIVE_VERSION = 1
+INDEX_VERSION = 2
+
+SERIAL_SIZE = 32
+FIRMWARE_SIZE = 16
+
+# magic, version, record size
+HEADER = struct.Struct("<8sII")
+# magic, version, entry size, entries in the sorted run
+INDEX_HEADER = struct.Struct("<8sIIQ")
+
+# serial, unix time in ns, firmware tag, config payload
+RECORD = struct.Struct(f"<{SERIAL_SIZE}sQ{FIRMWARE_SIZE}s{CONFIG_SIZE}s")
+
+# The key (serial + big-endian time) compares bytewise in (serial, time)
+# order; the record number is not part of the key.
+INDEX_KEY_SIZE = SERIAL_SIZE + 8
+INDEX_ENTRY = struct.Struct(f"{INDEX_KEY_SIZE}sQ")
+
+# appended index entries before they are merged into the sorted run
+MAX_UNSORTED = 4096
+
+# records the data file grows by at a time
+DATA_CHUNK_RECORDS = 1024
+
+LAST_TIMESTAMP = 2 ** 64 - 1
+
+ArchiveRecord = namedtuple(
+    "ArchiveRecord", "serial_number timestamp firmware config")
+
+def _serial_bytes(serial_number):
+    serial = serial_number.encode()
+    # an all-zero serial marks unused space in the data file
+    if len(serial) == 0:
+        raise ValueError("Empty serial number")
+    if len(serial) > SERIAL_SIZE:
+        raise ValueError(f"Serial number longer than {SERIAL_SIZE} bytes: {serial_number}")
+    return serial.ljust(SERIAL_SIZE, b"\0")
+
+def _index_key(serial, timestamp_ns):
+    return serial + struct.pack(">Q", timestamp_ns)
+
+class ConfigArchive:
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.lock = threading.Lock()
+        self.data_file = self.__open__(self.path)
+        self.data_map = self.__map__(self.data_file, None)
+        self.records = self.__count_records__()
+        self.index_file = None
+        self.index_map = None
+        self.sorted_count = 0
+        # (key, record number) appended after the sorted run, in key order
+        self.unsorted = []
+        self.__open_index__()
+
+    def __open__(self, path):
+        exists = os.path.exists(path)
+        f = open(path, "r+b" if exists else "w+b")
+        if exists:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError(f"{path}: truncated header")
+            file_magic, version, size = HEADER.unpack(header)
+            if file_magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION or size != RECORD.size:
+                raise ValueError(f"{path}: not a version {ARCHIVE_VERSION} archive")
+        else:
+            f.write(HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, RECORD.size))
+            f.flush()
+            os.fsync(f.fileno())
+        return f
+
+    def __map__(self, f, old):
+        if old is not None:
+            old.close()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # records in the data file, not counting zeroed space left by a crash
+    def __count_records__(self):
+        count = (len(self.data_map) - HEADER.size) // RECORD.size
+        while count > 0 and not any(self.data_map[
+                HEADER.size + (count - 1) * RECORD.size:][:SERIAL_SIZE]):
+            count -= 1
+        return count
+
+    def record_count(self):
+        return self.records
+
+    def __record_key__(self, record_number):
+        start = HEADER.size + record_number * RECORD.size
+        serial, timestamp_ns, _, _ = RECORD.unpack_from(self.data_map, start)
+        return _index_key(serial, timestamp_ns)
+
+    # (length of the sorted run, [(key, record number)] appended after it)
+    # from the index file as long as its header, size and last entries agree
+    # with the records, else None
+    def __load_index__(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                header = f.read(INDEX_HEADER.size)
+                if len(header) < INDEX_HEADER.size:
+                    return None
+                magic, version, entry_size, sorted_count = INDEX_HEADER.unpack(header)
+                if (magic != INDEX_MAGIC or version != INDEX_VERSION
+                        or entry_size != INDEX_ENTRY.size
+                        or (size - INDEX_HEADER.size) % INDEX_ENTRY.size):
+                    return None
+                count = (size - INDEX_HEADER.size) // INDEX_ENTRY.size
+                if sorted_count > count or count > self.record_count():
+                    return None
+                last_sorted = None
+                if sorted_count > 0:
+                    f.seek(INDEX_HEADER.size + (sorted_count - 1) * INDEX_ENTRY.size)
+                    last_sorted = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+                appended = list(INDEX_ENTRY.iter_unpack(f.read()))
+        except FileNotFoundError:
+            return None
+        # the sorted run holds the first sorted_count records, the rest are
+        # indexed in the order they were written
+        if [n for _, n in appended] != list(range(sorted_count, count)):
+            return None
+        if last_sorted is not None and (last_sorted[1] >= sorted_count
+                or last_sorted[0] != self.__record_key__(last_sorted[1])):
+            return None
+        if appended and appended[-1][0] != self.__record_key__(appended[-1][1]):
+            return None
+        return sorted_count, appended
+
+    def __open_index__(self):
+        loaded = self.__load_index__()
+        if loaded is None:
+            if os.path.exists(self.index_path):
+                print(f"{self.index_path}: index doesn't match the records, rebuilding it")
+            self.__write_index__(sorted(
+                (self.__record_key__(n), n) for n in range(self.record_count())))
+            return
+        sorted_count, appended = loaded
+        # index whatever a crash left out, and merge the appended entries
+        appended.extend((self.__record_key__(n), n)
+            for n in range(sorted_count + len(appended), self.record_count()))
+        self.__reopen_index__()
+        if appended:
+            self.unsorted = sorted(appended)
+            self.__merge_index__()
+
+    # replaces the index file with entries, all of them sorted
+    def __write_index__(self, entries):
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_ENTRY.size, len(entries)))
+            for key, record_number in entries:
+                f.write(INDEX_ENTRY.pack(key, record_number))
+            f.flush()
+            os.fsync(f.fileno())
+        # Windows can't replace a file that is open
+        self.__close_index__()
+        os.replace(temp_path, self.index_path)
+        self.__reopen_index__()
+
+    def __reopen_index__(self):
+        self.index_file = open(self.index_path, "r+b")
+        self.index_map = self.__map__(self.index_file, None)
+        self.sorted_count = INDEX_HEADER.unpack_from(self.index_map)[3]
+        self.unsorted = []
+
+    def __close_index__(self):
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        if self.index_file is not None:
+            self.index_file.close()
+            self.index_file = None
+
+    # reads every record again and writes a fresh index from them; this is
+    # the full check that opening the archive leaves out
+    def rebuild_index(self):
+        with self.lock:
+            self.__write_index__(sorted(
+                (self.__record_key__(n), n) for n in range(self.record_count())))
+
+    def __merge_index__(self):
+        entries = [self.__sorted_entry__(i) for i in range(self.sorted_count)]
+        self.__write_index__(list(heapq.merge(entries, self.unsorted)))
+
+    def index_count(self):
+        return self.sorted_count + len(self.unsorted)
+
+    def __len__(self):
+        return self.index_count()
+
+    def __sorted_key_at__(self, i):
+        start = INDEX_HEADER.size + i * INDEX_ENTRY.size
+        return self.index_map[start:start + INDEX_KEY_SIZE]
+
+    def __sorted_entry__(self, i):
+        return INDEX_ENTRY.unpack_from(self.index_map, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+
+    # first position in the sorted run whose key is > key (bisect_right)
+    def __upper_bound__(self, key):
+        lo, hi = 0, self.sorted_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key < self.__sorted_key_at__(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    # [(key, record number)] of serial up to timestamp_ns, oldest first
+    def __entries__(self, serial, timestamp_ns=LAST_TIMESTAMP, limit=None):
+        key = _index_key(serial, timestamp_ns)
+        found = []
+        position = self.__upper_bound__(key) - 1
+        while position >= 0 and (limit is None or len(found) < limit):
+            entry = self.__sorted_entry__(position)
+            if entry[0][:SERIAL_SIZE] != serial:
+                break
+            found.append(entry)
+            position -= 1
+        appended = []
+        position = bisect.bisect_right(self.unsorted, (key, LAST_TIMESTAMP)) - 1
+        while position >= 0 and (limit is None or len(appended) < limit):
+            entry = self.unsorted[position]
+            if entry[0][:SERIAL_SIZE] != serial:
+                break
+            appended.append(entry)
+            position -= 1
+        entries = list(heapq.merge(reversed(found), reversed(appended)))
+        return entries if limit is None else entries[-limit:]
+
+    def __read_record__(self, record_number):
+        start = HEADER.size + record_number * RECORD.size
+        serial, timestamp_ns, firmware, payload = RECORD.unpack_from(self.data_map, start)
+        return ArchiveRecord(
+            serial.rstrip(b"\0").decode(),
+            timestamp_ns / 1e9,
+            firmware.rstrip(b"\0").decode(),
+            unpack_config(payload))
+
+    # conf may be an ArcinConfig or an already packed payload
+    def append(self, serial_number, conf, firmware="", timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        serial = _serial_bytes(serial_number)
+        timestamp_ns = int(timestamp * 1e9)
+        payload = conf if isinstance(conf, (bytes, bytearray)) else pack_config(conf)
+        record = RECORD.pack(serial, timestamp_ns, firmware.encode()[0:FIRMWARE_SIZE], payload)
+        key = _index_key(serial, timestamp_ns)
+
+        with self.lock:
+            record_number = self.record_count()
+            end = HEADER.size + (record_number + 1) * RECORD.size
+            if end > len(self.data_map):
+                self.data_map.close()
+                self.data_file.truncate(end + (DATA_CHUNK_RECORDS - 1) * RECORD.size)
+                self.data_map = self.__map__(self.data_file, None)
+            self.data_file.seek(HEADER.size + record_number * RECORD.size)
+            self.data_file.write(record)
+            self.data_file.flush()
+            os.fsync(self.data_file.fileno())
+            self.records += 1
+
+            # the sorted run doesn't move, so the index map stays valid
+            self.index_file.seek(0, os.SEEK_END)
+            self.index_file.write(INDEX_ENTRY.pack(key, record_number))
+            self.index_file.flush()
+            os.fsync(self.index_file.fileno())
+            bisect.insort(self.unsorted, (key, record_number))
+            if len(self.unsorted) >= MAX_UNSORTED:
+                self.__merge_index__()
+
+    # newest record for serial_number at or before timestamp (None = latest)
+    def at(self, serial_number, timestamp=None):
+        serial = _serial_bytes(serial_number)
+        timestamp_ns = LAST_TIMESTAMP if timestamp is None else int(timestamp * 1e9)
+        with self.lock:
+            entries = self.__entries__(serial, timestamp_ns, limit=1)
+            if not entries:
+                return None
+            return self.__read_record__(entries[-1][1])
+
+    def latest(self, serial_number):
+        return self.at(serial_number)
+
+    def history(self, serial_number):
+        serial = _serial_bytes(serial_number)
+        with self.lock:
+            return [self.__read_record__(n) for _, n in self.__entries__(serial)]
+
+    def close(self):
+        self.data_map.close()
+        self.data_file.truncate(HEADER.size + self.records * RECORD.size)
+        self.data_file.close()
+        self.__close_index__()
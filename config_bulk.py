@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Bulk decoding of many raw config payloads at once with NumPy, for fleet
+# audits. A buffer of N concatenated records is viewed as a structured array
+# mirroring STRUCT_FMT_EX, without copying, and every ARCIN_CONFIG_FLAG_* /
+# ARCIN_RGB_FLAG_* bit can be pulled out as a boolean column:
+#
+#   records = decode_configs(blob)
+#   off = records[~flag_column(records, ARCIN_CONFIG_FLAG_250HZ_MODE)]
+
+import numpy as np
+import arcin_config
+from arcin_config import ArcinConfig, CONFIG_FIELDS, CONFIG_SIZE
+
+# struct format letter => numpy type (all little-endian, see STRUCT_FMT_EX)
+_NUMPY_TYPES = {
+    "b": "i1",
+    "B": "u1",
+    "h": "<i2",
+    "H": "<u2",
+    "l": "<i4",
+    "L": "<u4",
+}
+
+def _field_layout():
+    layout = []
+    offset = 0
+    for name, fmt, _ in CONFIG_FIELDS:
+        count = int(fmt[:-1]) if len(fmt) > 1 else 1
+        code = fmt[-1]
+        if code == "x":
+            size = count
+        elif code == "s":
+            size = count
+            if name is not None:
+                layout.append((name, f"S{count}", offset))
+        else:
+            numpy_type = _NUMPY_TYPES[code]
+            size = np.dtype(numpy_type).itemsize * count
+            if name is not None:
+                layout.append((name, numpy_type, offset))
+        offset += size
+    assert offset == CONFIG_SIZE
+    return layout
+
+_LAYOUT = _field_layout()
+
+# Structured dtype for records spaced `stride` bytes apart with the config
+# starting `offset` bytes into each record, e.g. stride=64, offset=4 for raw
+# 0xc0 feature reports.
+def config_dtype(stride=CONFIG_SIZE, offset=0):
+    return np.dtype({
+        "names": [name for name, _, _ in _LAYOUT],
+        "formats": [numpy_type for _, numpy_type, _ in _LAYOUT],
+        "offsets": [offset + field_offset for _, _, field_offset in _LAYOUT],
+        "itemsize": stride,
+    })
+
+CONFIG_DTYPE = config_dtype()
+
+# name => bit, for every flag defined in arcin_config
+CONFIG_FLAGS = {
+    name: value for name, value in vars(arcin_config).items()
+    if name.startswith("ARCIN_CONFIG_FLAG_")}
+RGB_FLAGS = {
+    name: value for name, value in vars(arcin_config).items()
+    if name.startswith("ARCIN_RGB_FLAG_")}
+
+def decode_configs(buffer, stride=CONFIG_SIZE, offset=0):
+    dtype = config_dtype(stride, offset)
+    if len(buffer) % stride:
+        raise ValueError(
+            f"Buffer of {len(buffer)} bytes is not a whole number of "
+            f"{stride}-byte records")
+    # read-only view over the caller's buffer, no copy
+    return np.frombuffer(buffer, dtype=dtype)
+
+def flag_column(records, flag):
+    return (records["flags"] & flag) != 0
+
+def rgb_flag_column(records, flag):
+    return (records["rgb_flags"] & flag) != 0
+
+# Every flag bit as a boolean column: {"ARCIN_CONFIG_FLAG_250HZ_MODE": array, ...}
+def decode_flags(records):
+    flags = records["flags"]
+    rgb_flags = records["rgb_flags"]
+    columns = {name: (flags & bit) != 0 for name, bit in CONFIG_FLAGS.items()}
+    columns.update(
+        {name: (rgb_flags & bit) != 0 for name, bit in RGB_FLAGS.items()})
+    return columns
+
+def _field_value(record, name):
+    value = record[name].item()
+    if isinstance(value, bytes):
+        # numpy drops trailing NULs, unpack_config keeps them
+        value = value.ljust(record.dtype.fields[name][0].itemsize, b"\0")
+    return value
+
+# Same result as unpack_config() for one record
+def record_to_config(record):
+    return ArcinConfig._make(_field_value(record, name) for name in ArcinConfig._fields)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+# Last known config per controller, so loading a controller whose config we
+# already know needs no HID transfer at all.
+#
+# An entry is only trusted while the controller is still the same
+# enumeration of it: entries carry a fingerprint of (path, enumeration_id),
+# and a config write always reboots the controller, which changes the
+# enumeration id (the USB device number on Linux). A write by anyone
+# therefore makes the entry stale by itself, as long as it happens while this
+# process is watching. Backends without an enumeration id (pywinusb) can't
+# show a reboot in the fingerprint at all. Their entries only count as hits
+# once track() hooks the cache up to a DeviceWatcher, whose removal events
+# then drop them; a reboot short enough to fall between two of the watcher's
+# polls still goes unnoticed there.
+#
+# After our own write, put_written() keeps the new config pending until the
+# controller shows up again with a new fingerprint, which then adopts it.
+#
+# Entries are also kept on disk, but only as hints for the next session:
+# after a host reboot the kernel hands out the same node and device numbers
+# again, so nothing tells whether the controller was written to (from another
+# PC, say) in between. An entry read from disk is never a hit; hint() offers
+# it for display until the controller has been read again. At most
+# max_entries are kept, least recently used first out.
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from arcin_config import pack_config, unpack_config
+
+CACHE_PATH_ENV = "ARCIN_CONFIG_CACHE"
+DEFAULT_MAX_ENTRIES = 64
+CACHE_VERSION = 1
+
+def default_cache_path():
+    if CACHE_PATH_ENV in os.environ:
+        return os.environ[CACHE_PATH_ENV]
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "arcin-infinitas-conf", "configs.json")
+
+def device_fingerprint(device):
+    return (device.path, getattr(device, "enumeration_id", None))
+
+class CacheEntry:
+
+    def __init__(self, fingerprint, payload, pending=False, verified=True):
+        self.fingerprint = fingerprint
+        # packed config
+        self.payload = payload
+        # written by us, waiting for the controller to come back
+        self.pending = pending
+        # read or written in this session, as opposed to loaded from disk
+        self.verified = verified
+        self.stored = time.time()
+
+class ConfigCache:
+
+    # path: JSON file to persist to, None to keep everything in memory
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        # serial number => CacheEntry, least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # lookups that found only a hint from disk, or a device that can't be
+        # tracked across reboots
+        self.unverified = 0
+        # removals are reported by a DeviceWatcher, see track()
+        self.tracked = False
+        if path is not None:
+            self.__read__()
+
+    def __read__(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return
+            for serial_number, e in data["entries"].items():
+                entry = CacheEntry(
+                    tuple(e["fingerprint"]), bytes.fromhex(e["config"]), verified=False)
+                entry.stored = e["stored"]
+                self.entries[serial_number] = entry
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # a missing or damaged cache is just an empty one
+            self.entries.clear()
+
+    def __write__(self):
+        if self.path is None:
+            return
+        entries = {
+            serial_number: {
+                "fingerprint": list(e.fingerprint), "config": e.payload.hex(),
+                "stored": e.stored}
+            for serial_number, e in self.entries.items() if not e.pending}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump({"version": CACHE_VERSION, "entries": entries}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Failed to write config cache: {e}")
+
+    def __store__(self, serial_number, entry):
+        self.entries[serial_number] = entry
+        self.entries.move_to_end(serial_number)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        self.__write__()
+
+    # ArcinConfig, or None when the device has to be read
+    def get(self, device):
+        fingerprint = device_fingerprint(device)
+        with self.lock:
+            entry = self.entries.get(device.serial_number)
+            if entry is not None and (
+                    not entry.verified or (fingerprint[1] is None and not self.tracked)):
+                # left in place as a hint until the device is read
+                self.unverified += 1
+                entry = None
+            elif entry is not None and entry.pending and entry.fingerprint != fingerprint:
+                entry.fingerprint = fingerprint
+                entry.pending = False
+                self.__write__()
+            elif entry is not None and (entry.pending or entry.fingerprint != fingerprint):
+                if not entry.pending:
+                    del self.entries[device.serial_number]
+                    self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(device.serial_number)
+            self.hits += 1
+            return unpack_config(entry.payload)
+
+    # Last known config of serial_number, verified or not, for display only:
+    # it may no longer be what the controller holds.
+    def hint(self, serial_number):
+        with self.lock:
+            entry = self.entries.get(serial_number)
+            return None if entry is None else unpack_config(entry.payload)
+
+    # conf as just read from device
+    def put(self, device, conf):
+        with self.lock:
+            self.__store__(
+                device.serial_number, CacheEntry(device_fingerprint(device), pack_config(conf)))
+
+    # conf was just written to device, which is now rebooting
+    def put_written(self, device, conf):
+        with self.lock:
+            self.__store__(
+                device.serial_number,
+                CacheEntry(device_fingerprint(device), pack_config(conf), pending=True))
+
+    def invalidate(self, serial_number):
+        with self.lock:
+            entry = self.entries.get(serial_number)
+            if entry is None:
+                return
+            if entry.pending:
+                # the reboot after our write; whatever shows up next adopts
+                # it, even with an unchanged fingerprint
+                entry.fingerprint = None
+                return
+            del self.entries[serial_number]
+            self.invalidations += 1
+            self.__write__()
+
+    # Invalidates a controller's entry whenever watcher sees it go, which
+    # makes entries of devices without an enumeration id usable
+    def track(self, watcher):
+        watcher.add_listener(on_removed=self.invalidate)
+        with self.lock:
+            self.tracked = True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.__write__()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "unverified": self.unverified,
+            }
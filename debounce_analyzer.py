@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+
+# Recommends debounce_ticks from recorded switch chatter.
+#
+# Button states are streamed from the input reports (or an input_monitor.py
+# CSV export) and processed in fixed-size chunks with NumPy, so memory stays
+# bounded no matter how long the capture runs. Per button, transitions that
+# follow the previous one within the bounce window are chatter; the length of
+# the short-lived states inside those bursts is what the firmware's debounce
+# has to ride out. The recommendation is the smallest tick count (1 tick =
+# 1 ms) that covers them, since every extra tick is potential extra latency.
+#
+# The capture has to run with debouncing disabled on the controller: the
+# firmware filters chatter out before it reaches the host, so a debounced
+# capture looks clean and would talk debouncing out of the config. A
+# controller with debouncing on is refused, unless --disable-debounce turns it
+# off for the capture (a config write, so a reboot) and back on afterwards.
+#
+#   python debounce_analyzer.py --seconds 3600 --disable-debounce --apply
+
+import argparse
+import csv
+import sys
+import time
+import numpy as np
+from arcin_config import ARCIN_CONFIG_FLAG_DEBOUNCE
+from arcin_device import get_devices, load_from_device
+from device_lock import save_locked
+from device_watcher import DeviceWatcher
+from input_monitor import InputMonitor
+from reboot_tracker import RebootTracker
+
+NUM_BUTTONS = 16
+CHUNK_SIZE = 4096
+
+# a state that lasts less than this is treated as bounce, not a press/release
+DEFAULT_BOUNCE_WINDOW = 0.015
+
+# glitch durations are histogrammed in 0.25 ms bins across the bounce window
+GLITCH_BIN = 0.00025
+
+# watcher poll interval while waiting for reboots without udev events
+READY_POLL_INTERVAL = 0.05
+
+# range accepted by the firmware (see __extract_conf_from_gui__)
+DEBOUNCE_TICKS_MIN = 2
+DEBOUNCE_TICKS_MAX = 10
+
+# share of glitches the recommendation has to cover
+DEFAULT_COVERAGE = 99.9
+
+class DebounceAnalyzer:
+
+    def __init__(self, bounce_window=DEFAULT_BOUNCE_WINDOW, chunk_size=CHUNK_SIZE):
+        self.bounce_window = bounce_window
+        self.chunk_size = chunk_size
+
+        # pending samples, flushed through __process__ when full
+        self.timestamps = np.zeros(chunk_size, dtype=np.float64)
+        self.states = np.zeros(chunk_size, dtype=np.uint16)
+        self.pending = 0
+
+        # carried over between chunks
+        self.last_state = None
+        self.last_transition = np.full(NUM_BUTTONS, -np.inf)
+
+        bins = int(np.ceil(bounce_window / GLITCH_BIN))
+        self.glitch_histogram = np.zeros((NUM_BUTTONS, bins), dtype=np.int64)
+        self.transitions = np.zeros(NUM_BUTTONS, dtype=np.int64)
+        self.glitches = np.zeros(NUM_BUTTONS, dtype=np.int64)
+        self.longest_glitch = np.zeros(NUM_BUTTONS, dtype=np.float64)
+        self.samples = 0
+
+    # InputMonitor handler signature
+    def add_report(self, timestamp, buttons, axis_x=0, axis_y=0):
+        self.timestamps[self.pending] = timestamp
+        self.states[self.pending] = buttons
+        self.pending += 1
+        if self.pending == self.chunk_size:
+            self.flush()
+
+    def add_samples(self, timestamps, states):
+        self.flush()
+        for start in range(0, len(timestamps), self.chunk_size):
+            self.__process__(
+                np.asarray(timestamps[start:start + self.chunk_size], dtype=np.float64),
+                np.asarray(states[start:start + self.chunk_size], dtype=np.uint16))
+
+    def flush(self):
+        if self.pending:
+            self.__process__(self.timestamps[:self.pending], self.states[:self.pending])
+            self.pending = 0
+
+    def __process__(self, timestamps, states):
+        if len(states) == 0:
+            return
+        self.samples += len(states)
+
+        if self.last_state is None:
+            previous = np.concatenate(([states[0]], states[:-1]))
+        else:
+            previous = np.concatenate(([self.last_state], states[:-1]))
+        changed = states ^ previous
+        self.last_state = states[-1]
+
+        for button in range(NUM_BUTTONS):
+            mask = (changed >> button) & 1
+            times = timestamps[mask.astype(bool)]
+            if len(times) == 0:
+                continue
+            # how long the state before each transition lasted
+            durations = np.diff(times, prepend=self.last_transition[button])
+            self.last_transition[button] = times[-1]
+            self.transitions[button] += len(times)
+
+            glitches = durations[durations < self.bounce_window]
+            if len(glitches) == 0:
+                continue
+            self.glitches[button] += len(glitches)
+            self.longest_glitch[button] = max(self.longest_glitch[button], glitches.max())
+            bins = np.minimum(
+                (glitches / GLITCH_BIN).astype(np.int64), self.glitch_histogram.shape[1] - 1)
+            self.glitch_histogram[button] += np.bincount(
+                bins, minlength=self.glitch_histogram.shape[1])
+
+    # glitch length (seconds) covering `coverage` percent of all glitches
+    def glitch_percentile(self, coverage=DEFAULT_COVERAGE, button=None):
+        histogram = (
+            self.glitch_histogram.sum(axis=0) if button is None
+            else self.glitch_histogram[button])
+        total = histogram.sum()
+        if total == 0:
+            return 0.0
+        cumulative = np.cumsum(histogram)
+        index = int(np.searchsorted(cumulative, total * coverage / 100))
+        return (index + 1) * GLITCH_BIN
+
+    # (debounce_ticks, enable_debounce, glitch length covered in seconds)
+    def recommend(self, coverage=DEFAULT_COVERAGE):
+        self.flush()
+        if self.glitches.sum() == 0:
+            return (DEBOUNCE_TICKS_MIN, False, 0.0)
+        covered = self.glitch_percentile(coverage)
+        # a state has to be held for more than `ticks` ms to get through
+        ticks = int(np.floor(covered * 1000)) + 1
+        ticks = min(DEBOUNCE_TICKS_MAX, max(DEBOUNCE_TICKS_MIN, ticks))
+        return (ticks, True, covered)
+
+    def report(self, coverage=DEFAULT_COVERAGE):
+        self.flush()
+        lines = [f"{'button':>6} {'transitions':>11} {'glitches':>8} "
+                 f"{'p' + str(coverage) + ' ms':>10} {'max ms':>7}"]
+        for button in range(NUM_BUTTONS):
+            if self.transitions[button] == 0:
+                continue
+            lines.append(
+                f"{button + 1:>6} {self.transitions[button]:>11} "
+                f"{self.glitches[button]:>8} "
+                f"{self.glitch_percentile(coverage, button) * 1000:>10.2f} "
+                f"{self.longest_glitch[button] * 1000:>7.2f}")
+        return "\n".join(lines)
+
+def apply_recommendation(conf, debounce_ticks, enable):
+    flags = conf.flags & ~ARCIN_CONFIG_FLAG_DEBOUNCE
+    if enable:
+        flags |= ARCIN_CONFIG_FLAG_DEBOUNCE
+    return conf._replace(flags=flags, debounce_ticks=debounce_ticks)
+
+def analyze_csv(analyzer, path):
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader)
+        timestamps = np.zeros(analyzer.chunk_size, dtype=np.float64)
+        states = np.zeros(analyzer.chunk_size, dtype=np.uint16)
+        count = 0
+        for row in reader:
+            timestamps[count] = float(row[0])
+            states[count] = int(row[1])
+            count += 1
+            if count == analyzer.chunk_size:
+                analyzer.add_samples(timestamps, states)
+                count = 0
+        analyzer.add_samples(timestamps[:count], states[:count])
+
+def capture(device, analyzer, seconds):
+    monitor = InputMonitor(device, capacity=1)
+    monitor.handlers.append(analyzer.add_report)
+    monitor.start()
+    print(f"Capturing from {device.serial_number} for {seconds:.0f} s, "
+          "press Ctrl+C to stop early...")
+    try:
+        end = time.monotonic() + seconds
+        while time.monotonic() < end and monitor.is_running():
+            time.sleep(0.5)
+    finally:
+        monitor.stop()
+    if monitor.error is not None:
+        print(f"Capture stopped: {monitor.error}")
+
+# Writes conf and returns the device once it is back from the reboot, or None.
+# tracker is a RebootTracker on a running DeviceWatcher.
+def write_config(device, conf, tracker):
+    serial_number = device.serial_number
+    tracker.expect(serial_number)
+    result, message = save_locked(device, conf)
+    print(message)
+    if not result:
+        tracker.cancel(serial_number)
+        return None
+    recovery = tracker.wait(serial_number, expected=conf)
+    if not recovery.ok:
+        print(f"{serial_number}: {recovery.error}")
+        return None
+    return tracker.watcher.get_device(serial_number)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Recommend debounce_ticks from recorded button chatter.")
+    parser.add_argument("--serial", default=None, help="device to capture (default: first)")
+    parser.add_argument("--transport", default=None)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--from-csv", default=None,
+        help="analyze an input_monitor.py CSV export instead of capturing")
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_BOUNCE_WINDOW * 1000,
+        help="states shorter than this count as bounce")
+    parser.add_argument("--coverage", type=float, default=DEFAULT_COVERAGE,
+        help="percent of glitches the recommendation must cover")
+    parser.add_argument("--apply", action="store_true",
+        help="write the recommendation to the device")
+    parser.add_argument("--disable-debounce", action="store_true",
+        help="turn debouncing off for the capture if it is on, and back on afterwards")
+    args = parser.parse_args(argv)
+
+    analyzer = DebounceAnalyzer(args.window_ms / 1000)
+
+    device = None
+    conf = None
+    # config to put back after the capture, if it had to be changed for it
+    restore = None
+    if args.from_csv:
+        analyze_csv(analyzer, args.from_csv)
+    else:
+        devices = get_devices(transport=args.transport)
+        if args.serial:
+            devices = [d for d in devices if d.serial_number == args.serial]
+        if len(devices) == 0:
+            print("No devices found.")
+            return 1
+        device = devices[0]
+
+        conf = load_from_device(device)
+        if conf is None:
+            print("Failed to read config from device.")
+            return 1
+        watcher = None
+        tracker = None
+        try:
+            if conf.flags & ARCIN_CONFIG_FLAG_DEBOUNCE:
+                if not args.disable_debounce:
+                    print("Debouncing is enabled on the device, so chatter never reaches "
+                          "the host. Disable it first, or pass --disable-debounce.")
+                    return 1
+                watcher = DeviceWatcher(
+                    transport=args.transport, poll_interval=READY_POLL_INTERVAL)
+                watcher.start()
+                tracker = RebootTracker(watcher)
+                device = write_config(
+                    device, conf._replace(flags=conf.flags & ~ARCIN_CONFIG_FLAG_DEBOUNCE),
+                    tracker)
+                if device is None:
+                    return 1
+                restore = conf
+
+            try:
+                capture(device, analyzer, args.seconds)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if restore is not None and not args.apply:
+                    print("Restoring the debounce settings.")
+                    device = write_config(device, restore, tracker)
+            if restore is not None and not args.apply and device is None:
+                return 1
+        finally:
+            if tracker is not None:
+                tracker.close()
+            if watcher is not None:
+                watcher.stop()
+
+    ticks, enable, covered = analyzer.recommend(args.coverage)
+    print(analyzer.report(args.coverage))
+    print(f"{analyzer.samples} samples, {analyzer.glitches.sum()} glitches")
+    if enable:
+        print(f"Recommendation: enable debouncing, debounce_ticks = {ticks} "
+              f"(covers glitches up to {covered * 1000:.2f} ms)")
+        if covered * 1000 >= DEBOUNCE_TICKS_MAX:
+            print("Warning: chatter lasts longer than the largest supported "
+                  "setting, the switch probably needs replacing.")
+    else:
+        print("Recommendation: no chatter seen, leave debouncing off.")
+
+    if args.apply:
+        if device is None:
+            print("--apply needs a device capture.")
+            return 1
+        # on top of the config from before the capture
+        result, message = save_locked(device, apply_recommendation(conf, ticks, enable))
+        print(message)
+        return 0 if result else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Per-controller lock shared between processes, so two tool instances (the
+# GUI and provision.py, or two rollouts) never write to the same controller at
+# once. Each serial number has a lock file in $ARCIN_LOCK_DIR (default
+# <tempdir>/arcin-locks); the lock is an OS file lock (flock on POSIX,
+# msvcrt.locking on Windows), which the OS releases when the process dies, so
+# a crashed run never leaves a stale lock behind.
+#
+#   with DeviceLock(device.serial_number, timeout=5):
+#       save_to_device(device, conf)
+#
+# or simply save_locked(device, conf).
+
+import os
+import sys
+import tempfile
+import time
+from arcin_device import save_to_device, reboot_device
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+LOCK_DIR_ENV = "ARCIN_LOCK_DIR"
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), "arcin-locks")
+
+LOCK_RETRY_INTERVAL = 0.05
+
+class DeviceLocked(IOError):
+    pass
+
+def lock_dir():
+    return os.environ.get(LOCK_DIR_ENV, DEFAULT_LOCK_DIR)
+
+def _lock_name(serial_number):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in serial_number) + ".lock"
+
+def _try_lock(fd):
+    try:
+        if sys.platform == "win32":
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd):
+    if sys.platform == "win32":
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+class DeviceLock:
+
+    # timeout: seconds to wait for another process to let go, 0 to fail at
+    # once, None to wait forever
+    def __init__(self, serial_number, timeout=0, directory=None):
+        self.serial_number = serial_number
+        self.timeout = timeout
+        self.directory = directory if directory is not None else lock_dir()
+        self.path = os.path.join(self.directory, _lock_name(serial_number))
+        self.fd = None
+
+    def acquire(self):
+        if self.fd is not None:
+            raise RuntimeError(f"{self.serial_number}: lock already held")
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not _try_lock(fd):
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                raise DeviceLocked(
+                    f"{self.serial_number}: in use by another process ({self.path})")
+            time.sleep(LOCK_RETRY_INTERVAL)
+        # for whoever finds the controller locked
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self.fd = fd
+
+    def release(self):
+        if self.fd is None:
+            return
+        fd, self.fd = self.fd, None
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+# save_to_device() holding the controller's lock; another process writing to
+# it is reported like any other failed save
+def save_locked(device, conf, pool=None, force=False, timeout=0):
+    try:
+        with DeviceLock(device.serial_number, timeout):
+            return save_to_device(device, conf, pool, force)
+    except DeviceLocked as e:
+        print(e)
+        return (False, "Device is in use by another program")
+
+def reboot_locked(device, pool=None, timeout=0):
+    with DeviceLock(device.serial_number, timeout):
+        reboot_device(device, pool)
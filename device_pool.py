@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Keeps device handles open across operations instead of paying for
+# open()/close() (and, with pywinusb, report discovery) on every transfer.
+#
+# Sessions are keyed by serial number. A handle that fails is dropped and the
+# device is looked up again by serial, which is what happens after the
+# post-save reboot: the old handle is dead and the controller comes back as a
+# new device.
+
+import threading
+import time
+from arcin_config import VID, PID
+from hid_transport import get_transport
+from hid_metrics import span
+
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+class DeviceSession:
+
+    def __init__(self, device):
+        self.device = device
+        self.last_used = time.monotonic()
+        self.lock = threading.RLock()
+
+class DevicePool:
+
+    def __init__(self, vendor_id=VID, product_id=PID, transport=None,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.transport = transport
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.closed = False
+
+        if idle_timeout:
+            reaper = threading.Thread(target=self.__reap__, daemon=True)
+            reaper.start()
+
+    def find_device(self, serial_number):
+        transport = get_transport(self.transport)
+        with span("enumerate"):
+            devices = transport.enumerate(self.vendor_id, self.product_id)
+        for device in devices:
+            if device.serial_number == serial_number:
+                return device
+        return None
+
+    def __acquire__(self, device, reconnect):
+        serial_number = device.serial_number
+        with self.lock:
+            session = self.sessions.get(serial_number)
+        if session is not None:
+            return session
+
+        if reconnect:
+            device = self.find_device(serial_number)
+            if device is None:
+                raise IOError(f"{serial_number}: device not connected")
+
+        # open outside the pool lock so a slow device doesn't hold up the rest
+        with span("open"):
+            device.open()
+        with self.lock:
+            session = self.sessions.get(serial_number)
+            if session is None:
+                session = DeviceSession(device)
+                self.sessions[serial_number] = session
+                return session
+        # someone else got there first
+        device.close()
+        return session
+
+    # Runs func(open_device) with the device's session held. A failing handle
+    # is reopened once, unless the operation isn't safe to repeat.
+    def call(self, device, func, retry=True):
+        attempts = 2 if retry else 1
+        for attempt in range(attempts):
+            try:
+                session = self.__acquire__(device, reconnect=(attempt > 0))
+            except OSError:
+                # the handle we were given may be stale already
+                if attempt == attempts - 1:
+                    raise
+                continue
+            with session.lock:
+                try:
+                    result = func(session.device)
+                    session.last_used = time.monotonic()
+                    return result
+                except OSError:
+                    self.invalidate(device.serial_number, session)
+                    if attempt == attempts - 1:
+                        raise
+
+    def invalidate(self, serial_number, session=None):
+        with self.lock:
+            current = self.sessions.get(serial_number)
+            if current is None or (session is not None and current is not session):
+                return
+            del self.sessions[serial_number]
+        self.__close_session__(current)
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self.lock:
+            idle = [
+                (serial_number, session)
+                for serial_number, session in self.sessions.items()
+                if now - session.last_used >= self.idle_timeout]
+        for serial_number, session in idle:
+            # don't wait on a session that is in use right now
+            if session.lock.acquire(blocking=False):
+                try:
+                    self.invalidate(serial_number, session)
+                finally:
+                    session.lock.release()
+
+    def close_all(self):
+        self.closed = True
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            self.__close_session__(session)
+
+    def __close_session__(self, session):
+        try:
+            with span("close"):
+                session.device.close()
+        except Exception:
+            # counted by the span; the handle is being dropped either way
+            pass
+
+    def __reap__(self):
+        while not self.closed:
+            time.sleep(max(1.0, self.idle_timeout / 4))
+            self.evict_idle()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Tracks controllers coming and going, keyed by serial number.
+#
+# On Linux with pyudev installed, hidraw add/remove events from udev trigger a
+# rescan; otherwise (and as a safety net) the device list is polled. A rescan
+# only diffs the enumeration against what is already known, so callers get
+# one on_added/on_removed call per change instead of rebuilding everything.
+#
+# on_added(device) is also called when a known serial comes back as a new
+# device object (e.g. after a reboot). Callbacks run on the watcher thread, or
+# on whichever thread called rescan().
+# More (on_added, on_removed) pairs can be attached with add_listener().
+
+import threading
+from arcin_config import VID, PID
+from hid_transport import get_transport
+
+try:
+    import pyudev
+except ImportError:
+    pyudev = None
+
+DEFAULT_POLL_INTERVAL = 1.0
+# with udev events, polling only guards against missed events
+UDEV_POLL_INTERVAL = 10.0
+
+# hidraw can hand a rebooted controller the same node, so the path alone
+# doesn't tell a re-enumeration apart
+def _same_device(known, device):
+    return (known.path == device.path and
+        getattr(known, "enumeration_id", None) == getattr(device, "enumeration_id", None))
+
+class DeviceWatcher:
+
+    def __init__(self, on_added=None, on_removed=None,
+                 vendor_id=VID, product_id=PID, transport=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.listeners = [(on_added, on_removed)]
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.transport = get_transport(transport)
+        self.poll_interval = poll_interval
+
+        # serial number => device
+        self.devices = {}
+        self.lock = threading.Lock()
+        # one rescan at a time, so listeners see events in order
+        self.rescan_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def uses_udev(self):
+        return pyudev is not None and self.transport.name == "hidraw"
+
+    # wait=False does the first scan on the watcher's thread as well, for
+    # callers that mustn't block (the GUI thread); the devices found are
+    # reported through on_added like later changes
+    def start(self, wait=True):
+        if wait:
+            self.rescan()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.__run__, args=(not wait,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def add_listener(self, on_added=None, on_removed=None):
+        with self.lock:
+            self.listeners = self.listeners + [(on_added, on_removed)]
+
+    def remove_listener(self, on_added=None, on_removed=None):
+        with self.lock:
+            self.listeners = [
+                l for l in self.listeners if l != (on_added, on_removed)]
+
+    def get_device(self, serial_number):
+        with self.lock:
+            return self.devices.get(serial_number)
+
+    def rescan(self):
+        with self.rescan_lock:
+            self.__rescan__()
+
+    # rescan() on a thread of its own, for callers that mustn't block (the
+    # GUI thread); changes are reported through the listeners as usual
+    def rescan_async(self):
+        threading.Thread(target=self.__safe_rescan__, daemon=True).start()
+
+    def __rescan__(self):
+        found = {}
+        for device in self.transport.enumerate(self.vendor_id, self.product_id):
+            # composite devices show up once per interface; keep the first
+            found.setdefault(device.serial_number, device)
+
+        with self.lock:
+            removed = [s for s in self.devices if s not in found]
+            added = [
+                device for serial_number, device in found.items()
+                if serial_number not in self.devices or
+                not _same_device(self.devices[serial_number], device)]
+            for serial_number in removed:
+                del self.devices[serial_number]
+            for device in added:
+                self.devices[device.serial_number] = device
+            listeners = self.listeners
+
+        for serial_number in removed:
+            for _, on_removed in listeners:
+                if on_removed:
+                    on_removed(serial_number)
+        for device in added:
+            for on_added, _ in listeners:
+                if on_added:
+                    on_added(device)
+
+    def __run__(self, scan_first):
+        if scan_first:
+            self.__safe_rescan__()
+        if self.uses_udev():
+            self.__udev_loop__()
+        else:
+            self.__poll_loop__()
+
+    def __poll_loop__(self):
+        while not self.stop_event.wait(self.poll_interval):
+            self.__safe_rescan__()
+
+    def __udev_loop__(self):
+        context = pyudev.Context()
+        monitor = pyudev.Monitor.from_netlink(context)
+        monitor.filter_by("hidraw")
+        monitor.start()
+        while not self.stop_event.is_set():
+            monitor.poll(timeout=UDEV_POLL_INTERVAL)
+            self.__safe_rescan__()
+
+    def __safe_rescan__(self):
+        try:
+            self.rescan()
+        except Exception as e:
+            print(f"Device rescan failed: {e}")
@@ -1,62 +1,545 @@
-#!/usr/bin/env python3
-
-import tinycss2
-from collections import namedtuple
-
-# extract palettes: https://colorpalettefromimage.com/
-# extract gradient: https://slaton.info/projects/fastled-gradient-tool/index.html
-# generating gradient: https://cssgradient.io/
-
-hv = """
-    rgba(128,0,128,1) 0%, rgba(79,43,154,1) 17%, rgba(218,7,218,1) 73%, rgba(128,0,128,1) 100%
-    """
-emp = """
-    rgba(255,0,255,1) 0%, rgba(202,2,43,1) 49%, rgba(89,31,40,1) 100%
-    """
-
-Color = namedtuple('Color', 'r g b a o')
-
-def split_into_elements(full_text):
-    s = full_text.replace('\n', '')
-    s = s.replace(' ', '')
-    return s.split('%,')
-
-def strip_chars(color):
-    # rgba(230,239,245,1)15
-    s = color.replace('%', '')
-    s = s.replace('rgba(', '')
-    s = s.replace(')', ',')
-    sz = s.split(',')
-
-    c = Color(int(sz[0]), int(sz[1]), int(sz[2]), int(sz[3]), int(int(sz[4]) / 100 * 255))
-    return c
-
-def convert_to_c_array(color):
-    return f'{color.o}, 0x{color.r:02x}, 0x{color.g:02x}, 0x{color.b:02x},\n'
-
-def convert_css_into_c_array(css):
-    elements = split_into_elements(css)
-    colors = [strip_chars(c) for c in elements]
-    if colors[0].o != 0:
-        assert False, "Must begin with 0"
-    if colors[-1].o != 255:
-        assert False, "Must end with 255"
-    if ((colors[0].r != colors[-1].r) or
-       (colors[0].g != colors[-1].g) or
-       (colors[0].b != colors[-1].b)):
-        #assert False, "Must start and end the same"
-        pass
-    
-    result_str = '{\n'
-    for c in colors:
-        result_str += "    " + convert_to_c_array(c)
-
-    # remove the last comma
-    result_str = (result_str[:-2])
-    result_str += '\n};\n'
-    return result_str
-
-print(convert_css_into_c_array(hv))
-print(convert_css_into_c_array(emp))
-
-pass
+#!/usr/bin/env python3
+
+# Palette compiler: turns the CSS gradients in palettes/*.css into
+#   - FastLED DEFINE_GRADIENT_PALETTE arrays for the firmware (C header)
+#   - palette_data.py with the RGB_TT_PALETTES names, the gradient stops and
+#     256-entry RGB lookup tables used by the preview renderer
+# so both sides come from the same source. Files are compiled in name order,
+# which is the order of the palette indices stored in rgb_mode_options.
+#
+# Each file holds one or more rules like
+#   .palette {
+#       --palette-name: "HeroicVerse";
+#       background: linear-gradient(90deg, rgba(128,0,128,1) 0%, ...);
+#   }
+#
+# A palette without a known gradient (one neither taken from the firmware nor
+# extracted from the artwork) is a rule with only its --palette-name, which
+# keeps its index. It is left out of the firmware header, which then can't
+# carry the tt_palettes[] table either: the firmware keeps its own entries for
+# those indices. It has no lookup table (None in PALETTE_LUTS), so the preview
+# shows nothing for it, and compiling warns about it. The real gradients can
+# be taken over from a firmware header with --import-header, which rewrites
+# the CSS of every palette it finds there (matched by tt_palettes[] index when
+# the header has the table, else by array name).
+#
+# Compiled palettes are cached by content hash, so only files that changed
+# are parsed again.
+#
+# Every stop costs 4 bytes of firmware flash. With --max-error, each palette
+# is reduced to the fewest stops whose interpolation stays within that many
+# levels (per channel, per lookup table entry) of the source gradient, so
+# high-resolution gradients can be pasted in as they come out of the tools.
+#
+#   python gradient.py                  (all of palettes/*.css)
+#   python gradient.py --max-error 2 --report
+#   python gradient.py palettes/08-heroicverse.css --c-out hv.h --py-out -
+#   python gradient.py --import-header firmware/tt_palettes.h
+
+# extract palettes: https://colorpalettefromimage.com/
+# extract gradient: https://slaton.info/projects/fastled-gradient-tool/index.html
+# generating gradient: https://cssgradient.io/
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+import numpy as np
+import tinycss2
+import tinycss2.color3
+
+# bump whenever compiled output changes, so cached results are dropped
+COMPILER_VERSION = 4
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PALETTE_DIR = os.path.join(BASE_DIR, "palettes")
+DEFAULT_CACHE_DIR = os.path.join(PALETTE_DIR, ".cache")
+DEFAULT_C_OUTPUT = os.path.join(PALETTE_DIR, "tt_palettes.h")
+DEFAULT_PY_OUTPUT = os.path.join(BASE_DIR, "palette_data.py")
+
+LUT_SIZE = 256
+
+# bytes of flash per gradient stop (position, r, g, b)
+STOP_SIZE = 4
+
+# o: position 0-255 within the palette
+GradientStop = namedtuple("GradientStop", "o r g b")
+
+# lut: LUT_SIZE * 3 bytes of RGB, computed from stops
+# source_stops: the stops as written, before optimization
+# stops, lut and source_stops are None for a palette without a known gradient
+Palette = namedtuple("Palette", "name stops lut source_stops")
+
+class PaletteError(ValueError):
+    pass
+
+def _split_arguments(tokens):
+    arguments = [[]]
+    for token in tokens:
+        if token.type == "literal" and token.value == ",":
+            arguments.append([])
+        elif token.type not in ("whitespace", "comment"):
+            arguments[-1].append(token)
+    return arguments
+
+# linear-gradient(...) arguments => GradientStops
+def parse_gradient(function, source):
+    stops = []
+    for argument in _split_arguments(function.arguments):
+        if len(argument) == 0:
+            raise PaletteError(f"{source}: empty gradient argument")
+        color = tinycss2.color3.parse_color(argument[0])
+        if color is None:
+            # the direction ("90deg", "to right") has no color
+            if stops:
+                raise PaletteError(f"{source}: invalid color stop {tinycss2.serialize(argument)}")
+            continue
+        if len(argument) > 2 or (len(argument) == 2 and argument[1].type != "percentage"):
+            raise PaletteError(f"{source}: stop positions must be percentages")
+        percent = argument[1].value if len(argument) == 2 else None
+        stops.append([color, percent])
+
+    if len(stops) < 2:
+        raise PaletteError(f"{source}: a gradient needs at least two color stops")
+
+    # CSS rules for stops without a position: the ends default to 0% and
+    # 100%, anything in between is spread evenly
+    if stops[0][1] is None:
+        stops[0][1] = 0
+    if stops[-1][1] is None:
+        stops[-1][1] = 100
+    last = 0
+    for i in range(1, len(stops)):
+        if stops[i][1] is None:
+            continue
+        gap = i - last
+        for j in range(last + 1, i):
+            stops[j][1] = stops[last][1] + (stops[i][1] - stops[last][1]) * (j - last) / gap
+        last = i
+
+    result = [
+        GradientStop(
+            int(percent / 100 * 255),
+            round(color.red * 255), round(color.green * 255), round(color.blue * 255))
+        for color, percent in stops]
+
+    if result[0].o != 0:
+        raise PaletteError(f"{source}: must begin with 0%")
+    if result[-1].o != 255:
+        raise PaletteError(f"{source}: must end with 100%")
+    if any(b.o < a.o for a, b in zip(result, result[1:])):
+        raise PaletteError(f"{source}: stop positions must not decrease")
+    return result
+
+# CSS text => [(name, stops or None)]
+def parse_palette_css(text, source="<css>"):
+    palettes = []
+    rules = tinycss2.parse_stylesheet(text, skip_comments=True, skip_whitespace=True)
+    for rule in rules:
+        if rule.type == "error":
+            raise PaletteError(f"{source}: {rule.message}")
+        if rule.type != "qualified-rule":
+            continue
+        name = None
+        stops = None
+        declarations = tinycss2.parse_declaration_list(
+            rule.content, skip_comments=True, skip_whitespace=True)
+        for declaration in declarations:
+            if declaration.type != "declaration":
+                continue
+            values = [t for t in declaration.value if t.type not in ("whitespace", "comment")]
+            if declaration.lower_name == "--palette-name":
+                if len(values) != 1 or values[0].type != "string":
+                    raise PaletteError(f"{source}: --palette-name must be a string")
+                name = values[0].value
+            elif declaration.lower_name in ("background", "background-image"):
+                for value in values:
+                    if value.type == "function" and value.lower_name == "linear-gradient":
+                        stops = parse_gradient(value, source)
+        if name is None:
+            if stops is None:
+                continue
+            raise PaletteError(f"{source}: gradient without --palette-name")
+        palettes.append((name, stops))
+    return palettes
+
+# 256-entry RGB lookup table, linearly interpolated between the stops
+def gradient_lut(stops):
+    index = np.arange(LUT_SIZE)
+    positions = [s.o for s in stops]
+    lut = np.stack([
+        np.interp(index, positions, [s[channel] for s in stops])
+        for channel in (1, 2, 3)], axis=1)
+    return np.rint(lut).astype(np.uint8)
+
+# ok[i, j]: interpolating straight from entry i to entry j stays within
+# max_error of every entry in between. Each row is one vectorized pass over
+# all end points and entries at once.
+def segment_table(lut, max_error):
+    lut = np.asarray(lut, dtype=np.float64)
+    size = len(lut)
+    ok = np.zeros((size, size), dtype=bool)
+    for i in range(size - 1):
+        ends = np.arange(i + 1, size)
+        entries = np.arange(i, size)
+        frac = (entries[None, :] - i) / (ends[:, None] - i)
+        predicted = lut[i] + (lut[ends] - lut[i])[:, None, :] * frac[:, :, None]
+        error = np.abs(predicted - lut[i:]).max(axis=2)
+        # entries past the end point belong to later segments
+        error[entries[None, :] > ends[:, None]] = 0
+        ok[i, i + 1:] = error.max(axis=1) <= max_error
+    return ok
+
+# Fewest stops reproducing lut within max_error: shortest path from entry 0
+# to the last entry over the segments allowed by segment_table().
+def optimize_lut_stops(lut, max_error):
+    lut = np.asarray(lut)
+    ok = segment_table(lut, max_error)
+    size = len(lut)
+    count = np.full(size, size + 1, dtype=np.int64)
+    previous = np.zeros(size, dtype=np.int64)
+    count[0] = 1
+    for j in range(1, size):
+        candidates = np.where(ok[:j, j], count[:j], size + 1)
+        best = int(np.argmin(candidates))
+        count[j] = candidates[best] + 1
+        previous[j] = best
+
+    positions = [size - 1]
+    while positions[-1] != 0:
+        positions.append(int(previous[positions[-1]]))
+    positions.reverse()
+    return [GradientStop(p, *(int(c) for c in lut[p])) for p in positions]
+
+def lut_error(lut, reference):
+    return int(np.abs(lut.astype(np.int64) - reference.astype(np.int64)).max())
+
+# Optimized stops for a gradient, or the original ones if they are already
+# at least as small
+def optimize_stops(stops, max_error):
+    lut = gradient_lut(stops)
+    # leave room for rounding the interpolated table to whole levels
+    optimized = optimize_lut_stops(lut, max(0.0, max_error - 0.5))
+    if len(optimized) >= len(stops):
+        return stops
+    return optimized
+
+def convert_to_c_array(stop):
+    return f'{stop.o}, 0x{stop.r:02x}, 0x{stop.g:02x}, 0x{stop.b:02x},\n'
+
+def convert_stops_into_c_array(stops):
+    result_str = '{\n'
+    for stop in stops:
+        result_str += "    " + convert_to_c_array(stop)
+
+    # remove the last comma
+    result_str = (result_str[:-2])
+    result_str += '\n};\n'
+    return result_str
+
+def c_identifier(name):
+    return "".join(c if c.isalnum() else "_" for c in name.lower()) + "_gp"
+
+def _stops_to_json(stops):
+    return None if stops is None else [list(s) for s in stops]
+
+def _stops_from_json(stops):
+    return None if stops is None else [GradientStop(*s) for s in stops]
+
+class PaletteCompiler:
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_error=None):
+        self.cache_dir = cache_dir
+        self.max_error = max_error
+        self.compiled = 0
+        self.cached = 0
+
+    def __cache_path__(self, content):
+        digest = hashlib.sha256(
+            f"gradient.py {COMPILER_VERSION} {self.max_error}\0".encode() + content).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".json")
+
+    def compile_file(self, path):
+        with open(path, "rb") as f:
+            content = f.read()
+
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = self.__cache_path__(content)
+            try:
+                with open(cache_path, "r") as f:
+                    entries = json.load(f)
+                self.cached += 1
+                return [
+                    Palette(e["name"], _stops_from_json(e["stops"]),
+                            None if e["lut"] is None else bytes.fromhex(e["lut"]),
+                            _stops_from_json(e["source_stops"]))
+                    for e in entries]
+            except (OSError, ValueError, KeyError):
+                pass
+
+        palettes = []
+        for name, source_stops in parse_palette_css(content.decode("utf-8"), path):
+            if source_stops is None:
+                palettes.append(Palette(name, None, None, None))
+                continue
+            stops = source_stops
+            if self.max_error is not None:
+                stops = optimize_stops(source_stops, self.max_error)
+            palettes.append(Palette(name, stops, gradient_lut(stops).tobytes(), source_stops))
+        self.compiled += 1
+
+        if cache_path is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write-then-rename so a concurrent run never reads half a file
+            temp_path = cache_path + f".{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump([
+                    {"name": p.name, "stops": _stops_to_json(p.stops),
+                     "lut": None if p.lut is None else p.lut.hex(),
+                     "source_stops": _stops_to_json(p.source_stops)}
+                    for p in palettes], f)
+            os.replace(temp_path, cache_path)
+        return palettes
+
+    def compile_files(self, paths):
+        palettes = []
+        for path in paths:
+            palettes.extend(self.compile_file(path))
+        names = [p.name for p in palettes]
+        duplicates = sorted(set(n for n in names if names.count(n) > 1))
+        if duplicates:
+            raise PaletteError(f"Duplicate palette names: {', '.join(duplicates)}")
+        return palettes
+
+def palette_files(directory=PALETTE_DIR):
+    return sorted(glob.glob(os.path.join(directory, "*.css")))
+
+def generate_c_header(palettes):
+    lines = ["// Generated by gradient.py from palettes/*.css, do not edit.\n",
+             "#pragma once\n"]
+    unknown = [(i, p.name) for i, p in enumerate(palettes) if p.stops is None]
+    if unknown:
+        lines.append(
+            "\n// Left out, there is no known gradient for them here; the\n"
+            "// firmware's own definitions stay authoritative:\n")
+        for index, name in unknown:
+            lines.append(f"//   {index}: {name}\n")
+        lines.append(
+            "//\n"
+            "// No tt_palettes[] table is generated: its indices are the palette\n"
+            "// numbers stored in the config, so a table with entries missing or\n"
+            "// stubbed would select the wrong (or no) palette. Keep the firmware's\n"
+            "// table, or import its header with gradient.py --import-header.\n")
+    for index, palette in enumerate(palettes):
+        if palette.stops is None:
+            continue
+        lines.append(f"\n// {index}: {palette.name}\n")
+        lines.append(f"DEFINE_GRADIENT_PALETTE( {c_identifier(palette.name)} ) ")
+        lines.append(convert_stops_into_c_array(palette.stops))
+    if not unknown:
+        lines.append("\nconst TProgmemRGBGradientPalettePtr tt_palettes[] = {\n")
+        for palette in palettes:
+            lines.append(f"    {c_identifier(palette.name)},\n")
+        lines.append("};\n")
+    return "".join(lines)
+
+C_COMMENT = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+C_GRADIENT = re.compile(r"DEFINE_GRADIENT_PALETTE\s*\(\s*(\w+)\s*\)\s*\{([^}]*)\}")
+C_PALETTE_TABLE = re.compile(r"tt_palettes\s*\[\s*\]\s*=\s*\{([^}]*)\}")
+
+# C header text => ({array name: GradientStops}, [array names in tt_palettes[]]
+# or None without the table)
+def parse_c_header(text, source="<header>"):
+    text = C_COMMENT.sub(" ", text)
+    gradients = {}
+    for match in C_GRADIENT.finditer(text):
+        name = match.group(1)
+        try:
+            values = [int(v, 0) for v in match.group(2).replace(",", " ").split()]
+        except ValueError:
+            raise PaletteError(f"{source}: {name}: entries must be integers")
+        if len(values) % 4 or len(values) < 8 or any(v < 0 or v > 255 for v in values):
+            raise PaletteError(f"{source}: {name}: expected at least two (position, r, g, b) stops")
+        stops = [GradientStop(*values[i:i + 4]) for i in range(0, len(values), 4)]
+        if stops[0].o != 0 or stops[-1].o != 255:
+            raise PaletteError(f"{source}: {name}: must begin at 0 and end at 255")
+        if any(b.o < a.o for a, b in zip(stops, stops[1:])):
+            raise PaletteError(f"{source}: {name}: stop positions must not decrease")
+        gradients[name] = stops
+    match = C_PALETTE_TABLE.search(text)
+    table = None
+    if match is not None:
+        table = [t.strip() for t in match.group(1).split(",") if t.strip()]
+    return gradients, table
+
+# a stop position in percent that parse_gradient() maps back onto stop.o
+def _css_percent(o):
+    if o in (0, 255):
+        return f"{o * 100 // 255}%"
+    return f"{(o + 0.5) / 2.55:.3f}%"
+
+def palette_css(name, stops, comment=None):
+    lines = []
+    if comment is not None:
+        lines.append(f"/* {name}: {comment} */\n")
+    lines.append(".palette {\n")
+    lines.append(f"    --palette-name: {json.dumps(name)};\n")
+    if stops is None:
+        lines.append("}\n")
+        return "".join(lines)
+    lines.append("    background: linear-gradient(\n        90deg")
+    for stop in stops:
+        lines.append(f",\n        rgba({stop.r},{stop.g},{stop.b},1) {_css_percent(stop.o)}")
+    lines.append(");\n}\n")
+    return "".join(lines)
+
+# Takes the firmware's gradients over into the palette files: {path: new CSS}
+# for every file with a palette found in the header, and the names of the
+# palettes that weren't. A file is written anew from all of its palettes.
+def import_c_header(text, paths, source="<header>"):
+    gradients, table = parse_c_header(text, source)
+    index = 0
+    updated = {}
+    missing = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            palettes = parse_palette_css(f.read(), path)
+        rules = []
+        imported = False
+        for name, stops in palettes:
+            if table is not None:
+                array = table[index] if index < len(table) else None
+            else:
+                array = c_identifier(name)
+            index += 1
+            if array in gradients:
+                rules.append(palette_css(name, gradients[array],
+                    comment=f"imported from {os.path.basename(source)}"))
+                imported = True
+            else:
+                missing.append(name)
+                rules.append(palette_css(name, stops))
+        if imported:
+            updated[path] = "\n".join(rules)
+    return updated, missing
+
+def generate_python_module(palettes):
+    lines = ["# Generated by gradient.py from palettes/*.css, do not edit.\n\n",
+             "RGB_TT_PALETTES = [\n"]
+    for palette in palettes:
+        lines.append(f"    {palette.name!r},\n")
+    lines.append("]\n\n# (position, r, g, b) gradient stops per palette, None without a known\n"
+                 "# gradient\nPALETTE_STOPS = [\n")
+    for palette in palettes:
+        if palette.stops is None:
+            lines.append("    None,\n")
+            continue
+        stops = ", ".join(f"({s.o}, {s.r}, {s.g}, {s.b})" for s in palette.stops)
+        lines.append(f"    [{stops}],\n")
+    lines.append(f"]\n\n# {LUT_SIZE} RGB entries per palette, None without a known gradient\n"
+                 "PALETTE_LUTS = [\n")
+    for palette in palettes:
+        if palette.lut is None:
+            lines.append("    None,\n")
+            continue
+        lines.append(f"    bytes.fromhex(\n        \"{palette.lut.hex()}\"),\n")
+    lines.append("]\n")
+    return "".join(lines)
+
+# Stops and flash bytes per palette before and after optimization, and how
+# far the compiled lookup table strays from the source gradient
+def optimization_report(palettes):
+    lines = [f"{'palette':<16} {'stops':>5} {'bytes':>5} {'-> stops':>8} {'bytes':>5} "
+             f"{'saved':>5} {'error':>5}"]
+    total_before = 0
+    total_after = 0
+    for palette in palettes:
+        if palette.stops is None:
+            continue
+        before = len(palette.source_stops) * STOP_SIZE
+        after = len(palette.stops) * STOP_SIZE
+        total_before += before
+        total_after += after
+        error = lut_error(
+            np.frombuffer(palette.lut, dtype=np.uint8), gradient_lut(palette.source_stops).ravel())
+        lines.append(
+            f"{palette.name:<16} {len(palette.source_stops):>5} {before:>5} "
+            f"{len(palette.stops):>8} {after:>5} {before - after:>5} {error:>5}")
+    lines.append(
+        f"{'total':<16} {'':>5} {total_before:>5} {'':>8} {total_after:>5} "
+        f"{total_before - total_after:>5}")
+    return "\n".join(lines)
+
+# Only touches the output when its content changes
+def write_output(path, content):
+    if path == "-":
+        sys.stdout.write(content)
+        return False
+    try:
+        with open(path, "r") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(path, "w") as f:
+        f.write(content)
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile CSS gradient palettes for the firmware and the preview.")
+    parser.add_argument("files", nargs="*",
+        help="palette CSS files (default: palettes/*.css)")
+    parser.add_argument("--c-out", default=DEFAULT_C_OUTPUT,
+        help="C header to write ('-' for stdout)")
+    parser.add_argument("--py-out", default=DEFAULT_PY_OUTPUT,
+        help="Python module to write ('-' for stdout)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--max-error", type=float, default=None,
+        help="reduce stops as long as no table entry moves by more than this (0-255)")
+    parser.add_argument("--report", action="store_true",
+        help="print stop counts and bytes saved per palette")
+    parser.add_argument("--import-header", default=None, metavar="HEADER",
+        help="take the gradients over from the firmware's palette header first")
+    args = parser.parse_args(argv)
+
+    paths = args.files or palette_files()
+    compiler = PaletteCompiler(None if args.no_cache else args.cache_dir, args.max_error)
+    try:
+        if args.import_header:
+            with open(args.import_header, "r", encoding="utf-8") as f:
+                updated, missing = import_c_header(f.read(), paths, args.import_header)
+            for path, content in updated.items():
+                write_output(path, content)
+                print(f"Imported {path}", file=sys.stderr)
+            if missing:
+                print(f"Not in {args.import_header}: {', '.join(missing)}", file=sys.stderr)
+        palettes = compiler.compile_files(paths)
+    except (OSError, PaletteError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for path, content in (
+            (args.c_out, generate_c_header(palettes)),
+            (args.py_out, generate_python_module(palettes))):
+        if write_output(path, content):
+            print(f"Wrote {path}", file=sys.stderr)
+
+    unknown = [p.name for p in palettes if p.stops is None]
+    if unknown:
+        print(f"Warning: no known gradient, left out of the header: {', '.join(unknown)}",
+              file=sys.stderr)
+    if args.report:
+        print(optimization_report(palettes), file=sys.stderr)
+    print(f"{len(palettes)} palettes ({compiler.compiled} compiled, "
+          f"{compiler.cached} cached)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+# Timing and error counters for every HID step (enumerate, open, feature
+# report get/send, reboot, ...), so a slow save can be pinned on the step
+# that is actually slow.
+#
+#   with span("open"):
+#       device.open()
+#
+# Durations go into fixed log-spaced histogram buckets per operation, from
+# which percentiles are read. Failures are counted per operation and
+# exception type. Everything can be dumped as JSON or as a Prometheus text
+# file for node_exporter's textfile collector.
+#
+# Setting ARCIN_METRICS_PROM and/or ARCIN_METRICS_JSON to a path makes any
+# program using the HID code rewrite that file every ARCIN_METRICS_INTERVAL
+# seconds (default 15) and on exit.
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PROM_ENV = "ARCIN_METRICS_PROM"
+JSON_ENV = "ARCIN_METRICS_JSON"
+INTERVAL_ENV = "ARCIN_METRICS_INTERVAL"
+DEFAULT_INTERVAL = 15.0
+
+# upper bounds in seconds: 50 us doubling up to ~52 s, plus +Inf
+BUCKET_BOUNDS = [0.00005 * 2 ** i for i in range(21)]
+
+METRIC_PREFIX = "arcin_hid"
+
+class OperationStats:
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.errors = {}
+
+    def add(self, duration, error=None):
+        index = 0
+        while index < len(BUCKET_BOUNDS) and duration > BUCKET_BOUNDS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.longest:
+            self.longest = duration
+        if error is not None:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    # upper bound (seconds) of the bucket holding the p-th percentile
+    def percentile(self, p):
+        if self.count == 0:
+            return 0.0
+        target = self.count * p / 100
+        cumulative = 0
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            if cumulative >= target and count:
+                if index >= len(BUCKET_BOUNDS):
+                    return self.longest
+                return min(BUCKET_BOUNDS[index], self.longest)
+        return self.longest
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": sum(self.errors.values()),
+            "errors_by_type": dict(self.errors),
+            "total_s": self.total,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.longest * 1000,
+        }
+
+class Metrics:
+
+    def __init__(self):
+        self.operations = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, operation, duration, error=None):
+        with self.lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = OperationStats()
+            stats.add(duration, error)
+
+    @contextmanager
+    def span(self, operation):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(operation, time.perf_counter() - start, type(e).__name__)
+            raise
+        self.record(operation, time.perf_counter() - start)
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+            self.started = time.time()
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "started": self.started,
+                "updated": time.time(),
+                "operations": {
+                    name: stats.summary()
+                    for name, stats in sorted(self.operations.items())},
+            }
+
+    def to_prometheus(self):
+        name = f"{METRIC_PREFIX}_operation_seconds"
+        errors_name = f"{METRIC_PREFIX}_operation_errors_total"
+        lines = [
+            f"# HELP {name} Duration of HID operations.",
+            f"# TYPE {name} histogram"]
+        error_lines = [
+            f"# HELP {errors_name} Failed HID operations by exception type.",
+            f"# TYPE {errors_name} counter"]
+        with self.lock:
+            for operation, stats in sorted(self.operations.items()):
+                label = f'operation="{_label_value(operation)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKET_BOUNDS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {stats.count}')
+                lines.append(f"{name}_sum{{{label}}} {stats.total:.6f}")
+                lines.append(f"{name}_count{{{label}}} {stats.count}")
+                for error, count in sorted(stats.errors.items()):
+                    error_lines.append(
+                        f'{errors_name}{{{label},error="{_label_value(error)}"}} {count}')
+        return "\n".join(lines + error_lines) + "\n"
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2))
+
+    # node_exporter may read the file at any time, so it's replaced atomically
+    def write_prometheus(self, path):
+        _write_atomic(path, self.to_prometheus())
+
+# backslash, double quote and newline are escaped in Prometheus label values
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _write_atomic(path, content):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+METRICS = Metrics()
+
+def span(operation):
+    return METRICS.span(operation)
+
+def write_metrics(json_path=None, prom_path=None):
+    if json_path:
+        METRICS.write_json(json_path)
+    if prom_path:
+        METRICS.write_prometheus(prom_path)
+
+def _export_from_environment():
+    json_path = os.environ.get(JSON_ENV)
+    prom_path = os.environ.get(PROM_ENV)
+    if not json_path and not prom_path:
+        return
+    interval = float(os.environ.get(INTERVAL_ENV, DEFAULT_INTERVAL))
+
+    def export():
+        try:
+            write_metrics(json_path, prom_path)
+        except OSError as e:
+            print(f"Failed to write metrics: {e}")
+
+    def run():
+        while True:
+            time.sleep(interval)
+            export()
+
+    threading.Thread(target=run, daemon=True).start()
+    atexit.register(export)
+
+_export_from_environment()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# HID transport selection.
+#
+# Every backend exposes enumerate(vendor_id, product_id) which returns device
+# objects with:
+#   product_name, serial_number, path
+#   usb_location: USB port path like "1-2.3" (bus 1, port 2, then port 3 of
+#       the hub there), or None when the backend can't tell
+#   enumeration_id: changes whenever the controller re-enumerates (reboot,
+#       replug), or None when the backend can't tell
+#   open(), close()
+#   get_feature_report(report_id, size) -> bytes, starting with the report id
+#   send_feature_report(data)
+#   read_input_report(buffer, timeout) -> number of bytes read into buffer,
+#       0 if no report arrived within timeout seconds
+#   last_input_time (optional): time.perf_counter() of when the report last
+#       returned by read_input_report arrived, for backends that queue reports
+#       themselves; without it, the time of the read is as close as it gets
+# Device methods report transfer failures as OSError (IOError), whatever the
+# backend library raises itself.
+#
+# The backend is picked from the ARCIN_TRANSPORT environment variable, or by
+# platform when it is not set.
+
+import os
+import sys
+
+TRANSPORT_ENV = "ARCIN_TRANSPORT"
+
+# name => "module:class", imported lazily so a backend's platform-specific
+# dependencies are only needed when it's actually used
+TRANSPORTS = {
+    "pywinusb": "transport_pywinusb:PywinusbTransport",
+    "hidraw": "transport_hidraw:HidrawTransport",
+    "sim": "arcin_emulator:SimulatedTransport",
+}
+
+_transports = {}
+
+def default_transport_name():
+    if TRANSPORT_ENV in os.environ:
+        return os.environ[TRANSPORT_ENV]
+    if sys.platform.startswith("linux"):
+        return "hidraw"
+    return "pywinusb"
+
+def register_transport(name, spec):
+    TRANSPORTS[name] = spec
+    _transports.pop(name, None)
+
+def get_transport(name=None):
+    if name is None:
+        name = default_transport_name()
+    if name not in _transports:
+        if name not in TRANSPORTS:
+            raise ValueError(
+                f"Unknown transport '{name}' "
+                f"(available: {', '.join(TRANSPORTS.keys())})")
+        module_name, class_name = TRANSPORTS[name].split(":")
+        module = __import__(module_name)
+        _transports[name] = getattr(module, class_name)()
+    return _transports[name]
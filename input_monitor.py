@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+# Live input report monitor: checks the poll rate the controller actually
+# delivers against what the config asks for.
+#
+# A reader thread timestamps every input report (with its arrival time where
+# the transport queues reports itself, as pywinusb does, otherwise with the
+# time it was read) into a preallocated ring buffer and updates a fixed-bin
+# interval histogram in place, so nothing is allocated per report beyond what
+# the transport needs. Percentiles and jitter are derived from the histogram
+# on demand.
+#
+# Dropped reports are not counted from single long intervals: with read
+# times, a report that is picked up late leaves a long interval followed by
+# short ones, which is jitter, not a drop. Instead, report i's offset from
+# the nominal schedule, timestamp - i * expected_interval, grows by one
+# interval per missing report, and reads can only make it later. The lowest
+# offset of each DROP_WINDOW is compared with the previous window's, which
+# leaves out the read delays, and a clock slightly off the nominal rate only
+# moves it by a fraction of an interval per window. The open window is
+# compared through the lowest of its last DROP_TAIL offsets, so a drop shows
+# up once that many reports have come in after it.
+#
+#   python input_monitor.py --seconds 10 --json stats.json --csv reports.csv
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+import numpy as np
+from arcin_config import ARCIN_CONFIG_FLAG_250HZ_MODE
+from arcin_device import get_devices, load_from_device
+from arcin_device import INPUT_REPORT_ID, INPUT_REPORT_MAX_SIZE
+
+DEFAULT_CAPACITY = 1 << 16
+
+# 0.05 ms bins up to 20 ms; the last bin collects everything slower
+HISTOGRAM_BIN = 0.00005
+HISTOGRAM_BINS = 400
+
+READ_TIMEOUT = 0.1
+
+# seconds of reports whose lowest schedule offsets are compared
+DROP_WINDOW = 0.25
+DROP_TAIL = 16
+
+class ReportRingBuffer:
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.buttons = np.zeros(capacity, dtype=np.uint16)
+        self.axis_x = np.zeros(capacity, dtype=np.uint8)
+        self.axis_y = np.zeros(capacity, dtype=np.uint8)
+        # total number of reports ever appended
+        self.count = 0
+
+    def append(self, timestamp, buttons, axis_x, axis_y):
+        i = self.count % self.capacity
+        self.timestamps[i] = timestamp
+        self.buttons[i] = buttons
+        self.axis_x[i] = axis_x
+        self.axis_y[i] = axis_y
+        self.count += 1
+
+    # oldest-first copies of what is currently held
+    def snapshot(self):
+        count = self.count
+        size = min(count, self.capacity)
+        order = (np.arange(count - size, count) % self.capacity)
+        return (
+            self.timestamps[order],
+            self.buttons[order],
+            self.axis_x[order],
+            self.axis_y[order])
+
+class IntervalStats:
+
+    def __init__(self, expected_interval=None):
+        self.expected_interval = expected_interval
+        self.histogram = np.zeros(HISTOGRAM_BINS + 1, dtype=np.int64)
+        self.intervals = 0
+        self.total = 0.0
+        self.total_squared = 0.0
+        self.longest = 0.0
+        self.last = None
+        # reports seen, and drops up to the previous window
+        self.reports = 0
+        self.window_drops = 0
+        # lowest schedule offset of the previous and of the open window
+        self.previous_offset = None
+        self.window_offset = None
+        self.window_start = None
+        self.tail = np.zeros(DROP_TAIL, dtype=np.float64)
+
+    @property
+    def dropped(self):
+        if not self.expected_interval or self.reports == 0:
+            return 0
+        reference = self.previous_offset
+        if reference is None:
+            reference = self.window_offset
+        recent = self.tail[:self.reports].min()
+        return max(0, self.window_drops + round((recent - reference) / self.expected_interval))
+
+    def __add_offset__(self, timestamp):
+        offset = timestamp - self.reports * self.expected_interval
+        self.tail[self.reports % DROP_TAIL] = offset
+        self.reports += 1
+        if self.window_start is not None and timestamp - self.window_start <= DROP_WINDOW:
+            if offset < self.window_offset:
+                self.window_offset = offset
+            return
+        if self.window_start is not None:
+            if self.previous_offset is not None:
+                self.window_drops += round(
+                    (self.window_offset - self.previous_offset) / self.expected_interval)
+            self.previous_offset = self.window_offset
+        self.window_start = timestamp
+        self.window_offset = offset
+
+    def add(self, timestamp):
+        if self.expected_interval:
+            self.__add_offset__(timestamp)
+        last = self.last
+        self.last = timestamp
+        if last is None:
+            return
+        interval = timestamp - last
+        index = int(interval / HISTOGRAM_BIN)
+        self.histogram[index if index < HISTOGRAM_BINS else HISTOGRAM_BINS] += 1
+        self.intervals += 1
+        self.total += interval
+        self.total_squared += interval * interval
+        if interval > self.longest:
+            self.longest = interval
+
+    # interval (seconds) below which p percent of intervals fall
+    def percentile(self, p):
+        if self.intervals == 0:
+            return 0.0
+        cumulative = np.cumsum(self.histogram)
+        index = int(np.searchsorted(cumulative, self.intervals * p / 100))
+        if index >= HISTOGRAM_BINS:
+            return self.longest
+        return (index + 1) * HISTOGRAM_BIN
+
+    def summary(self):
+        n = self.intervals
+        mean = self.total / n if n else 0.0
+        variance = self.total_squared / n - mean * mean if n else 0.0
+        return {
+            "reports": n + (1 if self.last is not None else 0),
+            "mean_interval_ms": mean * 1000,
+            "rate_hz": 1 / mean if mean else 0.0,
+            "jitter_ms": math.sqrt(max(0.0, variance)) * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "p99.9_ms": self.percentile(99.9) * 1000,
+            "max_ms": self.longest * 1000,
+            "expected_interval_ms": (
+                self.expected_interval * 1000 if self.expected_interval else None),
+            "dropped": self.dropped if self.expected_interval else None,
+        }
+
+class InputMonitor:
+
+    def __init__(self, device, expected_interval=None, capacity=DEFAULT_CAPACITY):
+        self.device = device
+        self.ring = ReportRingBuffer(capacity)
+        self.stats = IntervalStats(expected_interval)
+        self.error = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        # report handlers called as handler(timestamp, buttons, axis_x, axis_y)
+        # on the reader thread, for tools that consume the stream live
+        self.handlers = []
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.__run__, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def __run__(self):
+        buffer = bytearray(INPUT_REPORT_MAX_SIZE)
+        ring = self.ring
+        stats = self.stats
+        clock = time.perf_counter
+        try:
+            self.device.open()
+        except Exception as e:
+            self.error = e
+            return
+        try:
+            while not self.stop_event.is_set():
+                length = self.device.read_input_report(buffer, READ_TIMEOUT)
+                timestamp = clock()
+                if length < 5 or buffer[0] != INPUT_REPORT_ID:
+                    continue
+                # a backend that queues reports knows when they really came in
+                arrived = getattr(self.device, "last_input_time", None)
+                if arrived is not None:
+                    timestamp = arrived
+                buttons = buffer[1] | (buffer[2] << 8)
+                ring.append(timestamp, buttons, buffer[3], buffer[4])
+                stats.add(timestamp)
+                for handler in self.handlers:
+                    handler(timestamp, buttons, buffer[3], buffer[4])
+        except Exception as e:
+            self.error = e
+        finally:
+            self.device.close()
+
+    def histogram(self):
+        edges_ms = np.arange(HISTOGRAM_BINS + 1) * HISTOGRAM_BIN * 1000
+        return (edges_ms, self.stats.histogram.copy())
+
+    def export_json(self, path):
+        edges_ms, counts = self.histogram()
+        nonzero = np.nonzero(counts)[0]
+        with open(path, "w") as f:
+            json.dump({
+                "serial_number": self.device.serial_number,
+                "stats": self.stats.summary(),
+                "histogram_bin_ms": HISTOGRAM_BIN * 1000,
+                # sparse: {bin start in ms: count}, the last bin is open-ended
+                "histogram": {
+                    f"{edges_ms[i]:.2f}": int(counts[i]) for i in nonzero},
+            }, f, indent=2)
+
+    def export_csv(self, path):
+        timestamps, buttons, axis_x, axis_y = self.ring.snapshot()
+        with open(path, "w") as f:
+            f.write("timestamp,buttons,axis_x,axis_y\n")
+            for row in zip(timestamps, buttons, axis_x, axis_y):
+                f.write(f"{row[0]:.6f},{row[1]},{row[2]},{row[3]}\n")
+
+# Poll interval the device's config asks for, or None if it can't be read
+def configured_interval(device):
+    conf = load_from_device(device)
+    if conf is None:
+        return None
+    return 0.004 if conf.flags & ARCIN_CONFIG_FLAG_250HZ_MODE else 0.001
+
+def format_summary(summary):
+    dropped = summary["dropped"]
+    return (
+        f"{summary['reports']:8d} reports  {summary['rate_hz']:7.1f} Hz  "
+        f"p50 {summary['p50_ms']:.2f} ms  p99 {summary['p99_ms']:.2f} ms  "
+        f"max {summary['max_ms']:.2f} ms  jitter {summary['jitter_ms']:.3f} ms  "
+        f"dropped {'n/a' if dropped is None else dropped}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the input report rate of an arcin-infinitas controller.")
+    parser.add_argument("--serial", default=None, help="device to monitor (default: first)")
+    parser.add_argument("--transport", default=None)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--json", default=None, help="write stats and histogram here")
+    parser.add_argument("--csv", default=None, help="write the buffered reports here")
+    args = parser.parse_args(argv)
+
+    devices = get_devices(transport=args.transport)
+    if args.serial:
+        devices = [d for d in devices if d.serial_number == args.serial]
+    if len(devices) == 0:
+        print("No devices found.")
+        return 1
+    device = devices[0]
+
+    monitor = InputMonitor(device, configured_interval(device))
+    monitor.start()
+    end = time.monotonic() + args.seconds
+    try:
+        while time.monotonic() < end and monitor.is_running():
+            time.sleep(min(1.0, max(0.0, end - time.monotonic())))
+            print(format_summary(monitor.stats.summary()))
+    except KeyboardInterrupt:
+        pass
+    monitor.stop()
+
+    if monitor.error is not None:
+        print(f"Monitor stopped: {monitor.error}")
+
+    if args.json:
+        monitor.export_json(args.json)
+    if args.csv:
+        monitor.export_csv(args.csv)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,71 +1,42 @@
 #!/usr/bin/env python3
 
-from dataclasses import dataclass
-import struct
-from collections import namedtuple
+from functools import partial
+import asyncio
+import bisect
+import threading
+import time
 import webbrowser
-import pywinusb.hid as hid
 import wx
 # import wx.lib.mixins.inspection
 from usb_hid_keys import USB_HID_KEYS
 from usb_hid_keys import USB_HID_KEYCODES
-
-ArcinConfig = namedtuple(
-    "ArcinConfig",
-    "label flags qe1_sens qe2_sens "
-    "debounce_ticks keycodes "
-    "remap_start_sel remap_b8_b9 "
-    "rgb_flags "
-    "rgb_red rgb_green rgb_blue "
-    "rgb_darkness "
-    "rgb_red_2 rgb_green_2 rgb_blue_2 "
-    "rgb_red_3 rgb_green_3 rgb_blue_3 "
-    "rgb_mode rgb_num_leds rgb_idle_speed "
-    "rgb_idle_brightness rgb_tt_speed rgb_mode_options"
-    )
-
-Rgb = namedtuple("Rgb", "r g b")
-
-RgbConfig = namedtuple(
-    "RgbConfig",
-    "flags rgb1 darkness rgb2 rgb3 mode "
-    "num_leds idle_speed idle_brightness tt_speed mode_options")
-
-ARCIN_CONFIG_VALID_KEYCODES = 13
-ARCIN_RGB_MAX_DARKNESS = 255
-
-ARCIN_RGB_NUM_LEDS_MAX = 180
-ARCIN_RGB_NUM_LEDS_DEFAULT = 12
-
-# Infinitas controller VID/PID = 0x1ccf / 0x8048
-VID = 0x1ccf
-PID = 0x8048
-CONFIG_SEGMENT_ID = hid.get_full_usage_id(0xff55, 0xc0ff)
-
-STRUCT_FMT_EX = (
-    "12s"  # uint8 label[12]
-    "L"    # uint32 flags
-    "b"    # int8 qe1_sens
-    "b"    # int8 qe2_sens
-    "x"    # uint8 reserved (was: effector_mode)
-    "B"    # uint8 debounce_ticks
-    "16s"  # char keycodes[16]
-    "B"    # uint8 remap_start_sel
-    "B"    # uint8 remap_b8_b9
-    "2x"   # uint8 reserved[2]
-
-    "B"    # uint8 rgb_flags
-    "BBB"  # uint8 red, green, blue (primary)
-    "B"    # uint8 rgb_darkness
-    "BBB"  # uint8 red, green, blue (secondary)
-    "BBB"  # uint8 red, green, blue (tertiary)
-    "B"    # uint8 rgb_mode
-    "B"    # uint8 rgb_num_leds
-    "B"    # uint8 rgb_idle_speed
-    "B"    # uint8 rgb_idle_brightness
-    "b"    # int8 rgb_tt_speed
-    "B"    # uint8 rgb_mode_options
-    "3x")  # uint8 reserved[3]
+from arcin_config import ArcinConfig, RgbConfig, Rgb
+from arcin_config import label_text, idle_speed_value, tt_speed_value
+from arcin_config import SENS_OPTIONS, RGB_MODE_OPTIONS, RGB_TT_PALETTES
+from arcin_config import ARCIN_CONFIG_VALID_KEYCODES
+from arcin_config import ARCIN_CONFIG_FLAG_SEL_MULTI_TAP, ARCIN_CONFIG_FLAG_INVERT_QE1
+from arcin_config import ARCIN_CONFIG_FLAG_LED_OFF, ARCIN_CONFIG_FLAG_KEYBOARD_ENABLE
+from arcin_config import ARCIN_CONFIG_FLAG_JOYINPUT_DISABLE
+from arcin_config import ARCIN_CONFIG_FLAG_DIGITAL_TT_ENABLE
+from arcin_config import ARCIN_CONFIG_FLAG_ANALOG_TT_FORCE_ENABLE
+from arcin_config import ARCIN_CONFIG_FLAG_MODE_SWITCHING_ENABLE
+from arcin_config import ARCIN_CONFIG_FLAG_DEBOUNCE, ARCIN_CONFIG_FLAG_250HZ_MODE
+from arcin_config import ARCIN_CONFIG_FLAG_WS2812B
+from arcin_config import ARCIN_CONFIG_FLAG_TT_LED_REACTIVE, ARCIN_CONFIG_FLAG_TT_LED_HID
+from arcin_config import ARCIN_RGB_FLAG_ENABLE_HID, ARCIN_RGB_FLAG_REACT_TO_TT
+from arcin_config import ARCIN_RGB_FLAG_FLIP_DIRECTION
+from arcin_config import ARCIN_RGB_FLAG_FADE_OUT_FAST, ARCIN_RGB_FLAG_FADE_OUT_SLOW
+from arcin_config import ARCIN_RGB_MAX_DARKNESS
+from arcin_config import ARCIN_RGB_NUM_LEDS_DEFAULT, ARCIN_RGB_NUM_LEDS_MAX
+from arcin_device import load_from_device
+from arcin_device import SAVE_UNCHANGED
+from arcin_async import AsyncArcin
+from config_cache import ConfigCache, default_cache_path
+from device_lock import save_locked
+from device_pool import DevicePool
+from device_watcher import DeviceWatcher
+from input_monitor import InputMonitor, configured_interval
+from rgb_render import RgbRenderer
 
 TT_OPTIONS = [
     "Analog only (Infinitas)",
@@ -73,24 +44,6 @@ TT_OPTIONS = [
     "Both analog and digital",
 ]
 
-SENS_OPTIONS = {
-    "1:1": 0,
-    "1:2": -2,
-    "1:3": -3,
-    "1:4": -4,
-    "1:6": -6,
-    "1:8": -8,
-    "1:11": -11,
-    "1:16": -16,
-    "2:1": 2,
-    "3:1": 3,
-    "4:1": 4,
-    "6:1": 6,
-    "8:1": 8,
-    "11:1": 11,
-    "16:1": 16
-}
-
 EFFECTOR_NAMES = [
     "E1 (JOY 9)",
     "E2 (JOY 10)",
@@ -117,106 +70,6 @@ LED_OPTIONS = [
     "HID-controlled",
 ]
 
-RGB_TT_PALETTES = [
-    "Rainbow",
-    "Dream",
-    "Happy Sky",
-    "DJ TROOPERS",
-    "Empress",
-    "Tricoro",
-    "CANNON BALLERS",
-    "Rootage",
-    "HeroicVerse",
-    "Bistrover",
-]
-
-@dataclass
-class RgbMode:
-    display_name: str = "???"
-    num_custom_color: int = 0
-    has_idle_animation: bool = True
-    idle_animation_unit: str = ""
-    tt_animation_speed: bool = True
-    idle_animation_with_tt_react: bool = True
-    use_palettes: bool = False
-    multiplicity_label: str = "???"
-    multiplicity_tooltip: str = ""
-    multiplicity_min: int = -1
-    multiplicity_max: int = -1
-
-RGB_MODE_OPTIONS = [
-    RgbMode(
-        "Single-color / breathe",
-        1,
-        idle_animation_with_tt_react=False,
-        idle_animation_unit="BPM",
-        ),
-    RgbMode(
-        "Flash (two colors)",
-        2,
-        idle_animation_with_tt_react=False,
-        idle_animation_unit="BPM",
-        ),
-    RgbMode(
-        "Flash (random color)",
-        0,
-        tt_animation_speed=False,
-        use_palettes=True,
-        idle_animation_unit="BPM",
-        ),
-    RgbMode(
-        "Tricolor",
-        3,
-        idle_animation_unit="RPM",
-        ),
-    RgbMode(
-        "Color dots",
-        3,
-        multiplicity_label="Number of dots",
-        multiplicity_tooltip="Specifies number of dots shown",
-        multiplicity_min=1,
-        multiplicity_max=3,
-        idle_animation_unit="RPM",
-        ),
-    RgbMode(
-        "Color divisions",
-        3,
-        multiplicity_label="Number of colors",
-        multiplicity_tooltip="Specifies number of colors used",
-        multiplicity_min=2,
-        multiplicity_max=3,
-        idle_animation_unit="RPM",
-        ),
-    RgbMode(
-        "Rainbow glow",
-        0,
-        use_palettes=True,
-        idle_animation_unit="RPM",
-        ),
-    RgbMode(
-        "Rainbow spiral",
-        0,
-        use_palettes=True,
-        multiplicity_label="Wave length",
-        multiplicity_tooltip="1 makes a full circle, 2+ makes the wave effect longer",
-        multiplicity_min=1,
-        multiplicity_max=6,
-        idle_animation_unit="RPM",
-        ),
-    RgbMode(
-        "Pride (animation only)",
-        0,
-        has_idle_animation=False,
-        tt_animation_speed=False,
-        ),
-    RgbMode(
-        "Pacifica (animation only)",
-        0,
-        has_idle_animation=False,
-        tt_animation_speed=False,
-        ),
-]
-
 RGB_TT_FADE_OUT_OPTIONS = [
     "Very quick",
     "Quick",
@@ -224,139 +77,44 @@ RGB_TT_FADE_OUT_OPTIONS = [
     "Really slow",
 ]
 
+# labels read at once while filling the device list, and how long one may take
+LABEL_PREFETCH_JOBS = 4
+LABEL_PREFETCH_TIMEOUT = 2.0
 
-ARCIN_CONFIG_FLAG_SEL_MULTI_TAP          = (1 << 0)
-ARCIN_CONFIG_FLAG_INVERT_QE1             = (1 << 1)
-# removed in favor of complete remapping of E buttons
-# ARCIN_CONFIG_FLAG_SWAP_8_9               = (1 << 2)
-ARCIN_CONFIG_FLAG_DIGITAL_TT_ENABLE      = (1 << 3)
-ARCIN_CONFIG_FLAG_DEBOUNCE               = (1 << 4)
-ARCIN_CONFIG_FLAG_250HZ_MODE             = (1 << 5)
-ARCIN_CONFIG_FLAG_ANALOG_TT_FORCE_ENABLE = (1 << 6)
-ARCIN_CONFIG_FLAG_KEYBOARD_ENABLE        = (1 << 7)
-ARCIN_CONFIG_FLAG_JOYINPUT_DISABLE       = (1 << 8)
-ARCIN_CONFIG_FLAG_MODE_SWITCHING_ENABLE  = (1 << 9)
-ARCIN_CONFIG_FLAG_LED_OFF                = (1 << 10)
-ARCIN_CONFIG_FLAG_TT_LED_REACTIVE        = (1 << 11)
-ARCIN_CONFIG_FLAG_TT_LED_HID             = (1 << 12)
-ARCIN_CONFIG_FLAG_WS2812B                = (1 << 13)
-
-ARCIN_RGB_FLAG_ENABLE_HID                = (1 << 0)
-ARCIN_RGB_FLAG_REACT_TO_TT               = (1 << 1)
-ARCIN_RGB_FLAG_FLIP_DIRECTION            = (1 << 2)
-# 00 = instant
-# 01 = 200ms
-# 10 = 400ms
-# 11 = 600ms
-ARCIN_RGB_FLAG_FADE_OUT_FAST             = (1 << 3)
-ARCIN_RGB_FLAG_FADE_OUT_SLOW             = (1 << 4)
-
-def get_devices():
-    hid_filter = hid.HidDeviceFilter(vendor_id=VID, product_id=PID)
-    return hid_filter.get_devices()
-
-def load_from_device(device):
-    conf = None
-    try:
-        device.open()
-        for report in device.find_feature_reports():
-            # 0xc0 = 192 = config report
-            if report.report_id == 0xc0:
-
-                print("Loading from device:")
-                print(f"Name:\t {device.product_name}")
-                print(f"Serial:\t {device.serial_number}")
-
-                report.get()
-                conf = parse_device(report)
-
-    except:
-        return None
-
-    finally:
-        device.close()
-
-    return conf
-
-def parse_device(report):
-    config_page = report[CONFIG_SEGMENT_ID]
-    data = bytes(config_page.value)
-    expected_size = struct.calcsize(STRUCT_FMT_EX)
-    truncated = bytes(data[0:expected_size])
-    unpacked = struct.unpack(STRUCT_FMT_EX, truncated)
-    return ArcinConfig._make(unpacked)
-
-def save_to_device(device, conf):
-    try:
-        packed = struct.pack(
-            STRUCT_FMT_EX,
-            conf.label[0:12].encode(),
-            conf.flags,
-            conf.qe1_sens,
-            conf.qe2_sens,
-            conf.debounce_ticks,
-            conf.keycodes[0:16],
-            conf.remap_start_sel,
-            conf.remap_b8_b9, 
-            conf.rgb_flags,
-            conf.rgb_red,
-            conf.rgb_green,
-            conf.rgb_blue,
-            conf.rgb_darkness,
-            conf.rgb_red_2,
-            conf.rgb_green_2,
-            conf.rgb_blue_2,
-            conf.rgb_red_3,
-            conf.rgb_green_3,
-            conf.rgb_blue_3,
-            conf.rgb_mode,
-            conf.rgb_num_leds,
-            conf.rgb_idle_speed,
-            conf.rgb_idle_brightness,
-            conf.rgb_tt_speed,
-            conf.rgb_mode_options,
-            )
-    except:
-        return (False, "Format error")
-
-    try:
-        device.open()
-        feature = [0x00] * 64
+# Runs a blocking device operation on a worker thread and hands its result to
+# callback(result, *args) on the UI thread once it completes.
+def run_in_background(callback, func, *args):
+    def worker():
+        result = func(*args)
+        wx.CallAfter(deliver_result, callback, result, *args)
+    threading.Thread(target=worker, daemon=True).start()
 
-        # see definition of config_report_t in report_desc.h
-
-        feature[0] = 0xc0 # report id
-        feature[1] = 0x00 # segment
-        feature[2] = 0x3C # size
-        feature[3] = 0x00 # padding
-        feature[4:4+len(packed)] = packed
-
-        assert len(feature) == 64
-
-        device.send_feature_report(feature)
-
-        # restart the board
-
-        feature = [0xb0, 0x20]
-        device.send_feature_report(feature)
-
-    except:
-        return (False, "Failed to write to device")
-    finally:
-        device.close()
-        
-    return (True, "Success")
+def deliver_result(callback, result, *args):
+    # the window may have been closed while the device was busy
+    if not callback.__self__:
+        return
+    callback(result, *args)
 
 class MainWindowFrame(wx.Frame):
 
-    # list of HID devices
-    device = None
+    # list of HID devices, in the same order as the rows of devices_list
+    devices = []
+
+    # reports controllers being plugged in / unplugged / rebooted
+    watcher = None
 
     loading = False
 
-    # list control for selecting HID device
+    # list control for selecting HID device, one row per controller in
+    # serial number order
     devices_list = None
 
+    # serial number of the selected controller while it is away (rebooting),
+    # so it is selected again when it comes back
+    returning_serial = None
+    # the selection is being changed by us, not by the user
+    selecting = False
+
     remapper_frame = None
     remap = DEFAULT_EFFECTOR_MAPPING.copy()
 
@@ -366,6 +124,18 @@ class MainWindowFrame(wx.Frame):
     rgb_frame = None
     rgb_config = None
 
+    monitor_frame = None
+
+    # open device handles shared by load/save
+    pool = None
+
+    # last known config per serial number, so Load can skip the device read
+    config_cache = None
+
+    # reads the labels shown in the device list, on its own event loop thread
+    label_arcin = None
+    label_loop = None
+
     def __init__(self, *args, **kw):
         default_size = (340, 680)
         kw['size'] = default_size
@@ -380,6 +150,13 @@ class MainWindowFrame(wx.Frame):
         # ensure the parent's __init__ is called
         super().__init__(*args, **kw)
 
+        self.pool = DevicePool()
+        self.config_cache = ConfigCache(default_cache_path())
+        self.label_arcin = AsyncArcin(pool=self.pool, max_workers=LABEL_PREFETCH_JOBS)
+        self.label_loop = asyncio.new_event_loop()
+        threading.Thread(target=self.label_loop.run_forever, daemon=True).start()
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+
         # create a panel in the frame
         panel = wx.Panel(self)
         self.SetMinSize(default_size)
@@ -505,12 +282,14 @@ class MainWindowFrame(wx.Frame):
     def makeMenuBar(self):
         options_menu = wx.Menu()
 
+        monitor_item = options_menu.Append(wx.ID_ANY, item="Input monitor")
         about_item = options_menu.Append(wx.ID_ANY, item="Help (opens in browser)")
 
         menu_bar = wx.MenuBar()
         menu_bar.Append(options_menu, "&Tools")
 
         self.SetMenuBar(menu_bar)
+        self.Bind(wx.EVT_MENU, self.on_monitor_item, monitor_item)
         self.Bind(wx.EVT_MENU, self.OnAbout, about_item)
 
     def OnAbout(self, e=None):
@@ -560,6 +339,9 @@ These only take in effect while plugged in; they are reset when unplugged""")
         return box
 
     def on_device_list_select(self, e):
+        if not self.selecting:
+            # picked by the user; don't jump back once the old one returns
+            self.returning_serial = None
         self.__evaluate_save_load_buttons__()
 
     def on_device_list_deselect(self, e):
@@ -567,11 +349,30 @@ These only take in effect while plugged in; they are reset when unplugged""")
         wx.CallAfter(self.__do_forced_selection__, e.GetIndex())
 
     def __do_forced_selection__(self, index):
-        if self.devices_list.GetSelectedItemCount() == 0:
+        if (self.devices_list.GetSelectedItemCount() == 0 and
+            0 <= index < self.devices_list.GetItemCount()):
+            self.__select_row__(index)
+
+    def __select_row__(self, index):
+        self.selecting = True
+        try:
             self.devices_list.Select(index)
+        finally:
+            self.selecting = False
+
+    def on_close(self, e):
+        self.watcher.stop()
+        self.label_loop.call_soon_threadsafe(self.label_loop.stop)
+        self.label_arcin.close()
+        self.pool.close_all()
+        stats = self.config_cache.stats()
+        print(f"Config cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['stale']} stale, {stats['evictions']} evicted")
+        e.Skip()
 
     def on_refresh(self, e):
-        self.__populate_device_list__()
+        # enumerating can take a while; results arrive through the callbacks
+        self.watcher.rescan_async()
 
     def on_load(self, e):
         self.close_remapper_window()
@@ -582,27 +383,36 @@ These only take in effect while plugged in; they are reset when unplugged""")
             return
 
         device = self.devices[index]
-        conf = load_from_device(device)
+
+        # shift+Load always reads the device
+        if not wx.GetKeyState(wx.WXK_SHIFT):
+            conf = self.config_cache.get(device)
+            if conf is not None:
+                self.__populate_from_conf__(conf)
+                self.__evaluate_controls__()
+                self.SetStatusText(
+                    f"Loaded from {device.product_name} ({device.serial_number}), cached.")
+                return
 
         self.loading = True
         self.__evaluate_save_load_buttons__()
+        self.SetStatusText(
+            f"Reading from {device.product_name} ({device.serial_number})...")
 
-        if conf is not None:
-            self.SetStatusText(
-                f"Reading from {device.product_name} ({device.serial_number})...")
+        run_in_background(
+            self.on_load_done, partial(load_from_device, pool=self.pool), device)
 
-            wx.CallLater(500, self.on_load_deferred, device, conf)
+    def on_load_done(self, conf, device):
+        self.loading = False
+        self.__evaluate_save_load_buttons__()
 
-        else:
+        if conf is None:
             self.SetStatusText("Error while trying to read from device.")
-            self.loading = False
-            self.__evaluate_save_load_buttons__()
-
+            return
 
-    def on_load_deferred(self, device, conf):
+        self.config_cache.put(device, conf)
+        self.__set_row_label__(device.serial_number, conf.label)
         self.__populate_from_conf__(conf)
-        self.loading = False
-        self.__evaluate_save_load_buttons__()
         self.__evaluate_controls__()
         self.SetStatusText(
             f"Loaded from {device.product_name} ({device.serial_number}).")
@@ -616,20 +426,32 @@ These only take in effect while plugged in; they are reset when unplugged""")
         if index < 0:
             return
 
-        device = self.devices[index]       
+        device = self.devices[index]
         conf = self.__extract_conf_from_gui__()
 
         self.loading = True
         self.__evaluate_save_load_buttons__()
         self.SetStatusText(
                 f"Saving to {device.product_name} ({device.serial_number})...")
-        wx.CallLater(500, self.on_save_deferred, device, conf)
 
-    def on_save_deferred(self, device, conf):
+        run_in_background(
+            self.on_save_done, partial(save_locked, pool=self.pool), device, conf)
+
+    def on_save_done(self, save_result, device, conf):
         self.loading = False
         self.__evaluate_save_load_buttons__()
-        result, error_message = save_to_device(device, conf)
+        result, error_message = save_result
+        if result and error_message == SAVE_UNCHANGED:
+            self.config_cache.put(device, conf)
+        elif result:
+            self.config_cache.put_written(device, conf)
         if result:
+            self.__set_row_label__(device.serial_number, conf.label)
+
+        if result and error_message == SAVE_UNCHANGED:
+            self.SetStatusText(
+                f"No changes for {device.product_name} ({device.serial_number}).")
+        elif result:
             self.SetStatusText(
                 f"Saved to {device.product_name} ({device.serial_number}).")
         else:
@@ -665,6 +487,29 @@ These only take in effect while plugged in; they are reset when unplugged""")
 
             self.rgb_frame.Show()
 
+    def on_monitor_item(self, e):
+        index = self.devices_list.GetFirstSelected()
+        if index < 0 or self.monitor_frame is not None:
+            return
+
+        # the monitor reads on its own handle so it can't get in the way of
+        # the pooled one used for load/save
+        serial_number = self.devices[index].serial_number
+        device = self.pool.find_device(serial_number)
+        if device is None:
+            self.SetStatusText(f"Device {serial_number} is not connected.")
+            return
+
+        self.monitor_frame = MonitorWindowFrame(
+            self, title=f"Input monitor ({serial_number})", device=device)
+        self.monitor_frame.Bind(wx.EVT_CLOSE, self.on_monitor_frame_closed)
+        self.monitor_frame.Show()
+
+    def on_monitor_frame_closed(self, e):
+        self.monitor_frame.stop_monitor()
+        self.monitor_frame.Destroy()
+        self.monitor_frame = None
+
     def close_remapper_window(self):
         if self.remapper_frame:
             self.remap = self.remapper_frame.extract_remap_from_ui()
@@ -680,6 +525,7 @@ These only take in effect while plugged in; they are reset when unplugged""")
     def close_rgb_window(self):
         if self.rgb_frame:
             self.rgb_config = self.rgb_frame.extract_from_ui()
+            self.rgb_frame.stop_preview()
             self.rgb_frame.Destroy()
             self.rgb_frame = None
 
@@ -887,14 +733,109 @@ These only take in effect while plugged in; they are reset when unplugged""")
     def __populate_device_list__(self):
         if self.devices_list is None:
             return
-        
+
+        self.devices = []
         self.devices_list.DeleteAllItems()
         self.__evaluate_save_load_buttons__()
-        self.devices = get_devices()
-        for d in self.devices:
-            self.devices_list.Append([d.product_name, d.serial_number])
-        if len(self.devices) > 0:
-            self.devices_list.Select(0)
+
+        # watcher callbacks arrive on its own thread; hop over to the UI
+        self.watcher = DeviceWatcher(
+            on_added=lambda d: wx.CallAfter(self.on_device_added, d),
+            on_removed=lambda s: wx.CallAfter(self.on_device_removed, s))
+        # drops cache entries on the watcher thread, before the UI hears of it
+        self.config_cache.track(self.watcher)
+        # enumerating can take a while, so the list fills in from the
+        # watcher thread through on_device_added
+        self.watcher.start(wait=False)
+
+    def __find_device_row__(self, serial_number):
+        for i, d in enumerate(self.devices):
+            if d.serial_number == serial_number:
+                return i
+        return -1
+
+    def on_device_added(self, device):
+        if not self:
+            return
+
+        index = self.__find_device_row__(device.serial_number)
+        if index >= 0:
+            # same controller, new handle (e.g. back from a reboot); keep the
+            # label shown until the new one is known
+            self.devices[index] = device
+        else:
+            index = bisect.bisect([d.serial_number for d in self.devices], device.serial_number)
+            self.devices.insert(index, device)
+            self.devices_list.InsertItem(index, device.product_name)
+            self.devices_list.SetItem(index, 1, device.serial_number)
+
+        if device.serial_number == self.returning_serial:
+            self.returning_serial = None
+            self.__select_row__(index)
+        elif self.devices_list.GetSelectedItemCount() == 0:
+            self.__select_row__(0)
+
+        self.SetStatusText(f"Found {len(self.devices)} device(s).")
+        self.__prefetch_label__(device)
+
+    # Shows the controller's label in its row: straight from the config cache
+    # when possible, otherwise read in the background (LABEL_PREFETCH_JOBS at
+    # a time) with the row updated once it arrives.
+    def __prefetch_label__(self, device):
+        conf = self.config_cache.get(device)
+        if conf is not None:
+            self.__set_row_label__(device.serial_number, conf.label)
+            return
+
+        # last session's label, marked as unconfirmed until the read is back
+        hint = self.config_cache.hint(device.serial_number)
+        if hint is not None and label_text(hint.label):
+            self.__set_row_label__(device.serial_number, label_text(hint.label) + " (?)")
+
+        self.label_arcin.add_device(device)
+        future = asyncio.run_coroutine_threadsafe(
+            self.label_arcin.load(device.serial_number, LABEL_PREFETCH_TIMEOUT),
+            self.label_loop)
+        future.add_done_callback(
+            lambda f: wx.CallAfter(self.on_label_prefetched, device, f))
+
+    def on_label_prefetched(self, device, future):
+        if not self:
+            return
+        try:
+            conf = future.result()
+        except Exception as e:
+            print(f"{device.serial_number}: reading label failed: {e!r}")
+            return
+        # the controller may have rebooted or gone away meanwhile
+        index = self.__find_device_row__(device.serial_number)
+        if index < 0 or self.devices[index] is not device:
+            return
+        self.config_cache.put(device, conf)
+        self.__set_row_label__(device.serial_number, conf.label)
+
+    def __set_row_label__(self, serial_number, label):
+        index = self.__find_device_row__(serial_number)
+        if index < 0:
+            return
+        # unlabeled controllers keep showing the product name
+        self.devices_list.SetItem(index, 0, label_text(label) or self.devices[index].product_name)
+
+    def on_device_removed(self, serial_number):
+        if not self:
+            return
+
+        index = self.__find_device_row__(serial_number)
+        if index < 0:
+            return
+
+        if self.devices_list.IsSelected(index):
+            self.returning_serial = serial_number
+        del self.devices[index]
+        self.devices_list.DeleteItem(index)
+        self.pool.invalidate(serial_number)
+        self.config_cache.invalidate(serial_number)
+        self.__evaluate_save_load_buttons__()
 
         self.SetStatusText(f"Found {len(self.devices)} device(s).")
 
@@ -1188,6 +1129,103 @@ class RemapperWindowFrame(wx.Frame):
         ]
         return remap
 
+class MonitorWindowFrame(wx.Frame):
+
+    panel = None
+    monitor = None
+
+    # histogram range shown, in ms
+    max_interval_ms = 10.0
+
+    def __init__(self, *args, **kw):
+        default_size = (420, 360)
+        kw['size'] = default_size
+        kw['style'] = (
+            wx.RESIZE_BORDER |
+            wx.SYSTEM_MENU |
+            wx.CAPTION |
+            wx.CLOSE_BOX |
+            wx.CLIP_CHILDREN
+        )
+
+        device = kw.pop('device')
+
+        # ensure the parent's __init__ is called
+        super().__init__(*args, **kw)
+
+        self.panel = wx.Panel(self)
+        self.SetMinSize(default_size)
+        box = wx.BoxSizer(wx.VERTICAL)
+
+        self.summary_text = wx.StaticText(self.panel, label="Reading device config...")
+        box.Add(self.summary_text, flag=(wx.EXPAND | wx.ALL), border=8)
+
+        self.histogram_panel = wx.Panel(self.panel)
+        self.histogram_panel.SetBackgroundColour(wx.WHITE)
+        self.histogram_panel.Bind(wx.EVT_PAINT, self.on_paint_histogram)
+        box.Add(self.histogram_panel, 1, flag=(wx.EXPAND | wx.ALL), border=8)
+
+        self.panel.SetSizer(box)
+
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
+
+        # the expected interval comes from the device's own config
+        run_in_background(self.on_interval_known, configured_interval, device)
+
+    def on_interval_known(self, interval, device):
+        self.monitor = InputMonitor(device, interval)
+        self.monitor.start()
+        self.timer.Start(250)
+
+    def stop_monitor(self):
+        self.timer.Stop()
+        if self.monitor:
+            self.monitor.stop()
+
+    def on_timer(self, e):
+        summary = self.monitor.stats.summary()
+        dropped = summary["dropped"]
+        text = (
+            f"Reports: {summary['reports']}   Rate: {summary['rate_hz']:.1f} Hz\n"
+            f"Interval p50 / p99 / max: {summary['p50_ms']:.2f} / "
+            f"{summary['p99_ms']:.2f} / {summary['max_ms']:.2f} ms\n"
+            f"Jitter: {summary['jitter_ms']:.3f} ms   "
+            f"Dropped: {'n/a' if dropped is None else dropped}")
+        if self.monitor.error is not None:
+            text += f"\nStopped: {self.monitor.error}"
+            self.timer.Stop()
+        self.summary_text.SetLabelText(text)
+        self.panel.Layout()
+        self.histogram_panel.Refresh()
+
+    def on_paint_histogram(self, e):
+        dc = wx.PaintDC(self.histogram_panel)
+        if self.monitor is None:
+            return
+
+        edges_ms, counts = self.monitor.histogram()
+        shown = edges_ms[:-1] < self.max_interval_ms
+        counts = counts[:-1][shown]
+        if counts.max(initial=0) == 0:
+            return
+
+        width, height = self.histogram_panel.GetClientSize()
+        bar_width = max(1, width // len(counts))
+        scale = (height - 14) / counts.max()
+
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.SetBrush(wx.Brush(wx.Colour(60, 120, 200)))
+        for i, count in enumerate(counts):
+            if count:
+                bar_height = max(1, int(count * scale))
+                dc.DrawRectangle(i * bar_width, height - 14 - bar_height, bar_width, bar_height)
+
+        dc.SetTextForeground(wx.BLACK)
+        for ms in range(0, int(self.max_interval_ms) + 1, 2):
+            x = int(ms / self.max_interval_ms * len(counts) * bar_width)
+            dc.DrawText(f"{ms}ms", x, height - 13)
+
 def wxcolour_from_rgb(rgb):
     return wx.Colour(rgb.r, rgb.g, rgb.b)
 
@@ -1201,7 +1239,7 @@ class RgbWindowFrame(wx.Frame):
     idle_animation_unit = ""
 
     def __init__(self, *args, **kw):
-        default_size = (380, 680) # same as main window
+        default_size = (380, 720)
         kw['size'] = default_size
         kw['style'] = (
             wx.RESIZE_BORDER |
@@ -1231,6 +1269,14 @@ class RgbWindowFrame(wx.Frame):
             pos=(row, 0), span=(1, 2), flag=wx.ALIGN_CENTER_VERTICAL)        
         row += 1
 
+        preview_label = wx.StaticText(self.panel, label="Preview")
+        self.preview_panel = wx.Panel(self.panel, size=(-1, 24))
+        self.preview_panel.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.preview_panel.Bind(wx.EVT_PAINT, self.on_paint_preview)
+        self.grid.Add(preview_label, pos=(row, 0), flag=wx.ALIGN_CENTER_VERTICAL)
+        self.grid.Add(self.preview_panel, pos=(row, 1), flag=wx.EXPAND)
+        row += 1
+
         checklist_label = wx.StaticText(self.panel, label="Options")
         self.grid.Add(checklist_label, pos=(row, 0), flag=wx.ALIGN_TOP, border=2)
         checklist_box = self.__create_checklist__(self.panel)
@@ -1370,6 +1416,47 @@ class RgbWindowFrame(wx.Frame):
 
         self.__evaluate_controls__()
 
+        # animate the current settings as the firmware would (~60 fps)
+        self.preview_renderer = None
+        self.preview_start = time.perf_counter()
+        self.preview_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_preview_timer, self.preview_timer)
+        self.preview_timer.Start(16)
+
+    def stop_preview(self):
+        self.preview_timer.Stop()
+
+    def on_preview_timer(self, e):
+        config = self.extract_from_ui()
+        if self.preview_renderer is None:
+            self.preview_renderer = RgbRenderer(config)
+        elif config != self.preview_renderer.config:
+            self.preview_renderer.configure(config)
+        self.preview_renderer.render(time.perf_counter() - self.preview_start)
+        self.preview_panel.Refresh()
+
+    def on_paint_preview(self, e):
+        dc = wx.AutoBufferedPaintDC(self.preview_panel)
+        dc.SetBackground(wx.BLACK_BRUSH)
+        dc.Clear()
+        if self.preview_renderer is None:
+            return
+
+        frame = self.preview_renderer.frame
+        width, height = self.preview_panel.GetClientSize()
+        if width <= 0 or height <= 0:
+            return
+        if not self.preview_renderer.has_preview:
+            # the palette's gradient isn't known here, don't make one up
+            dc.SetTextForeground(wx.LIGHT_GREY)
+            dc.DrawLabel("No preview for this palette", wx.Rect(0, 0, width, height),
+                         wx.ALIGN_CENTER)
+            return
+        # one pixel per LED, stretched to the panel
+        image = wx.Image(len(frame), 1, frame.tobytes())
+        image.Rescale(width, height, wx.IMAGE_QUALITY_NORMAL)
+        dc.DrawBitmap(wx.Bitmap(image), 0, 0)
+
     def populate_ui(self, config):
         # do this first so ranges are properly populated
         self.led_mode_ctrl.Select(config.mode)
@@ -1552,19 +1639,13 @@ class RgbWindowFrame(wx.Frame):
             return
 
         raw = self.idle_speed_slider.GetValue()
-
-        if self.idle_animation_unit == "RPM":
-            converted = (raw / 2) # must match FW calculation
-        elif self.idle_animation_unit == "BPM":
-            converted = (raw * raw / 255) # must match FW calculation
-        else:
-            converted = raw
+        converted = idle_speed_value(raw, self.idle_animation_unit)
 
         self.idle_speed_label.SetLabelText(f"Speed: {converted:.2f} {self.idle_animation_unit}")
 
     def __evaluate_tt_speed__(self, e=None):
         raw = self.tt_speed_slider.GetValue()
-        self.tt_speed_label.SetLabelText(f"TT Speed: {raw / 10 :.1f}x")
+        self.tt_speed_label.SetLabelText(f"TT Speed: {tt_speed_value(raw):.1f}x")
 
 def ui_main():
     app = wx.App()
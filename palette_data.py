@@ -0,0 +1,46 @@
+# Generated by gradient.py from palettes/*.css, do not edit.
+
+RGB_TT_PALETTES = [
+    'Rainbow',
+    'Dream',
+    'Happy Sky',
+    'DJ TROOPERS',
+    'Empress',
+    'Tricoro',
+    'CANNON BALLERS',
+    'Rootage',
+    'HeroicVerse',
+    'Bistrover',
+]
+
+# (position, r, g, b) gradient stops per palette, None without a known
+# gradient
+PALETTE_STOPS = [
+    [(0, 255, 0, 0), (15, 213, 42, 0), (31, 171, 85, 0), (47, 171, 127, 0), (63, 171, 171, 0), (79, 86, 213, 0), (95, 0, 255, 0), (111, 0, 213, 42), (127, 0, 171, 85), (143, 0, 86, 170), (159, 0, 0, 255), (175, 42, 0, 213), (191, 85, 0, 171), (207, 127, 0, 129), (223, 171, 0, 85), (239, 213, 0, 43), (255, 255, 0, 0)],
+    None,
+    None,
+    None,
+    [(0, 255, 0, 255), (124, 202, 2, 43), (255, 89, 31, 40)],
+    None,
+    None,
+    None,
+    [(0, 128, 0, 128), (43, 79, 43, 154), (186, 218, 7, 218), (255, 128, 0, 128)],
+    None,
+]
+
+# 256 RGB entries per palette, None without a known gradient
+PALETTE_LUTS = [
+    bytes.fromhex(
+        "ff0000fc0300f90600f70800f40b00f10e00ee1100eb1400e91600e61900e31c00e01f00dd2200db2400d82700d52a00d22d00d02f00cd3200ca3500c83700c53a00c33d00c04000bd4200bb4500b84800b64a00b34d00b05000ae5200ab5500ab5800ab5a00ab5d00ab6000ab6200ab6500ab6700ab6a00ab6d00ab6f00ab7200ab7400ab7700ab7a00ab7c00ab7f00ab8200ab8400ab8700ab8a00ab8d00ab9000ab9200ab9500ab9800ab9a00ab9d00aba000aba300aba600aba800abab00a6ae00a0b0009bb30096b60090b8008bbb0086bd0080c0007bc30076c50071c8006bca0066cd0061d0005bd20056d50051d8004bda0046dd0040e0003be20036e50030e7002bea0026ed0020ef001bf20016f40010f7000bfa0005fc0000ff0000fc0300fa0500f70800f40a00f20d00ef1000ed1200ea1500e71800e51a00e21d00e02000dd2200da2500d82700d52a00d22d00d02f00cd3200ca3500c83700c53a00c33d00c04000bd4200bb4500b84800b64a00b34d00b05000ae5200ab5500a65a00a060009b6500966a009070008b7500867a008080007b8500768a00718f006b9500669a00619f005ba50056aa0051af004bb50046ba0040bf003bc50036ca0030cf002bd40026da0020df001be40016ea0010ef000bf40005fa0000ff0300fc0500fa0800f70a00f40d00f21000ef1200ed1500ea1800e71a00e51d00e22000e02200dd2500da2700d82a00d52d00d22f00d03200cd3500ca3700c83a00c53d00c34000c04200bd4500bb4800b84a00b64d00b35000b05200ae5500ab5800a85a00a65d00a36000a062009e65009b6700996a00966d00936f009172008e74008c7700897a00867c00847f008182007e84007c8700798a00768d007390007092006e95006b9800689a00669d0063a00060a3005da6005aa80058ab0055ae0052b00050b3004db6004ab80048bb0045bd0043c00040c3003dc5003bc80038ca0036cd0033d00030d2002ed5002bd80028da0026dd0023e00020e2001ee5001be70018ea0016ed0013ef0010f2000df4000bf70008fa0005fc0003ff0000"),
+    None,
+    None,
+    None,
+    bytes.fromhex(
+        "ff00ffff00fdfe00fcfe00fafd00f8fd00f6fc00f5fc00f3fc00f1fb00f0fb00eefa00ecfa00eaf900e9f900e7f900e5f800e4f800e2f700e0f700dff600ddf600dbf600d9f500d8f500d6f400d4f400d3f300d1f300cff300cdf200ccf200caf101c8f101c7f001c5f001c3f001c1ef01c0ef01beee01bcee01bbed01b9ed01b7ed01b5ec01b4ec01b2eb01b0eb01afea01adea01abea01aae901a8e901a6e801a4e801a3e701a1e7019fe7019ee6019ce6019ae50198e50197e40195e40193e40192e30190e3018ee2018ce2018be20189e10187e10186e00184e00182df0180df017fdf017dde017bde017add0178dd0176dc0175dc0173dc0171db016fdb016eda016cda016ad90169d90167d90165d80163d80162d70260d7025ed6025dd6025bd60259d50257d50256d40254d40252d30251d3024fd3024dd2024bd2024ad10248d10246d00245d00243d00241cf0240cf023ece023cce023acd0239cd0237cd0235cc0234cc0232cb0230cb022eca022dca022bc9022bc8022bc7032bc7032bc6032bc5032bc4042bc3042bc2042bc1042bc1042bc0052bbf052bbe052bbd052bbc062bbb062bba062bba062bb9062bb8072bb7072ab6072ab5072ab4082ab4082ab3082ab2082ab1082ab0092aaf092aae092aae092aad0a2aac0a2aab0a2aaa0a2aa90a2aa80b2aa70b2aa70b2aa60b2aa50c2aa40c2aa30c2aa20c2aa10c2aa10d2aa00d2a9f0d2a9e0d2a9d0e2a9c0e2a9b0e2a9b0e2a9a0e2a990f2a980f2a970f2a960f2a95102a95102a94102a93102a92102a9111299011298f11298e11298e11298d12298c12298b12298a12298913298813298813298713298613298514298414298314298214298215298115298015297f15297e15297d16297c16297c16297b16297a17297917297817297717297617297518297518297418297318297219297119297019296f19296f19296e1a296d1a296c1a296b1a286a1b28691b28691b28681b28671b28661c28651c28641c28631c28621d28621d28611d28601d285f1d285e1e285d1e285c1e285c1e285b1f285a1f28591f28"),
+    None,
+    None,
+    None,
+    bytes.fromhex(
+        "8000807f01817e02817d03827b04827a0583790684780784770885760985750a86730b87720c87710d88700e886f0f896e108a6d118a6b128b6a138b69148c68158d67168d66178e65188f64198f621a90611b90601c915f1d925e1e925d1f935c20935a2194592295582395572496562596552697542798522898512999502a994f2b9a502b9a512a9b522a9b532a9c542a9c55299d56299d57299e58299e59289e5a289f5b289f5c28a05d27a05e27a15f27a16027a26026a26126a36226a36326a36425a46525a46625a56725a56824a66924a66a24a76b24a76c23a76d23a86e23a86f23a97022a97122aa7222aa7322ab7421ab7521ab7621ac7721ac7820ad7920ad7a20ae7b20ae7c1faf7d1faf7e1faf7f1fb0801eb0811eb1821eb1831eb2831db2841db3851db3861db4871cb4881cb4891cb58a1cb58b1bb68c1bb68d1bb78e1bb78f1ab8901ab8911ab8921ab99319b99419ba9519ba9619bb9718bb9818bc9918bc9a18bc9b17bd9c17bd9d17be9e17be9f16bfa016bfa116c0a216c0a315c0a415c1a515c1a615c2a614c2a714c3a814c3a914c4aa13c4ab13c5ac13c5ad13c5ae12c6af12c6b012c7b112c7b211c8b311c8b411c9b511c9b610c9b710cab810cab910cbba0fcbbb0fccbc0fccbd0fcdbe0ecdbf0ecdc00ecec10ecec20dcfc30dcfc40dd0c50dd0c60cd1c70cd1c80cd1c90cd2c90bd2ca0bd3cb0bd3cc0bd4cd0ad4ce0ad5cf0ad5d00ad6d109d6d209d6d309d7d409d7d508d8d608d8d708d9d808d9d907dada07dad907d9d707d7d607d6d507d5d306d3d206d2d106d1d006d0ce06cecd06cdcc06ccca06cac906c9c806c8c605c6c505c5c405c4c305c3c105c1c005c0bf05bfbd05bdbc05bcbb05bbb904b9b804b8b704b7b504b5b404b4b304b3b204b2b004b0af04afae04aeac03acab03abaa03aaa803a8a703a7a603a6a503a5a303a3a203a2a103a19f029f9e029e9d029d9b029b9a029a9902999702979602969502959402949201929101919001908e018e8d018d8c018c8a018a890189880188870187850085840084830083810081800080"),
+    None,
+]
@@ -0,0 +1,53 @@
+// Generated by gradient.py from palettes/*.css, do not edit.
+#pragma once
+
+// Left out, there is no known gradient for them here; the
+// firmware's own definitions stay authoritative:
+//   1: Dream
+//   2: Happy Sky
+//   3: DJ TROOPERS
+//   5: Tricoro
+//   6: CANNON BALLERS
+//   7: Rootage
+//   9: Bistrover
+//
+// No tt_palettes[] table is generated: its indices are the palette
+// numbers stored in the config, so a table with entries missing or
+// stubbed would select the wrong (or no) palette. Keep the firmware's
+// table, or import its header with gradient.py --import-header.
+
+// 0: Rainbow
+DEFINE_GRADIENT_PALETTE( rainbow_gp ) {
+    0, 0xff, 0x00, 0x00,
+    15, 0xd5, 0x2a, 0x00,
+    31, 0xab, 0x55, 0x00,
+    47, 0xab, 0x7f, 0x00,
+    63, 0xab, 0xab, 0x00,
+    79, 0x56, 0xd5, 0x00,
+    95, 0x00, 0xff, 0x00,
+    111, 0x00, 0xd5, 0x2a,
+    127, 0x00, 0xab, 0x55,
+    143, 0x00, 0x56, 0xaa,
+    159, 0x00, 0x00, 0xff,
+    175, 0x2a, 0x00, 0xd5,
+    191, 0x55, 0x00, 0xab,
+    207, 0x7f, 0x00, 0x81,
+    223, 0xab, 0x00, 0x55,
+    239, 0xd5, 0x00, 0x2b,
+    255, 0xff, 0x00, 0x00
+};
+
+// 4: Empress
+DEFINE_GRADIENT_PALETTE( empress_gp ) {
+    0, 0xff, 0x00, 0xff,
+    124, 0xca, 0x02, 0x2b,
+    255, 0x59, 0x1f, 0x28
+};
+
+// 8: HeroicVerse
+DEFINE_GRADIENT_PALETTE( heroicverse_gp ) {
+    0, 0x80, 0x00, 0x80,
+    43, 0x4f, 0x2b, 0x9a,
+    186, 0xda, 0x07, 0xda,
+    255, 0x80, 0x00, 0x80
+};
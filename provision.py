@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+# Headless provisioning: push one config profile to every attached controller.
+# This must stay free of wx so it can run on machines without a display.
+
+import argparse
+import json
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from arcin_config import VID, PID
+from arcin_config import conf_from_dict, check_config
+from arcin_device import get_devices
+from arcin_device import SAVE_UNCHANGED
+from config_archive import ConfigArchive
+from device_lock import save_locked
+from device_watcher import DeviceWatcher
+from reboot_tracker import RebootTracker
+from rollout_journal import RolloutJournal, config_hash
+from usb_topology import TopologyScheduler, format_lanes
+from hid_metrics import METRICS, write_metrics
+
+DEFAULT_JOBS = 4
+
+# seconds to wait for another program to finish with a controller
+DEFAULT_LOCK_TIMEOUT = 10.0
+
+# watcher poll interval while waiting for reboots without udev events
+READY_POLL_INTERVAL = 0.05
+
+# Raises ValueError for a profile that isn't a complete, writable config
+def load_profile(path):
+    with open(path, "r") as f:
+        try:
+            conf = conf_from_dict(json.load(f))
+            check_config(conf)
+        except (ValueError, TypeError, KeyError, AttributeError, struct.error) as e:
+            raise ValueError(f"invalid profile: {e}")
+    return conf
+
+class Provisioner:
+
+    def __init__(self, conf, force=False, archive=None, firmware="",
+                 tracker=None, ready_timeout=None, journal=None,
+                 lock_timeout=DEFAULT_LOCK_TIMEOUT):
+        self.conf = conf
+        self.digest = config_hash(conf)
+        self.force = force
+        # ConfigArchive recording every config actually written
+        self.archive = archive
+        self.firmware = firmware
+        # RebootTracker to wait for each device to come back after the write
+        self.tracker = tracker
+        self.ready_timeout = ready_timeout
+        # RolloutJournal, to skip devices a previous run already finished
+        self.journal = journal
+        self.lock_timeout = lock_timeout
+
+    def provision_device(self, device):
+        serial_number = device.serial_number
+        if self.journal is not None:
+            if self.journal.is_done(serial_number, self.digest):
+                return (device, True, "Done in a previous run", 0.0)
+            self.journal.begin(serial_number, self.digest)
+
+        if self.tracker is not None:
+            self.tracker.expect(serial_number)
+
+        start = time.perf_counter()
+        result, message = save_locked(
+            device, self.conf, force=self.force, timeout=self.lock_timeout)
+        rebooted_at = time.monotonic()
+        elapsed = time.perf_counter() - start
+
+        written = result and message != SAVE_UNCHANGED
+        if written and self.archive is not None:
+            self.archive.append(serial_number, self.conf, self.firmware)
+
+        if self.tracker is not None:
+            if not written:
+                self.tracker.cancel(serial_number)
+            else:
+                recovery = self.tracker.wait(
+                    serial_number, self.ready_timeout, self.conf, rebooted_at)
+                if recovery.ok:
+                    message += f", ready after {recovery.ready * 1000:.0f} ms"
+                else:
+                    result = False
+                    message += f", {recovery.error}"
+
+        if self.journal is not None:
+            self.journal.finish(serial_number, self.digest, result, message)
+        return (device, result, message, elapsed)
+
+    def run(self, devices, jobs=DEFAULT_JOBS):
+        results = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(self.__provision_or_fail__, device)
+                for device in devices]
+            for future in futures:
+                device, result, message, elapsed = future.result()
+                print_result(device, result, message, elapsed)
+                results.append((device, result, message, elapsed))
+        total = time.perf_counter() - start
+        return (results, total)
+
+    # like run(), spread over USB buses and hubs by a TopologyScheduler;
+    # also returns its per-lane stats
+    def run_by_topology(self, devices, scheduler):
+        start = time.perf_counter()
+        outcomes, lanes = scheduler.run(
+            devices, self.__provision_or_fail__, is_ok=lambda r: r[1],
+            on_result=lambda device, r: print_result(*r))
+        total = time.perf_counter() - start
+        return ([r for _, r in outcomes], total, lanes)
+
+    # an error in one device (journal fsync, archive, transport) is that
+    # device's failure, not the end of the whole rollout
+    def __provision_or_fail__(self, device):
+        start = time.perf_counter()
+        try:
+            return self.provision_device(device)
+        except Exception as e:
+            return (device, False, repr(e), time.perf_counter() - start)
+
+def print_result(device, result, message, elapsed):
+    print(
+        f"{device.serial_number}\t{elapsed * 1000:8.1f} ms\t"
+        f"{'OK' if result else 'FAIL'}\t{message}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Push a config profile to all attached arcin-infinitas controllers.")
+    parser.add_argument("profile", help="JSON config profile")
+    parser.add_argument("--vid", type=lambda x: int(x, 0), default=VID)
+    parser.add_argument("--pid", type=lambda x: int(x, 0), default=PID)
+    parser.add_argument(
+        "--transport", default=None,
+        help="HID transport to use (default: picked by platform)")
+    parser.add_argument(
+        "--serial", action="append", default=[],
+        help="only provision this serial number (can be repeated)")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_JOBS,
+        help=f"number of devices written concurrently (default {DEFAULT_JOBS})")
+    parser.add_argument(
+        "--per-hub", type=int, default=None, metavar="N",
+        help="schedule by USB topology: one lane per bus, at most N devices "
+             "written at once per hub (--jobs then only applies to devices "
+             "of unknown location)")
+    parser.add_argument(
+        "--per-bus", type=int, default=None, metavar="N",
+        help="with --per-hub, also cap the devices written at once per bus")
+    parser.add_argument(
+        "--force", action="store_true",
+        help="write and reboot even if a device already has this config")
+    parser.add_argument(
+        "--archive", default=None,
+        help="append every config written to this config archive")
+    parser.add_argument(
+        "--firmware-tag", default="",
+        help="firmware tag stored with archived configs")
+    parser.add_argument(
+        "--metrics-json", default=None,
+        help="write per-operation HID timings and errors here as JSON")
+    parser.add_argument(
+        "--metrics-prom", default=None,
+        help="write the same as a Prometheus text file (node_exporter textfile collector)")
+    parser.add_argument(
+        "--wait-ready", type=float, default=None, metavar="SECONDS",
+        help="after each write, wait up to SECONDS for the device to re-enumerate "
+             "and read its config back")
+    parser.add_argument(
+        "--journal", default=None,
+        help="record every write here; re-running with the same journal skips "
+             "devices that already got this profile")
+    parser.add_argument(
+        "--lock-timeout", type=float, default=DEFAULT_LOCK_TIMEOUT, metavar="SECONDS",
+        help="how long to wait for a controller another program is writing to "
+             f"(default {DEFAULT_LOCK_TIMEOUT:g})")
+    args = parser.parse_args(argv)
+
+    try:
+        conf = load_profile(args.profile)
+    except (OSError, ValueError) as e:
+        print(f"{args.profile}: {e}")
+        return 1
+
+    devices = get_devices(args.vid, args.pid, args.transport)
+    if args.serial:
+        devices = [d for d in devices if d.serial_number in args.serial]
+
+    if len(devices) == 0:
+        print("No devices found.")
+        return 1
+
+    journal = None
+    if args.journal:
+        try:
+            journal = RolloutJournal(args.journal)
+        except (OSError, ValueError) as e:
+            print(e)
+            return 1
+
+    scheduler = None
+    if args.per_hub is not None:
+        scheduler = TopologyScheduler(args.per_hub, args.per_bus, args.jobs)
+        print(f"Provisioning {len(devices)} device(s) on {len(scheduler.plan(devices))} lane(s), "
+              f"{args.per_hub} per hub...")
+    else:
+        print(f"Provisioning {len(devices)} device(s) with {args.jobs} worker(s)...")
+    archive = ConfigArchive(args.archive) if args.archive else None
+    if journal is not None:
+        for serial_number, digest in journal.interrupted():
+            if digest == config_hash(conf):
+                print(f"{serial_number}: previous run stopped while writing, retrying")
+    watcher = None
+    tracker = None
+    if args.wait_ready is not None:
+        watcher = DeviceWatcher(
+            vendor_id=args.vid, product_id=args.pid, transport=args.transport,
+            poll_interval=READY_POLL_INTERVAL)
+        watcher.start()
+        tracker = RebootTracker(watcher)
+    provisioner = Provisioner(
+        conf, args.force, archive, args.firmware_tag, tracker, args.wait_ready,
+        journal, args.lock_timeout)
+    lanes = None
+    try:
+        if scheduler is not None:
+            results, total, lanes = provisioner.run_by_topology(devices, scheduler)
+        else:
+            results, total = provisioner.run(devices, max(1, args.jobs))
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if archive is not None:
+            archive.close()
+        if journal is not None:
+            journal.close()
+        write_metrics(args.metrics_json, args.metrics_prom)
+
+    failed = sum(1 for r in results if not r[1])
+    print(
+        f"Done: {len(results) - failed} ok, {failed} failed in {total:.2f} s "
+        f"({len(results) / total:.1f} devices/s)")
+    if lanes is not None:
+        print(format_lanes(lanes))
+    for operation, stats in METRICS.to_dict()["operations"].items():
+        print(
+            f"  {operation:<20} {stats['count']:6d}x  p50 {stats['p50_ms']:8.2f} ms  "
+            f"p99 {stats['p99_ms']:8.2f} ms  max {stats['max_ms']:8.2f} ms  "
+            f"errors {stats['errors']}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
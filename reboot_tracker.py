@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Waits for controllers to come back after the post-save reboot.
+#
+# Register the serial number with expect() before the reboot is sent, so a
+# fast re-enumeration can't be missed, then wait() for it. The wait blocks on
+# an event set from DeviceWatcher's on_added callback, so it is only as quick
+# as the watcher: udev events on Linux with pyudev installed, otherwise the
+# watcher's poll interval (provision.py polls every 50 ms while waiting).
+# Once the serial is back, the config is read back from the new device to
+# confirm the firmware is answering again; any error doing so counts as a
+# failed recovery, not just an OSError.
+#
+#   tracker = RebootTracker(watcher)
+#   tracker.expect(serial_number)
+#   save_to_device(device, conf)
+#   recovery = tracker.wait(serial_number, timeout=10, expected=conf)
+
+import threading
+import time
+from collections import namedtuple
+from arcin_config import pack_config
+from arcin_device import with_device, read_config_report
+from arcin_device import CONFIG_DATA_OFFSET, CONFIG_DATA_SIZE
+from hid_metrics import METRICS
+
+DEFAULT_TIMEOUT = 10.0
+
+# a controller may enumerate before it answers feature reports
+READBACK_RETRY_INTERVAL = 0.05
+
+# enumerated: seconds from the reboot until the serial was seen again
+# ready: seconds until the config could be read back (None if it never was)
+# matches: read-back config equals the expected one (None if not checked)
+Recovery = namedtuple(
+    "Recovery", "serial_number ok enumerated ready matches error")
+
+class RebootExpectation:
+
+    def __init__(self, serial_number):
+        self.serial_number = serial_number
+        self.started = time.monotonic()
+        self.event = threading.Event()
+        self.device = None
+        self.enumerated_at = None
+
+class RebootTracker:
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+        self.expectations = {}
+        self.lock = threading.Lock()
+        watcher.add_listener(self.__on_added__, None)
+
+    def close(self):
+        self.watcher.remove_listener(self.__on_added__, None)
+
+    def __on_added__(self, device):
+        with self.lock:
+            expectation = self.expectations.get(device.serial_number)
+        if expectation is None or expectation.event.is_set():
+            return
+        expectation.device = device
+        expectation.enumerated_at = time.monotonic()
+        expectation.event.set()
+
+    def expect(self, serial_number):
+        with self.lock:
+            self.expectations[serial_number] = RebootExpectation(serial_number)
+
+    def cancel(self, serial_number):
+        with self.lock:
+            self.expectations.pop(serial_number, None)
+
+    # rebooted_at: time.monotonic() of the reboot command, if known better
+    # than the expect() call
+    def wait(self, serial_number, timeout=DEFAULT_TIMEOUT, expected=None, rebooted_at=None):
+        with self.lock:
+            expectation = self.expectations.get(serial_number)
+        if expectation is None:
+            raise KeyError(f"{serial_number}: not expecting a reboot")
+        start = expectation.started if rebooted_at is None else rebooted_at
+        deadline = start + timeout
+
+        try:
+            if not expectation.event.wait(max(0.0, deadline - time.monotonic())):
+                return self.__fail__(
+                    serial_number, start, None, "Timeout", f"not back after {timeout:.1f} s")
+            enumerated = expectation.enumerated_at - start
+
+            payload = None
+            error = None
+            while True:
+                try:
+                    report = with_device(expectation.device, read_config_report)
+                    payload = bytes(
+                        report[CONFIG_DATA_OFFSET:CONFIG_DATA_OFFSET + CONFIG_DATA_SIZE])
+                    break
+                except Exception as e:
+                    # whatever the transport raises while the firmware is
+                    # still coming up
+                    error = e
+                if time.monotonic() + READBACK_RETRY_INTERVAL >= deadline:
+                    return self.__fail__(
+                        serial_number, start, enumerated, "ReadBackFailed",
+                        f"read back failed: {error!r}")
+                time.sleep(READBACK_RETRY_INTERVAL)
+
+            ready = time.monotonic() - start
+            METRICS.record("reboot_to_ready", ready)
+            matches = None
+            if expected is not None:
+                matches = payload == pack_config(expected)
+            return Recovery(serial_number, matches is not False, enumerated, ready, matches,
+                            None if matches is not False else "config read back differs")
+        finally:
+            self.cancel(serial_number)
+
+    def __fail__(self, serial_number, start, enumerated, kind, error):
+        METRICS.record("reboot_to_ready", time.monotonic() - start, kind)
+        return Recovery(serial_number, False, enumerated, None, None, error)
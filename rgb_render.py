@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+# Off-device renderer for the WS2812B idle animations, so RGB settings can be
+# previewed without saving (and rebooting) the controller.
+#
+# RgbRenderer takes an RgbConfig and computes a whole (num_leds, 3) uint8
+# frame per render(t) call with NumPy. Speeds go through idle_speed_value(),
+# the same RPM/BPM conversion the RGB window displays. The effects follow the
+# firmware's FastLED-based ones (pride and pacifica are ports of the FastLED
+# examples of the same name); the reactive turntable mode is not rendered.
+
+import math
+import numpy as np
+from arcin_config import RGB_MODE_OPTIONS, idle_speed_value
+from arcin_config import ARCIN_RGB_NUM_LEDS_MAX, ARCIN_RGB_MAX_DARKNESS
+from arcin_config import ARCIN_RGB_FLAG_FLIP_DIRECTION
+from palette_data import PALETTE_LUTS
+
+RGB_MODE_BREATHE = 0
+RGB_MODE_FLASH = 1
+RGB_MODE_FLASH_RANDOM = 2
+RGB_MODE_TRICOLOR = 3
+RGB_MODE_DOTS = 4
+RGB_MODE_DIVISIONS = 5
+RGB_MODE_RAINBOW_GLOW = 6
+RGB_MODE_RAINBOW_SPIRAL = 7
+RGB_MODE_PRIDE = 8
+RGB_MODE_PACIFICA = 9
+
+assert len(RGB_MODE_OPTIONS) == RGB_MODE_PACIFICA + 1
+
+# modes whose colors come from the TT palette
+PALETTE_MODES = (RGB_MODE_FLASH_RANDOM, RGB_MODE_RAINBOW_GLOW, RGB_MODE_RAINBOW_SPIRAL)
+
+PACIFICA_PALETTE_1 = [
+    0x000507, 0x000409, 0x00030B, 0x00030D, 0x000210, 0x000212, 0x000114, 0x000117,
+    0x000019, 0x00001C, 0x000026, 0x000031, 0x00003B, 0x000046, 0x14554B, 0x28AA50,
+]
+PACIFICA_PALETTE_2 = PACIFICA_PALETTE_1[:14] + [0x0C5F52, 0x19BE5F]
+PACIFICA_PALETTE_3 = [
+    0x000208, 0x00030E, 0x000514, 0x00061A, 0x000820, 0x000927, 0x000B2D, 0x000C33,
+    0x000E39, 0x001040, 0x001450, 0x001860, 0x001C70, 0x002080, 0x1040BF, 0x2060FF,
+]
+
+# 256-entry lookup table from a 16-entry palette, blended like ColorFromPalette
+def palette16_lut(entries):
+    colors = np.array([((c >> 16) & 0xff, (c >> 8) & 0xff, c & 0xff) for c in entries],
+                      dtype=np.float64)
+    index = np.arange(256)
+    low = index >> 4
+    high = (low + 1) % 16
+    frac = (index & 0xf)[:, None] / 16
+    return colors[low] * (1 - frac) + colors[high] * frac
+
+PACIFICA_LUTS = [
+    palette16_lut(p) for p in (PACIFICA_PALETTE_1, PACIFICA_PALETTE_2, PACIFICA_PALETTE_3)]
+
+_palette_luts = {}
+
+# lookup tables generated from palettes/*.css by gradient.py, None for a
+# palette without a known gradient
+def palette_lut(index):
+    if index not in _palette_luts:
+        lut = PALETTE_LUTS[index if index < len(PALETTE_LUTS) else 0]
+        if lut is not None:
+            lut = np.frombuffer(lut, dtype=np.uint8).reshape(-1, 3).astype(np.float64)
+        _palette_luts[index] = lut
+    return _palette_luts[index]
+
+# hue, saturation, value in 0-1 (arrays) => (n, 3) RGB in 0-255
+def hsv_to_rgb(h, s, v):
+    k = (np.array([5.0, 3.0, 1.0]) + (h * 6)[..., None]) % 6
+    ramp = np.clip(np.minimum(k, 4 - k), 0, 1)
+    return (v[..., None] * (1 - s[..., None] * ramp)) * 255
+
+def beatsin(bpm, low, high, t):
+    return low + (high - low) * (math.sin(2 * math.pi * bpm / 60 * t) + 1) / 2
+
+class RgbRenderer:
+
+    def __init__(self, rgb_config):
+        self.frame = None
+        self.configure(rgb_config)
+
+    def configure(self, rgb_config):
+        # 0 renders the whole strip; the firmware drives at most ARCIN_RGB_NUM_LEDS_MAX
+        num_leds = min(rgb_config.num_leds or ARCIN_RGB_NUM_LEDS_MAX, ARCIN_RGB_NUM_LEDS_MAX)
+        mode = min(rgb_config.mode, len(RGB_MODE_OPTIONS) - 1)
+        if self.frame is None or len(self.frame) != num_leds or mode != self.mode:
+            self.frame = np.zeros((num_leds, 3), dtype=np.uint8)
+            self.leds = np.zeros((num_leds, 3), dtype=np.float64)
+            self.positions = np.arange(num_leds) / num_leds
+            self.last_t = None
+            self.pride_time = 0.0
+            self.pride_hue = 0.0
+            self.pacifica_starts = np.zeros(4)
+
+        self.config = rgb_config
+        self.mode = mode
+        self.num_leds = num_leds
+        self.speed = idle_speed_value(
+            rgb_config.idle_speed, RGB_MODE_OPTIONS[mode].idle_animation_unit)
+        self.colors = np.array([rgb_config.rgb1, rgb_config.rgb2, rgb_config.rgb3],
+                               dtype=np.float64)
+        self.lut = palette_lut(rgb_config.mode_options & 0x1F)
+        # a palette mode without the palette's gradient stays dark
+        self.has_preview = self.lut is not None or mode not in PALETTE_MODES
+        self.multiplicity = (rgb_config.mode_options >> 5) & 0x7
+        self.brightness = (ARCIN_RGB_MAX_DARKNESS - rgb_config.darkness) / 255
+        self.flip = bool(rgb_config.flags & ARCIN_RGB_FLAG_FLIP_DIRECTION)
+
+    def __multiplicity__(self):
+        option = RGB_MODE_OPTIONS[self.mode]
+        return min(option.multiplicity_max, max(option.multiplicity_min, self.multiplicity))
+
+    # fraction of a revolution (RPM modes) or beat (BPM modes) elapsed at t
+    def __phase__(self, t):
+        return self.speed / 60 * t
+
+    # (level in 0-1, beat number) of a flash that fades out over one beat
+    def __flash__(self, t):
+        beat = self.__phase__(t)
+        return ((1 - (beat % 1)) ** 2, int(beat))
+
+    def render(self, t):
+        elapsed = 0.0 if self.last_t is None else max(0.0, t - self.last_t)
+        self.last_t = t
+
+        mode = self.mode
+        leds = self.leds
+        if not self.has_preview:
+            leds[:] = 0
+        elif mode == RGB_MODE_BREATHE:
+            level = 1.0
+            if self.speed:
+                level = 0.5 - 0.5 * math.cos(2 * math.pi * self.__phase__(t))
+            leds[:] = self.colors[0] * level
+        elif mode == RGB_MODE_FLASH:
+            if self.speed:
+                level, beat = self.__flash__(t)
+                leds[:] = self.colors[beat % 2] * level
+            else:
+                leds[:] = self.colors[0]
+        elif mode == RGB_MODE_FLASH_RANDOM:
+            if self.speed:
+                level, beat = self.__flash__(t)
+                # same pseudo-random palette entry for the whole beat
+                leds[:] = self.lut[((beat * 2654435761) >> 8) & 0xff] * level
+            else:
+                leds[:] = self.lut[0]
+        elif mode in (RGB_MODE_TRICOLOR, RGB_MODE_DIVISIONS):
+            count = 3 if mode == RGB_MODE_TRICOLOR else self.__multiplicity__()
+            rotated = (self.positions + self.__phase__(t)) % 1
+            leds[:] = self.colors[(rotated * count).astype(np.int64)]
+        elif mode == RGB_MODE_DOTS:
+            count = self.__multiplicity__()
+            centers = (self.__phase__(t) + np.arange(count) / count) % 1
+            distance = np.abs(self.positions[:, None] - centers[None, :])
+            distance = np.minimum(distance, 1 - distance) * self.num_leds
+            # each dot is about 1/12 of the ring wide, fading towards its edges
+            width = max(1.0, self.num_leds / 12)
+            levels = np.clip(1 - distance / width, 0, 1)
+            leds[:] = np.minimum(levels @ self.colors[:count], 255)
+        elif mode == RGB_MODE_RAINBOW_GLOW:
+            leds[:] = self.lut[int(self.__phase__(t) * 256) & 0xff]
+        elif mode == RGB_MODE_RAINBOW_SPIRAL:
+            wave = self.__multiplicity__()
+            index = ((self.positions / wave + self.__phase__(t)) * 256).astype(np.int64)
+            leds[:] = self.lut[index & 0xff]
+        elif mode == RGB_MODE_PRIDE:
+            self.__pride__(t, elapsed)
+        elif mode == RGB_MODE_PACIFICA:
+            self.__pacifica__(t, elapsed)
+
+        frame = leds * self.brightness
+        if self.flip:
+            frame = frame[::-1]
+        np.copyto(self.frame, frame, casting="unsafe")
+        return self.frame
+
+    def __pride__(self, t, elapsed):
+        ms = elapsed * 1000
+        saturation = beatsin(87 / 256, 220, 250, t) / 255
+        depth = beatsin(341 / 256, 96, 224, t)
+        theta_step = beatsin(203 / 256, 25 * 256, 40 * 256, t)
+        hue_step = beatsin(113 / 256, 1, 3000, t)
+        self.pride_time += ms * beatsin(147 / 256, 23, 60, t)
+        self.pride_hue += ms * beatsin(400 / 256, 5, 9, t)
+
+        steps = np.arange(1, self.num_leds + 1)
+        hue = ((self.pride_hue + hue_step * steps) % 65536) / 65536
+        theta = (self.pride_time + theta_step * steps) % 65536 / 65536
+        wave = (np.sin(2 * math.pi * theta) + 1) / 2
+        value = (wave * wave * depth + (255 - depth)) / 255
+
+        color = hsv_to_rgb(hue, np.full(self.num_leds, saturation), value)
+        # drawn from the far end, blended into the previous frame (nblend 64)
+        self.leds += (color[::-1] - self.leds) * (64 / 256)
+
+    def __pacifica__(self, t, elapsed):
+        ms = elapsed * 1000
+        speed1 = beatsin(3, 179, 269, t) / 256
+        speed2 = beatsin(4, 179, 269, t) / 256
+        ms1 = ms * speed1
+        ms2 = ms * speed2
+        starts = self.pacifica_starts
+        starts[0] += ms1 * beatsin(1011 / 256, 10, 13, t)
+        starts[1] -= (ms1 + ms2) / 2 * beatsin(777 / 256, 8, 11, t)
+        starts[2] -= ms1 * beatsin(501 / 256, 5, 7, t)
+        starts[3] -= ms2 * beatsin(257 / 256, 4, 6, t)
+
+        beat16 = lambda bpm: (t * bpm / 60 * 65536) % 65536
+        layers = [
+            (PACIFICA_LUTS[0], starts[0], beatsin(3, 11 * 256, 14 * 256, t),
+             beatsin(10, 70, 130, t), -beat16(301)),
+            (PACIFICA_LUTS[1], starts[1], beatsin(4, 6 * 256, 9 * 256, t),
+             beatsin(17, 40, 80, t), beat16(401)),
+            (PACIFICA_LUTS[2], starts[2], 6 * 256,
+             beatsin(9, 10, 38, t), -beat16(503)),
+            (PACIFICA_LUTS[2], starts[3], 5 * 256,
+             beatsin(8, 10, 28, t), beat16(601)),
+        ]
+
+        leds = self.leds
+        leds[:] = (2, 6, 10)
+        steps = np.arange(1, self.num_leds + 1)
+        for palette, start, scale, brightness, offset in layers:
+            half = scale / 2
+            angle = (offset + 250 * steps) / 65536
+            color_index = start + np.cumsum((np.sin(2 * math.pi * angle) + 1) / 2 * half + half)
+            index = ((np.sin(2 * math.pi * color_index / 65536) + 1) / 2 * 240).astype(np.int64)
+            leds += palette[index] * (brightness / 255)
+        np.minimum(leds, 255, out=leds)
+
+        # whitecaps where the layers add up brightest
+        threshold = (beatsin(9, 55, 65, t)
+            + (np.sin(2 * math.pi * ((t * 7 / 60 * 256 + 7 * np.arange(self.num_leds)) % 256) / 256)
+               + 1) / 2 * 20)
+        overage = np.maximum(leds.mean(axis=1) - threshold, 0)[:, None]
+        leds += overage * np.array([1, 2, 4])
+        np.minimum(leds, 255, out=leds)
+
+        # deepen the blues and greens
+        leds *= (1, 200 / 256, 145 / 256)
+        np.maximum(leds, (2, 5, 7), out=leds)
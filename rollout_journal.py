@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+# Write-ahead journal for bulk rollouts, so a rollout that dies halfway can be
+# re-run without writing to (and rebooting) the controllers it already did.
+#
+# <path> is append-only JSON lines, one per step, keyed by serial number and
+# the hash of the packed config:
+#   {"serial": ..., "config": <sha256>, "state": "begin", "time": ...}
+#   {"serial": ..., "config": <sha256>, "state": "done", "time": ..., "message": ...}
+# "begin" is written and fsynced before the device is touched, "done" or
+# "failed" after the save returns. On open the file is replayed; a "begin"
+# without an outcome means the run stopped while that device was being
+# written, so its state is unknown and it is tried again (save_to_device's
+# read-compare skips the reboot if the write did land). A torn last line from
+# a crash mid-append is cut off.
+#
+#   journal = RolloutJournal("rollout.journal")
+#   digest = config_hash(conf)
+#   if not journal.is_done(serial_number, digest):
+#       journal.begin(serial_number, digest)
+#       result, message = save_to_device(device, conf)
+#       journal.finish(serial_number, digest, result, message)
+
+import hashlib
+import json
+import os
+import threading
+import time
+from arcin_config import pack_config
+
+STATE_BEGIN = "begin"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+def config_hash(conf):
+    return hashlib.sha256(pack_config(conf)).hexdigest()
+
+def _fsync_directory(path):
+    # makes a newly created file's directory entry durable; not possible
+    # (nor needed) on Windows
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class RolloutJournal:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # (serial number, config hash) => last state
+        self.states = {}
+        self.__replay__()
+        created = not os.path.exists(path)
+        self.file = open(path, "ab")
+        if created:
+            _fsync_directory(path)
+
+    def __replay__(self):
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete != len(data):
+            # torn final append; cut it off so the next entry starts cleanly
+            os.truncate(self.path, complete)
+        for number, line in enumerate(data[:complete].split(b"\n")[:-1], 1):
+            try:
+                entry = json.loads(line)
+                self.states[(entry["serial"], entry["config"])] = entry["state"]
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"{self.path}:{number}: corrupt journal entry")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __append__(self, serial_number, digest, state, message=None):
+        entry = {"serial": serial_number, "config": digest, "state": state,
+                 "time": time.time()}
+        if message is not None:
+            entry["message"] = message
+        line = json.dumps(entry).encode() + b"\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.states[(serial_number, digest)] = state
+
+    def state(self, serial_number, digest):
+        with self.lock:
+            return self.states.get((serial_number, digest))
+
+    def is_done(self, serial_number, digest):
+        return self.state(serial_number, digest) == STATE_DONE
+
+    # (serial number, config hash) of writes that started but never finished
+    def interrupted(self):
+        with self.lock:
+            return sorted(k for k, s in self.states.items() if s == STATE_BEGIN)
+
+    def begin(self, serial_number, digest):
+        self.__append__(serial_number, digest, STATE_BEGIN)
+
+    def finish(self, serial_number, digest, result, message=None):
+        self.__append__(
+            serial_number, digest, STATE_DONE if result else STATE_FAILED, message)
@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ["ARCIN_TRANSPORT"] = "sim"
+
+import hid_transport
+
+@pytest.fixture
+def sim(monkeypatch, tmp_path):
+    # a fresh simulated bus per test; the ARCIN_SIM_* defaults are tuned down
+    # so reboots and transfers don't slow the suite down
+    def make(devices=3, **env):
+        settings = {"ARCIN_SIM_DEVICES": devices, "ARCIN_SIM_LATENCY_MS": 0,
+                    "ARCIN_SIM_JITTER_MS": 0, "ARCIN_SIM_REBOOT_MS": 50}
+        settings.update(env)
+        for name, value in settings.items():
+            monkeypatch.setenv(name, str(value))
+        monkeypatch.setenv("ARCIN_LOCK_DIR", str(tmp_path / "locks"))
+        hid_transport.register_transport("sim", hid_transport.TRANSPORTS["sim"])
+        return hid_transport.get_transport("sim").bus
+    yield make
+    hid_transport.register_transport("sim", hid_transport.TRANSPORTS["sim"])
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+import arcin_async
+from arcin_async import AsyncArcin, DeviceBusy, DeviceTimeout
+from device_pool import DevicePool
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_load_and_save(sim):
+    bus = sim(2)
+
+    async def main():
+        async with AsyncArcin() as arcin:
+            conf = await arcin.load("SIM00001", timeout=2)
+            ok, message = await arcin.save("SIM00001", conf._replace(label=b"async"))
+            return ok, message
+
+    ok, message = run(main())
+    assert ok, message
+    assert bus.find("SIM00001").config.startswith(b"async")
+
+def test_close_leaves_a_shared_pool_open(sim):
+    bus = sim(1)
+    pool = DevicePool()
+
+    async def main(arcin):
+        async with arcin:
+            await arcin.load("SIM00000", timeout=2)
+
+    run(main(AsyncArcin(pool=pool)))
+    # the session opened through AsyncArcin is still usable by the owner
+    assert not pool.closed
+    assert pool.sessions
+    reads = bus.find("SIM00000").reads
+    pool.call(pool.find_device("SIM00000"), lambda d: d.get_feature_report(0xc0, 64))
+    assert bus.find("SIM00000").reads == reads + 1
+    pool.close_all()
+
+    arcin = AsyncArcin()
+    run(main(arcin))
+    assert arcin.pool.closed
+    assert not arcin.pool.sessions
+
+def test_coalesced_callers_keep_their_own_deadlines(sim):
+    bus = sim(1, ARCIN_SIM_LATENCY_MS=300)
+
+    async def main():
+        async with AsyncArcin() as arcin:
+            await arcin.devices()
+            reads = bus.find("SIM00000").reads
+            short, long = await asyncio.gather(
+                arcin.load("SIM00000", timeout=0.1),
+                arcin.load("SIM00000", timeout=3),
+                return_exceptions=True)
+            return short, long, bus.find("SIM00000").reads - reads
+
+    short, long, reads = run(main())
+    assert isinstance(short, DeviceTimeout)
+    assert "0.1 s" in str(short)
+    assert long.label.startswith(b"arcin")
+    assert reads == 1
+
+def test_hung_device_is_busy_and_others_continue(sim, monkeypatch):
+    # the shared read behind a load waits at least this long
+    monkeypatch.setattr(arcin_async, "DEFAULT_TIMEOUT", 0.3)
+    bus = sim(2, ARCIN_SIM_HANG_MS=1000)
+    bus.find("SIM00000").hang_rate = 1.0
+
+    async def main():
+        async with AsyncArcin() as arcin:
+            await arcin.devices()
+            results = await arcin.load_many(["SIM00000", "SIM00001"], timeout=0.3)
+            with pytest.raises(DeviceBusy):
+                await arcin.load("SIM00000", timeout=0.3)
+            return results
+
+    results = run(main())
+    assert isinstance(results["SIM00000"], DeviceTimeout)
+    assert results["SIM00001"].label.startswith(b"arcin")
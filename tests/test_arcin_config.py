@@ -0,0 +1,44 @@
+import struct
+from arcin_config import ArcinConfig, CONFIG_FIELDS, CONFIG_SIZE, STRUCT_FMT_EX
+from arcin_config import pack_config, pack_config_into, unpack_config
+from arcin_config import conf_to_dict, conf_from_dict, diff_configs, label_text
+from arcin_device import CONFIG_DATA_OFFSET, CONFIG_REPORT_SIZE, parse_device
+from arcin_emulator import DEFAULT_CONFIG
+
+# every field set to something other than its neighbours
+SAMPLE = ArcinConfig(**{
+    name: (b"label\0\0\0\0\0\0\0" if name == "label" else
+           bytes(range(1, 17)) if name == "keycodes" else
+           -3 if fmt == "b" else
+           0x12345678 if fmt == "L" else
+           i + 1)
+    for i, (name, fmt, _) in enumerate(f for f in CONFIG_FIELDS if f[0] is not None)})
+
+def test_layout_matches_the_firmware():
+    assert STRUCT_FMT_EX.startswith("<")
+    assert CONFIG_SIZE == struct.calcsize(STRUCT_FMT_EX) == 0x3C
+
+def test_round_trip():
+    payload = pack_config(SAMPLE)
+    assert len(payload) == CONFIG_SIZE
+    assert unpack_config(payload) == SAMPLE
+    assert pack_config(unpack_config(payload)) == payload
+
+def test_pack_into_a_report():
+    report = bytearray(CONFIG_REPORT_SIZE)
+    pack_config_into(report, CONFIG_DATA_OFFSET, SAMPLE)
+    assert report[:CONFIG_DATA_OFFSET] == bytes(CONFIG_DATA_OFFSET)
+    assert parse_device(report) == SAMPLE
+    assert parse_device(memoryview(report)) == SAMPLE
+
+def test_text_label_and_padding():
+    conf = SAMPLE._replace(label="label", keycodes=list(range(1, 17)))
+    assert pack_config(conf) == pack_config(SAMPLE)
+    assert label_text(unpack_config(pack_config(conf)).label) == "label"
+    assert diff_configs(conf, SAMPLE) == []
+    assert diff_configs(SAMPLE, SAMPLE._replace(debounce_ticks=9)) == [
+        ("debounce_ticks", SAMPLE.debounce_ticks, 9)]
+
+def test_dict_round_trip():
+    d = conf_to_dict(DEFAULT_CONFIG)
+    assert pack_config(conf_from_dict(d)) == pack_config(DEFAULT_CONFIG)
@@ -0,0 +1,39 @@
+from arcin_config import unpack_config
+from arcin_device import get_devices, save_to_device, SAVE_UNCHANGED
+from arcin_emulator import DEFAULT_CONFIG
+
+def test_unchanged_config_is_not_written(sim):
+    bus = sim(1)
+    arcin = bus.arcins[0]
+    device = get_devices()[0]
+    assert save_to_device(device, DEFAULT_CONFIG) == (True, SAVE_UNCHANGED)
+    assert (arcin.writes, arcin.reboots) == (0, 0)
+
+def test_force_writes_an_unchanged_config(sim):
+    bus = sim(1)
+    arcin = bus.arcins[0]
+    ok, message = save_to_device(get_devices()[0], DEFAULT_CONFIG, force=True)
+    assert ok and message == "Success"
+    assert (arcin.writes, arcin.reboots) == (1, 1)
+
+def test_changed_fields_are_listed(sim, capsys):
+    bus = sim(1)
+    arcin = bus.arcins[0]
+    device = get_devices()[0]
+    conf = DEFAULT_CONFIG._replace(
+        label="changed", debounce_ticks=DEFAULT_CONFIG.debounce_ticks + 1,
+        # same bytes once packed, so not a change
+        keycodes=list(DEFAULT_CONFIG.keycodes))
+    ok, message = save_to_device(device, conf)
+    assert ok
+    assert message == "Success (changed: label, debounce_ticks)"
+    assert (arcin.writes, arcin.reboots) == (1, 1)
+    assert unpack_config(arcin.config).label.rstrip(b"\0") == b"changed"
+
+    changes = [line for line in capsys.readouterr().out.splitlines() if " -> " in line]
+    assert changes == [
+        f"{device.serial_number}: label: {DEFAULT_CONFIG.label.encode().ljust(12, bytes(1))!r} "
+        f"-> {b'changed'.ljust(12, bytes(1))!r}",
+        f"{device.serial_number}: debounce_ticks: {DEFAULT_CONFIG.debounce_ticks} "
+        f"-> {conf.debounce_ticks}",
+    ]
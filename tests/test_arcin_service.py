@@ -0,0 +1,192 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from arcin_async import AsyncArcin
+from arcin_config import label_text, unpack_config
+import arcin_service
+from arcin_service import ArcinService
+from device_lock import DeviceLock
+
+# Runs the service on its own event loop thread against the simulator, so
+# tests can talk to it with a plain blocking HTTP client.
+class RunningService:
+
+    def __init__(self, host="127.0.0.1", allow_hosts=()):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.arcin = AsyncArcin()
+        self.service = ArcinService(self.arcin, timeout=2)
+        self.server = self.call(self.service.start(host, 0, allow_hosts))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.address = "::1" if host == "::1" else "127.0.0.1"
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(10)
+
+    # the server belongs to the loop thread; closing it from here races with
+    # connections it is still winding down
+    async def __close_server__(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def close(self):
+        self.call(self.__close_server__())
+        self.arcin.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+    # until serial is enumerated again after a reboot
+    def wait_for(self, serial_number, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status, devices = self.request("GET", "/devices")
+            if any(d["serial_number"] == serial_number for d in devices):
+                return
+            time.sleep(0.02)
+        raise AssertionError(f"{serial_number} did not come back")
+
+    def request(self, method, path, body=None, headers=None):
+        connection = http.client.HTTPConnection(self.address, self.port, timeout=10)
+        try:
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body)
+            connection.request(method, path, body, headers or {})
+            response = connection.getresponse()
+            data = response.read().decode()
+            if response.getheader("Content-Type", "").startswith("application/json"):
+                data = json.loads(data)
+            return response.status, data
+        finally:
+            connection.close()
+
+@pytest.fixture
+def service(sim):
+    bus = sim(3)
+    running = RunningService()
+    running.bus = bus
+    yield running
+    running.close()
+
+def test_list_get_put_reboot(service):
+    status, devices = service.request("GET", "/devices")
+    assert status == 200
+    assert sorted(d["serial_number"] for d in devices) == ["SIM00000", "SIM00001", "SIM00002"]
+
+    status, conf = service.request("GET", "/devices/SIM00000/config")
+    assert status == 200
+    status, body = service.request(
+        "PUT", "/devices/SIM00000/config", dict(conf, label="service"))
+    assert status == 200
+    assert body["ok"]
+    stored = unpack_config(bytes(service.bus.find("SIM00000").config))
+    assert label_text(stored.label) == "service"
+
+    service.wait_for("SIM00000")
+    status, body = service.request("POST", "/devices/SIM00000/reboot")
+    assert status == 200
+    assert body["ok"]
+
+def test_errors(service):
+    status, _ = service.request("GET", "/devices/NOSUCH/config")
+    assert status == 404
+    status, _ = service.request("GET", "/nowhere")
+    assert status == 404
+    status, _ = service.request("DELETE", "/devices/SIM00000/config")
+    assert status == 405
+    status, _ = service.request("GET", "/devices/SIM00000/reboot")
+    assert status == 405
+
+def test_concurrent_gets_share_reads(sim):
+    bus = sim(1, ARCIN_SIM_LATENCY_MS=100)
+    running = RunningService()
+    try:
+        running.request("GET", "/devices")
+        arcin = bus.find("SIM00000")
+        before = arcin.reads
+        with ThreadPoolExecutor(10) as executor:
+            results = list(executor.map(
+                lambda _: running.request("GET", "/devices/SIM00000/config"), range(10)))
+        assert all(status == 200 for status, _ in results)
+        assert arcin.reads - before < 10
+    finally:
+        running.close()
+
+def test_rejects_cross_origin_requests(service):
+    status, body = service.request(
+        "POST", "/devices/SIM00000/reboot", headers={"Origin": "http://example.com"})
+    assert status == 403
+    assert "cross-origin" in body["error"]
+
+def test_rejects_foreign_host(service):
+    # what a DNS rebinding page's requests look like
+    status, _ = service.request(
+        "GET", "/devices", headers={"Host": f"attacker.example:{service.port}"})
+    assert status == 403
+    status, _ = service.request("GET", "/devices", headers={"Host": f"localhost:{service.port}"})
+    assert status == 200
+
+def test_wildcard_bind_needs_allowed_hosts(sim):
+    sim(1)
+    for host in ("0.0.0.0", "::", ""):
+        with pytest.raises(ValueError):
+            asyncio.run(ArcinService(None).start(host, 0))
+    with pytest.raises(SystemExit):
+        arcin_service.main(["--host", "0.0.0.0"])
+
+    running = RunningService("0.0.0.0", ["cabinet.local"])
+    try:
+        for name, expected in (("cabinet.local", 200), ("127.0.0.1", 200),
+                               ("0.0.0.0", 403), ("attacker.example", 403)):
+            status, _ = running.request(
+                "GET", "/devices", headers={"Host": f"{name}:{running.port}"})
+            assert status == expected, name
+    finally:
+        running.close()
+
+def test_ipv6_hosts_are_bracketed(sim):
+    sim(1)
+    running = RunningService("::1", ["fe80::1"])
+    try:
+        # http.client sends Host: [::1]:<port> by itself
+        assert running.request("GET", "/devices")[0] == 200
+        status, _ = running.request(
+            "GET", "/devices", headers={"Host": f"[fe80::1]:{running.port}"})
+        assert status == 200
+        status, _ = running.request(
+            "GET", "/devices", headers={"Host": f"fe80::1:{running.port}"})
+        assert status == 403
+    finally:
+        running.close()
+
+def test_put_rejects_invalid_configs(service):
+    status, conf = service.request("GET", "/devices/SIM00001/config")
+    assert status == 200
+
+    status, body = service.request("PUT", "/devices/SIM00001/config", "{not json")
+    assert status == 400
+    status, body = service.request(
+        "PUT", "/devices/SIM00001/config", dict(conf, debounce_ticks=300))
+    assert status == 400
+    status, body = service.request(
+        "PUT", "/devices/SIM00001/config", dict(conf, label="thirteen byte"))
+    assert status == 400
+    assert "label" in body["error"]
+    status, body = service.request(
+        "PUT", "/devices/SIM00001/config", dict(conf, keycodes=[0] * 17))
+    assert status == 400
+
+def test_locked_device_is_a_conflict(service):
+    status, conf = service.request("GET", "/devices/SIM00002/config")
+    with DeviceLock("SIM00002"):
+        status, body = service.request("POST", "/devices/SIM00002/reboot")
+        assert status == 409
+        status, body = service.request(
+            "PUT", "/devices/SIM00002/config?force=1", dict(conf, label="locked"))
+        assert status == 409
+    status, body = service.request("POST", "/devices/SIM00002/reboot")
+    assert status == 200
@@ -0,0 +1,139 @@
+import os
+import config_archive
+from arcin_config import pack_config
+from arcin_emulator import DEFAULT_CONFIG
+from config_archive import ConfigArchive, HEADER, RECORD, INDEX_HEADER, INDEX_ENTRY
+
+def conf(label):
+    return DEFAULT_CONFIG._replace(label=label)
+
+def fill(archive):
+    # appended out of time order on purpose
+    archive.append("B", conf("b2"), "fw1", timestamp=200)
+    archive.append("A", conf("a1"), "fw1", timestamp=100)
+    archive.append("B", conf("b1"), "fw1", timestamp=100)
+    archive.append("A", conf("a3"), "fw2", timestamp=300)
+    archive.append("A", conf("a2"), "fw1", timestamp=200)
+
+def check(archive):
+    assert len(archive) == 5
+    assert archive.latest("A").config.label.rstrip(b"\0") == b"a3"
+    assert archive.latest("A").firmware == "fw2"
+    assert archive.at("A", 250).config.label.rstrip(b"\0") == b"a2"
+    assert archive.at("A", 99) is None
+    assert archive.latest("C") is None
+    assert [r.timestamp for r in archive.history("B")] == [100, 200]
+    assert [r.config.label.rstrip(b"\0") for r in archive.history("A")] == [b"a1", b"a2", b"a3"]
+
+def test_lookups_before_and_after_reopen(tmp_path):
+    path = str(tmp_path / "configs.arc")
+    archive = ConfigArchive(path)
+    fill(archive)
+    check(archive)
+    assert archive.sorted_count == 0
+    archive.close()
+
+    archive = ConfigArchive(path)
+    # appended entries were merged into the sorted run
+    assert archive.sorted_count == 5
+    check(archive)
+    archive.append("A", conf("a4"), timestamp=400)
+    assert pack_config(archive.latest("A").config) == pack_config(conf("a4"))
+    archive.close()
+
+def test_merges_after_max_unsorted(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_archive, "MAX_UNSORTED", 2)
+    archive = ConfigArchive(str(tmp_path / "configs.arc"))
+    fill(archive)
+    assert archive.sorted_count == 4
+    assert len(archive.unsorted) == 1
+    check(archive)
+    archive.close()
+
+def test_missing_index_entries_are_added(tmp_path):
+    path = str(tmp_path / "configs.arc")
+    archive = ConfigArchive(path)
+    fill(archive)
+    archive.close()
+    # a crash between writing the record and its index entry
+    with open(path + ".idx", "r+b") as f:
+        f.truncate(os.path.getsize(path + ".idx") - INDEX_ENTRY.size)
+    archive = ConfigArchive(path)
+    check(archive)
+    archive.close()
+
+def test_damaged_index_is_rebuilt(tmp_path, capsys):
+    path = str(tmp_path / "configs.arc")
+    archive = ConfigArchive(path)
+    fill(archive)
+    archive.close()
+    archive = ConfigArchive(path)
+    archive.close()
+    # the last entry of the sorted run no longer matches its record
+    with open(path + ".idx", "r+b") as f:
+        f.seek(INDEX_HEADER.size + 4 * INDEX_ENTRY.size + 3)
+        f.write(b"\xff\xff")
+    archive = ConfigArchive(path)
+    assert "rebuilding" in capsys.readouterr().out
+    check(archive)
+    archive.close()
+
+def test_rebuild_index_repairs_what_open_doesnt_check(tmp_path, capsys):
+    path = str(tmp_path / "configs.arc")
+    archive = ConfigArchive(path)
+    fill(archive)
+    archive.close()
+    archive = ConfigArchive(path)
+    archive.close()
+    # swap the first two entries of the sorted run
+    with open(path + ".idx", "r+b") as f:
+        f.seek(INDEX_HEADER.size)
+        first, second = INDEX_ENTRY.iter_unpack(f.read(2 * INDEX_ENTRY.size))
+        f.seek(INDEX_HEADER.size)
+        f.write(INDEX_ENTRY.pack(*second) + INDEX_ENTRY.pack(*first))
+    archive = ConfigArchive(path)
+    assert capsys.readouterr().out == ""
+    archive.rebuild_index()
+    check(archive)
+    archive.close()
+
+def test_data_file_grows_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_archive, "DATA_CHUNK_RECORDS", 4)
+    path = str(tmp_path / "configs.arc")
+    archive = ConfigArchive(path)
+    fill(archive)
+    assert archive.record_count() == 5
+    assert os.path.getsize(path) == HEADER.size + 8 * RECORD.size
+    archive.close()
+    assert os.path.getsize(path) == HEADER.size + 5 * RECORD.size
+
+def test_unused_chunk_after_a_crash_is_skipped(tmp_path):
+    path = str(tmp_path / "configs.arc")
+    archive = ConfigArchive(path)
+    fill(archive)
+    archive.close()
+    # the zeroed rest of a chunk, as left by a crash before close()
+    with open(path, "r+b") as f:
+        f.truncate(HEADER.size + 16 * RECORD.size)
+    archive = ConfigArchive(path)
+    assert archive.record_count() == 5
+    check(archive)
+    archive.append("A", conf("a4"), timestamp=400)
+    assert archive.record_count() == 6
+    archive.close()
+    archive = ConfigArchive(path)
+    assert archive.latest("A").config.label.rstrip(b"\0") == b"a4"
+    archive.close()
+
+def test_rebuild_index(tmp_path):
+    path = str(tmp_path / "configs.arc")
+    archive = ConfigArchive(path)
+    fill(archive)
+    archive.rebuild_index()
+    assert archive.sorted_count == 5
+    check(archive)
+    archive.close()
+    os.remove(path + ".idx")
+    archive = ConfigArchive(path)
+    check(archive)
+    archive.close()
@@ -0,0 +1,77 @@
+import pytest
+from arcin_config import CONFIG_SIZE, pack_config, pack_config_into, unpack_config
+from arcin_config import ARCIN_CONFIG_FLAG_250HZ_MODE, ARCIN_CONFIG_FLAG_DEBOUNCE
+from arcin_config import ARCIN_CONFIG_FLAG_WS2812B, ARCIN_RGB_FLAG_FLIP_DIRECTION
+from arcin_config import ARCIN_RGB_FLAG_FADE_OUT_SLOW
+from arcin_device import CONFIG_DATA_OFFSET, CONFIG_REPORT_ID, CONFIG_REPORT_SIZE
+from arcin_emulator import DEFAULT_CONFIG
+from config_bulk import CONFIG_FLAGS, RGB_FLAGS, decode_configs, decode_flags
+from config_bulk import flag_column, rgb_flag_column, record_to_config
+
+# normalized by a round trip, DEFAULT_CONFIG has a str label
+CONFIGS = [unpack_config(pack_config(conf)) for conf in [
+    DEFAULT_CONFIG,
+    DEFAULT_CONFIG._replace(
+        label=b"full label!!", qe1_sens=-5, qe2_sens=-128, rgb_tt_speed=-1,
+        flags=ARCIN_CONFIG_FLAG_250HZ_MODE | ARCIN_CONFIG_FLAG_WS2812B,
+        rgb_flags=ARCIN_RGB_FLAG_FLIP_DIRECTION),
+    DEFAULT_CONFIG._replace(
+        # trailing NULs, which numpy strips from byte strings
+        label=b"ab\0\0\0\0\0\0\0\0\0\0", keycodes=bytes([4, 0, 5] + [0] * 13),
+        qe1_sens=127, flags=0xffffffff, rgb_flags=0xff,
+        rgb_mode_options=0xe3, debounce_ticks=255),
+    DEFAULT_CONFIG._replace(
+        label=bytes(12), keycodes=bytes(range(0xf0, 0x100)),
+        flags=ARCIN_CONFIG_FLAG_DEBOUNCE, rgb_flags=ARCIN_RGB_FLAG_FADE_OUT_SLOW),
+]]
+
+def configs_blob():
+    return b"".join(pack_config(conf) for conf in CONFIGS)
+
+def reports_blob():
+    reports = bytearray(CONFIG_REPORT_SIZE * len(CONFIGS))
+    for i, conf in enumerate(CONFIGS):
+        reports[i * CONFIG_REPORT_SIZE] = CONFIG_REPORT_ID
+        pack_config_into(reports, i * CONFIG_REPORT_SIZE + CONFIG_DATA_OFFSET, conf)
+    return bytes(reports)
+
+def test_decode_matches_unpack_config():
+    blob = configs_blob()
+    records = decode_configs(blob)
+    assert len(records) == len(CONFIGS)
+    for i, record in enumerate(records):
+        expected = unpack_config(blob, i * CONFIG_SIZE)
+        assert record_to_config(record) == expected == CONFIGS[i]
+
+def test_decode_feature_reports():
+    records = decode_configs(reports_blob(), CONFIG_REPORT_SIZE, CONFIG_DATA_OFFSET)
+    assert [record_to_config(r) for r in records] == CONFIGS
+
+def test_signed_and_byte_fields():
+    records = decode_configs(configs_blob())
+    assert list(records["qe1_sens"]) == [c.qe1_sens for c in CONFIGS]
+    assert list(records["qe2_sens"]) == [c.qe2_sens for c in CONFIGS]
+    assert list(records["rgb_tt_speed"]) == [c.rgb_tt_speed for c in CONFIGS]
+    assert record_to_config(records[2]).label == b"ab" + bytes(10)
+    assert record_to_config(records[2]).keycodes == bytes([4, 0, 5] + [0] * 13)
+    assert record_to_config(records[3]).label == bytes(12)
+
+def test_flag_columns():
+    records = decode_configs(reports_blob(), CONFIG_REPORT_SIZE, CONFIG_DATA_OFFSET)
+    assert list(flag_column(records, ARCIN_CONFIG_FLAG_250HZ_MODE)) == [
+        bool(c.flags & ARCIN_CONFIG_FLAG_250HZ_MODE) for c in CONFIGS]
+    assert list(rgb_flag_column(records, ARCIN_RGB_FLAG_FLIP_DIRECTION)) == [
+        bool(c.rgb_flags & ARCIN_RGB_FLAG_FLIP_DIRECTION) for c in CONFIGS]
+
+    columns = decode_flags(records)
+    assert set(columns) == set(CONFIG_FLAGS) | set(RGB_FLAGS)
+    for name, bit in CONFIG_FLAGS.items():
+        assert list(columns[name]) == [bool(c.flags & bit) for c in CONFIGS]
+    for name, bit in RGB_FLAGS.items():
+        assert list(columns[name]) == [bool(c.rgb_flags & bit) for c in CONFIGS]
+
+def test_partial_record():
+    with pytest.raises(ValueError):
+        decode_configs(configs_blob()[:-1])
+    with pytest.raises(ValueError):
+        decode_configs(reports_blob()[:-4], CONFIG_REPORT_SIZE, CONFIG_DATA_OFFSET)
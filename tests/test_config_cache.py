@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+from arcin_config import pack_config
+from arcin_emulator import DEFAULT_CONFIG
+import time
+from arcin_device import get_devices, reboot_device
+from config_cache import ConfigCache
+
+def fake_device(serial_number, path="/dev/hidraw0", enumeration_id="1:5"):
+    return SimpleNamespace(serial_number=serial_number, path=path, enumeration_id=enumeration_id)
+
+def test_hit_after_put():
+    cache = ConfigCache()
+    device = fake_device("a")
+    assert cache.get(device) is None
+    cache.put(device, DEFAULT_CONFIG)
+    assert pack_config(cache.get(device)) == pack_config(DEFAULT_CONFIG)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_reenumerated_device_is_stale():
+    cache = ConfigCache()
+    cache.put(fake_device("a", enumeration_id="1:5"), DEFAULT_CONFIG)
+    assert cache.get(fake_device("a", enumeration_id="1:6")) is None
+    assert cache.stats()["stale"] == 1
+    assert cache.stats()["entries"] == 0
+
+def test_written_config_is_adopted_after_reboot():
+    cache = ConfigCache()
+    conf = DEFAULT_CONFIG._replace(label=b"written")
+    cache.put_written(fake_device("a", enumeration_id="1:5"), conf)
+    # still the old enumeration: the controller hasn't rebooted yet
+    assert cache.get(fake_device("a", enumeration_id="1:5")) is None
+    assert cache.get(fake_device("a", enumeration_id="1:6")).label.startswith(b"written")
+
+def test_lru_eviction():
+    cache = ConfigCache(max_entries=2)
+    a, b, c = fake_device("a"), fake_device("b"), fake_device("c")
+    cache.put(a, DEFAULT_CONFIG)
+    cache.put(b, DEFAULT_CONFIG)
+    cache.get(a)
+    cache.put(c, DEFAULT_CONFIG)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_from_disk_are_only_hints(tmp_path):
+    path = str(tmp_path / "configs.json")
+    device = fake_device("a")
+    conf = DEFAULT_CONFIG._replace(label=b"cab-1")
+    ConfigCache(path).put(device, conf)
+
+    # same node and device number, as after a host reboot
+    cache = ConfigCache(path)
+    assert cache.get(device) is None
+    assert cache.hint("a").label.startswith(b"cab-1")
+    assert cache.stats()["unverified"] == 1
+    cache.put(device, conf)
+    assert cache.get(device) == cache.hint("a")
+
+def test_no_hits_without_enumeration_id():
+    cache = ConfigCache()
+    device = fake_device("a", path="\\\\?\\hid#vid_1ccf", enumeration_id=None)
+    cache.put(device, DEFAULT_CONFIG)
+    assert cache.get(device) is None
+    assert cache.hint("a") is not None
+
+class StubWatcher:
+
+    def add_listener(self, on_added=None, on_removed=None):
+        self.on_removed = on_removed
+
+def test_hits_without_enumeration_id_while_tracked():
+    cache = ConfigCache()
+    watcher = StubWatcher()
+    cache.track(watcher)
+    device = fake_device("a", path="\\\\?\\hid#vid_1ccf", enumeration_id=None)
+    cache.put(device, DEFAULT_CONFIG)
+    assert pack_config(cache.get(device)) == pack_config(DEFAULT_CONFIG)
+
+    # gone and back, e.g. rebooted by another program
+    watcher.on_removed("a")
+    assert cache.get(device) is None
+
+    # our own write is adopted once the controller has been seen going
+    conf = DEFAULT_CONFIG._replace(label=b"written")
+    cache.put_written(device, conf)
+    assert cache.get(device) is None
+    watcher.on_removed("a")
+    assert cache.get(device).label.startswith(b"written")
+
+def test_sim_reboot_makes_entry_stale(sim):
+    sim(1)
+    device = get_devices()[0]
+    cache = ConfigCache()
+    cache.put(device, DEFAULT_CONFIG)
+    reboot_device(device)
+    time.sleep(0.1)
+    assert cache.get(get_devices()[0]) is None
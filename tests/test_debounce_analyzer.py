@@ -0,0 +1,88 @@
+import numpy as np
+import debounce_analyzer
+from arcin_config import ARCIN_CONFIG_FLAG_DEBOUNCE, pack_config, unpack_config
+from debounce_analyzer import DebounceAnalyzer, DEBOUNCE_TICKS_MIN, DEBOUNCE_TICKS_MAX
+
+# button 1 pressed at 10 ms with 3 ms of chatter, released at 500 ms with
+# 2 ms of chatter, sampled every millisecond
+def chatter(t):
+    ms = int(t * 1000) % 1000
+    if 10 <= ms < 13 or 500 <= ms < 502:
+        return 1 if ms % 2 else 0
+    return 1 if 10 <= ms < 500 else 0
+
+def samples(seconds=2.0):
+    timestamps = np.arange(0, seconds, 0.001)
+    return timestamps, np.array([chatter(t) for t in timestamps], dtype=np.uint16)
+
+def test_recommend_without_chatter():
+    analyzer = DebounceAnalyzer()
+    analyzer.add_samples(np.arange(0, 1, 0.001), np.zeros(1000, dtype=np.uint16))
+    assert analyzer.recommend() == (DEBOUNCE_TICKS_MIN, False, 0.0)
+
+def test_recommend_covers_the_glitches():
+    analyzer = DebounceAnalyzer()
+    analyzer.add_samples(*samples())
+    ticks, enable, covered = analyzer.recommend(100)
+    assert enable
+    # 1 ms glitches need the state held for more than 1 tick
+    assert 0.001 <= covered <= 0.00125
+    assert ticks == DEBOUNCE_TICKS_MIN
+
+def test_recommend_is_clamped():
+    analyzer = DebounceAnalyzer(bounce_window=0.05)
+    timestamps = np.array([0.0, 0.1, 0.130, 0.2])
+    analyzer.add_samples(timestamps, np.array([0, 1, 0, 1], dtype=np.uint16))
+    assert analyzer.recommend(100)[0] == DEBOUNCE_TICKS_MAX
+
+def test_chunk_boundaries_carry_state():
+    timestamps, states = samples()
+    whole = DebounceAnalyzer(chunk_size=len(states))
+    whole.add_samples(timestamps, states)
+    for chunk_size in (1, 3, 7, 64):
+        chunked = DebounceAnalyzer(chunk_size=chunk_size)
+        for t, s in zip(timestamps, states):
+            chunked.add_report(t, int(s))
+        chunked.flush()
+        assert chunked.samples == whole.samples
+        assert (chunked.transitions == whole.transitions).all()
+        assert (chunked.glitches == whole.glitches).all()
+        assert (chunked.glitch_histogram == whole.glitch_histogram).all()
+
+def test_chunk_starting_with_a_transition():
+    # the transition at the start of the second chunk is against the last
+    # state of the first one, and its glitch length spans both
+    analyzer = DebounceAnalyzer(chunk_size=2)
+    analyzer.add_samples(np.array([0.0, 0.1]), np.array([0, 1], dtype=np.uint16))
+    analyzer.add_samples(np.array([0.102, 0.2]), np.array([0, 0], dtype=np.uint16))
+    assert analyzer.transitions[0] == 2
+    assert analyzer.glitches[0] == 1
+    assert abs(analyzer.longest_glitch[0] - 0.002) < 1e-9
+
+def test_refuses_to_capture_with_debouncing_on(sim):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    assert debounce_analyzer.main(["--seconds", "0.1"]) == 1
+    assert arcin.writes == 0
+
+def test_disables_debouncing_for_the_capture(sim):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    arcin.input_state = lambda t: (chatter(t), 0, 0)
+    assert debounce_analyzer.main(["--seconds", "0.6", "--disable-debounce"]) == 0
+    assert arcin.writes == 2
+    assert unpack_config(arcin.config).flags & ARCIN_CONFIG_FLAG_DEBOUNCE
+
+def test_apply_writes_the_recommendation(sim):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    arcin.input_state = lambda t: (chatter(t), 0, 0)
+    before = unpack_config(arcin.config)._replace(debounce_ticks=DEBOUNCE_TICKS_MAX)
+    arcin.config[:] = pack_config(before)
+    assert debounce_analyzer.main(
+        ["--seconds", "0.6", "--disable-debounce", "--apply"]) == 0
+    after = unpack_config(arcin.config)
+    assert after.flags & ARCIN_CONFIG_FLAG_DEBOUNCE
+    assert after.label == before.label
+    # 1 ms glitches, give or take the timing of the host's reads
+    assert DEBOUNCE_TICKS_MIN <= after.debounce_ticks < DEBOUNCE_TICKS_MAX
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import os
+import time
+import pytest
+import debounce_analyzer
+import provision
+import tt_calibration
+from arcin_async import AsyncArcin
+from arcin_config import ARCIN_CONFIG_FLAG_DEBOUNCE, pack_config, unpack_config
+from arcin_config import conf_to_dict, label_text
+from arcin_emulator import DEFAULT_CONFIG
+from device_lock import DeviceLock, DeviceLocked
+
+# another process writing to the controller holds its lock; the tools that
+# write configs must back off instead of writing alongside it
+
+def test_debounce_analyzer_writes_under_the_lock(sim):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    with DeviceLock("SIM00000"):
+        assert debounce_analyzer.main(["--seconds", "0.1", "--disable-debounce"]) == 1
+        conf = unpack_config(arcin.config)
+        arcin.config[:] = pack_config(conf._replace(flags=conf.flags & ~ARCIN_CONFIG_FLAG_DEBOUNCE))
+        assert debounce_analyzer.main(["--seconds", "0.1", "--apply"]) == 1
+    assert arcin.writes == 0
+
+def test_tt_calibration_writes_under_the_lock(sim):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    arcin.input_state = lambda t: (0, int(t * 2000) & 0xff, 0)
+    with DeviceLock("SIM00000"):
+        assert tt_calibration.main(
+            ["--revolutions", "1", "--seconds", "0.3", "--apply"]) == 1
+    assert arcin.writes == 0
+
+def test_provision_skips_a_locked_device(sim, tmp_path, capsys):
+    bus = sim(2)
+    profile = tmp_path / "profile.json"
+    profile.write_text(json.dumps(conf_to_dict(DEFAULT_CONFIG._replace(label="provisioned"))))
+    with DeviceLock("SIM00001"):
+        assert provision.main([str(profile), "--lock-timeout", "0.1"]) == 1
+    assert "SIM00001: in use by another process" in capsys.readouterr().out
+    assert label_text(unpack_config(bus.find("SIM00000").config).label) == "provisioned"
+    assert bus.find("SIM00001").writes == 0
+
+def test_async_save_raises_while_locked(sim):
+    bus = sim(1)
+
+    async def main():
+        async with AsyncArcin() as arcin:
+            conf = await arcin.load("SIM00000", timeout=2)
+            with DeviceLock("SIM00000"):
+                with pytest.raises(DeviceLocked):
+                    await arcin.save("SIM00000", conf, timeout=2, force=True)
+
+    asyncio.run(main())
+    assert bus.find("SIM00000").writes == 0
+
+def test_lock_timeout_and_release(tmp_path):
+    lock = DeviceLock("SIM/0", directory=str(tmp_path))
+    with lock:
+        start = time.monotonic()
+        with pytest.raises(DeviceLocked):
+            DeviceLock("SIM/0", timeout=0.2, directory=str(tmp_path)).acquire()
+        assert time.monotonic() - start >= 0.2
+        with pytest.raises(RuntimeError):
+            lock.acquire()
+    assert lock.fd is None
+    lock.release()
+
+    other = DeviceLock("SIM/0", directory=str(tmp_path))
+    with other:
+        with open(other.path) as f:
+            assert f.read() == f"{os.getpid()}\n"
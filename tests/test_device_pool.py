@@ -0,0 +1,56 @@
+import os
+import pytest
+import hid_transport
+from device_pool import DevicePool
+from transport_hidraw import HidrawDevice
+
+REPORT = b"\x01\x02\x03\x04"
+
+# hidraw devices backed by plain files: reads return the file's content,
+# which is all a handle closed underneath the pool needs
+class FileHidrawTransport:
+
+    name = "file-hidraw"
+    directory = None
+
+    def enumerate(self, vendor_id, product_id):
+        device = HidrawDevice("hidraw0", "arcin", "FILE0")
+        device.path = os.path.join(self.directory, "hidraw0")
+        return [device]
+
+@pytest.fixture
+def transport(tmp_path):
+    (tmp_path / "hidraw0").write_bytes(REPORT)
+    FileHidrawTransport.directory = str(tmp_path)
+    hid_transport.register_transport("file-hidraw", "test_device_pool:FileHidrawTransport")
+    yield hid_transport.get_transport("file-hidraw")
+    del hid_transport.TRANSPORTS["file-hidraw"]
+    hid_transport._transports.pop("file-hidraw", None)
+
+def read(device):
+    buffer = bytearray(64)
+    return bytes(buffer[:device.read_input_report(buffer, 1)])
+
+def test_closed_hidraw_handle_raises_oserror(transport):
+    device = transport.enumerate(0, 0)[0]
+    device.open()
+    device.close()
+    with pytest.raises(OSError):
+        device.get_feature_report(0xc0, 64)
+    with pytest.raises(OSError):
+        device.send_feature_report(b"\xb0\x20")
+    with pytest.raises(OSError):
+        read(device)
+
+def test_pool_reopens_a_handle_closed_underneath(transport):
+    pool = DevicePool(transport="file-hidraw", idle_timeout=0)
+    device = transport.enumerate(0, 0)[0]
+    assert pool.call(device, read) == REPORT
+    session = pool.sessions["FILE0"]
+    session.device.close()
+
+    assert pool.call(device, read) == REPORT
+    assert pool.sessions["FILE0"] is not session
+    with pytest.raises(OSError):
+        pool.call(device, lambda d: d.close() or read(d), retry=False)
+    pool.close_all()
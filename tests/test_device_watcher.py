@@ -0,0 +1,77 @@
+import threading
+from arcin_emulator import SimulatedTransport
+from device_watcher import DeviceWatcher
+
+def test_rescan_async_reports_changes(sim):
+    bus = sim(2)
+    added = []
+    removed = []
+    done = threading.Event()
+
+    def on_added(device):
+        added.append(device.serial_number)
+        if len(added) == 2:
+            done.set()
+
+    watcher = DeviceWatcher(on_added, removed.append)
+    watcher.rescan_async()
+    assert done.wait(5)
+    assert sorted(added) == ["SIM00000", "SIM00001"]
+
+    # a reboot is a removal followed by the same serial coming back
+    bus.find("SIM00000").reboot()
+    watcher.rescan()
+    assert removed == ["SIM00000"]
+
+def test_start_without_waiting_scans_on_the_watcher_thread(sim):
+    sim(2)
+    threads = []
+    done = threading.Event()
+
+    def on_added(device):
+        threads.append(threading.current_thread())
+        if len(threads) == 2:
+            done.set()
+
+    watcher = DeviceWatcher(on_added, poll_interval=60)
+    watcher.start(wait=False)
+    try:
+        assert done.wait(5)
+        assert threads == [watcher.thread] * 2
+        assert sorted(watcher.devices) == ["SIM00000", "SIM00001"]
+    finally:
+        watcher.stop()
+
+# hidraw reuses the node of a controller that comes back quickly
+class StablePathTransport(SimulatedTransport):
+
+    def enumerate(self, vendor_id, product_id):
+        devices = super().enumerate(vendor_id, product_id)
+        for device in devices:
+            device.path = f"/dev/hidraw-{device.serial_number}"
+        return devices
+
+def test_reboot_between_rescans_with_the_same_path(sim):
+    bus = sim(2)
+    added = []
+    removed = []
+    watcher = DeviceWatcher(lambda d: added.append(d.serial_number), removed.append)
+    watcher.transport = StablePathTransport(bus)
+    watcher.rescan()
+    assert sorted(added) == ["SIM00000", "SIM00001"]
+    before = watcher.get_device("SIM00000")
+
+    # nothing changed, nothing reported
+    watcher.rescan()
+    assert len(added) == 2
+
+    # back before the next rescan, so it's never seen gone
+    arcin = bus.find("SIM00000")
+    arcin.reboot_time = 0
+    arcin.reboot()
+    watcher.rescan()
+    assert added[2:] == ["SIM00000"]
+    assert removed == []
+    after = watcher.get_device("SIM00000")
+    assert after.path == before.path
+    assert after.enumeration_id != before.enumeration_id
@@ -0,0 +1,107 @@
+import pytest
+import gradient
+from gradient import PaletteCompiler, PaletteError, GradientStop
+from gradient import generate_c_header, parse_palette_css, parse_c_header, import_c_header
+
+EXACT = """.palette {
+    --palette-name: "Exact";
+    background: linear-gradient(90deg, rgba(255,0,0,1) 0%, rgba(0,0,255,1) 100%);
+}"""
+
+UNKNOWN = """/* gradient not known yet */
+.palette {
+    --palette-name: "Unknown";
+}"""
+
+def compile_css(tmp_path, *texts):
+    paths = []
+    for i, text in enumerate(texts):
+        path = tmp_path / f"{i:02}.css"
+        path.write_text(text)
+        paths.append(str(path))
+    return PaletteCompiler(cache_dir=str(tmp_path / "cache")).compile_files(paths)
+
+def test_unknown_palettes_stay_out_of_the_header(tmp_path):
+    palettes = compile_css(tmp_path, EXACT, UNKNOWN)
+    assert [p.name for p in palettes] == ["Exact", "Unknown"]
+    assert palettes[1].stops is None and palettes[1].lut is None
+    header = generate_c_header(palettes)
+    assert "//   1: Unknown" in header
+    gradients, table = parse_c_header(header)
+    assert list(gradients) == ["exact_gp"]
+    # the table would shift the firmware's palette indices
+    assert table is None
+
+    # cached results stay unknown
+    assert compile_css(tmp_path, EXACT, UNKNOWN)[1].lut is None
+
+def test_table_when_every_palette_is_known(tmp_path):
+    header = generate_c_header(compile_css(tmp_path, EXACT))
+    assert parse_c_header(header)[1] == ["exact_gp"]
+
+def test_unknown_palettes_have_no_lookup_table(tmp_path):
+    module = gradient.generate_python_module(compile_css(tmp_path, EXACT, UNKNOWN))
+    namespace = {}
+    exec(module, namespace)
+    assert namespace["RGB_TT_PALETTES"] == ["Exact", "Unknown"]
+    assert namespace["PALETTE_STOPS"][1] is None
+    assert len(namespace["PALETTE_LUTS"][0]) == gradient.LUT_SIZE * 3
+    assert namespace["PALETTE_LUTS"][1] is None
+
+FIRMWARE_HEADER = """
+// palettes as the firmware has them
+DEFINE_GRADIENT_PALETTE( exact_gp ) {
+    0, 255, 0, 0,
+    255, 0, 0, 255 };
+DEFINE_GRADIENT_PALETTE( green_gp ) {
+      0, 0x00, 0xff, 0x00,
+     15, 0x00, 0x80, 0x00,   /* odd positions survive the round trip */
+    254, 0x10, 0x10, 0x10,
+    255, 0x00, 0x00, 0x00 };
+const TProgmemRGBGradientPalettePtr tt_palettes[] = { exact_gp, green_gp, };
+"""
+
+def test_import_header_by_table_index(tmp_path):
+    compile_css(tmp_path, EXACT, UNKNOWN)
+    paths = [str(tmp_path / "00.css"), str(tmp_path / "01.css")]
+    updated, missing = import_c_header(FIRMWARE_HEADER, paths)
+    assert missing == []
+    for path, content in updated.items():
+        with open(path, "w") as f:
+            f.write(content)
+    palettes = PaletteCompiler(cache_dir=None).compile_files(paths)
+    assert [p.name for p in palettes] == ["Exact", "Unknown"]
+    assert palettes[1].stops == [
+        GradientStop(0, 0, 255, 0), GradientStop(15, 0, 128, 0),
+        GradientStop(254, 16, 16, 16), GradientStop(255, 0, 0, 0)]
+
+def test_import_header_by_name_keeps_the_rest(tmp_path):
+    compile_css(tmp_path, EXACT, UNKNOWN)
+    paths = [str(tmp_path / "00.css"), str(tmp_path / "01.css")]
+    header = FIRMWARE_HEADER[:FIRMWARE_HEADER.index("const")]
+    updated, missing = import_c_header(header, paths)
+    assert list(updated) == [paths[0]]
+    assert missing == ["Unknown"]
+
+def test_invalid_header():
+    with pytest.raises(PaletteError):
+        parse_c_header("DEFINE_GRADIENT_PALETTE( x_gp ) { 0, 1, 2, 3, 128, 1, 2, 3 };")
+
+def test_main_warns_about_unknown_palettes(tmp_path, capsys):
+    compile_css(tmp_path, EXACT, UNKNOWN)
+    paths = [str(tmp_path / "00.css"), str(tmp_path / "01.css")]
+    assert gradient.main(paths + ["--no-cache", "--c-out", str(tmp_path / "tt.h"),
+                                  "--py-out", str(tmp_path / "data.py")]) == 0
+    assert "Warning: no known gradient, left out of the header: Unknown" in capsys.readouterr().err
+    text = (tmp_path / "tt.h").read_text()
+    assert "No tt_palettes[] table is generated" in text
+    assert parse_c_header(text)[1] is None
+
+    header = tmp_path / "firmware.h"
+    header.write_text(FIRMWARE_HEADER)
+    assert gradient.main(paths + ["--no-cache", "--c-out", str(tmp_path / "tt.h"),
+                                  "--py-out", str(tmp_path / "data.py"),
+                                  "--import-header", str(header)]) == 0
+    err = capsys.readouterr().err
+    assert "Warning" not in err
+    assert "tt_palettes[]" in (tmp_path / "tt.h").read_text()
@@ -0,0 +1,69 @@
+import pytest
+from hid_metrics import BUCKET_BOUNDS, Metrics, OperationStats
+
+def test_percentiles():
+    stats = OperationStats()
+    for _ in range(90):
+        stats.add(0.001)
+    for _ in range(10):
+        stats.add(0.1)
+    # bucket upper bounds, but never above the longest sample
+    assert stats.percentile(50) == stats.percentile(90) == 0.0016
+    assert stats.percentile(99) == 0.1
+    summary = stats.summary()
+    assert summary["count"] == 100
+    assert summary["mean_ms"] == pytest.approx(10.9)
+    assert summary["max_ms"] == pytest.approx(100)
+
+    assert OperationStats().percentile(50) == 0.0
+    slow = OperationStats()
+    slow.add(BUCKET_BOUNDS[-1] * 2)
+    assert slow.percentile(50) == BUCKET_BOUNDS[-1] * 2
+
+def test_span_counts_errors():
+    metrics = Metrics()
+    with metrics.span("open"):
+        pass
+    with pytest.raises(OSError):
+        with metrics.span("open"):
+            raise OSError("gone")
+    with pytest.raises(TimeoutError):
+        with metrics.span("open"):
+            raise TimeoutError()
+
+    summary = metrics.to_dict()["operations"]["open"]
+    assert summary["count"] == 3
+    assert summary["errors"] == 2
+    assert summary["errors_by_type"] == {"OSError": 1, "TimeoutError": 1}
+
+def test_prometheus_output():
+    metrics = Metrics()
+    metrics.record("get_feature_report", 0.0003)
+    metrics.record("get_feature_report", 0.002, "OSError")
+    text = metrics.to_prometheus()
+    lines = text.splitlines()
+    assert "# TYPE arcin_hid_operation_seconds histogram" in lines
+    assert "# TYPE arcin_hid_operation_errors_total counter" in lines
+    label = 'operation="get_feature_report"'
+    assert f'arcin_hid_operation_seconds_bucket{{{label},le="0.0004"}} 1' in lines
+    assert f'arcin_hid_operation_seconds_bucket{{{label},le="0.0032"}} 2' in lines
+    assert f'arcin_hid_operation_seconds_bucket{{{label},le="+Inf"}} 2' in lines
+    assert f"arcin_hid_operation_seconds_sum{{{label}}} 0.002300" in lines
+    assert f"arcin_hid_operation_seconds_count{{{label}}} 2" in lines
+    assert f'arcin_hid_operation_errors_total{{{label},error="OSError"}} 1' in lines
+    assert text.endswith("\n")
+
+def test_prometheus_escapes_labels():
+    metrics = Metrics()
+    metrics.record('say "hi"\\\n', 0.001, "Bad\"Error")
+    text = metrics.to_prometheus()
+    assert 'operation="say \\"hi\\"\\\\\\n"' in text
+    assert 'error="Bad\\"Error"' in text
+    # one sample per line, whatever the label held
+    assert all(line.startswith(("#", "arcin_hid_")) for line in text.splitlines())
+
+def test_empty_registry():
+    metrics = Metrics()
+    assert metrics.to_dict()["operations"] == {}
+    lines = metrics.to_prometheus().splitlines()
+    assert lines and all(line.startswith("# ") for line in lines)
@@ -0,0 +1,27 @@
+import glob
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that need what only their platform has
+PLATFORM_MODULES = {
+    "main": "wx",
+    "transport_pywinusb": "pywinusb",
+}
+
+MODULES = sorted(
+    os.path.basename(path)[:-3] for path in glob.glob(os.path.join(ROOT, "*.py"))
+    if os.path.basename(path)[:-3] not in PLATFORM_MODULES)
+
+# every module imports in a fresh interpreter without pywinusb, so the
+# Windows backend stays optional everywhere else
+@pytest.mark.parametrize("module", MODULES)
+def test_imports_without_pywinusb(module):
+    code = ("import sys; sys.modules['pywinusb'] = None; sys.modules['pywinusb.hid'] = None; "
+            f"import {module}")
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
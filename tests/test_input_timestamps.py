@@ -0,0 +1,156 @@
+import importlib
+import random
+import sys
+import types
+import pytest
+from input_monitor import InputMonitor, IntervalStats, DROP_TAIL
+
+class FakeHidDevice:
+
+    product_name = "arcin"
+    serial_number = "WIN00000"
+    device_path = r"\\?\hid#vid_1ccf&pid_8048"
+
+    def __init__(self):
+        self.handlers_set = 0
+        self.handler = None
+
+    def set_raw_data_handler(self, handler):
+        self.handlers_set += 1
+        self.handler = handler
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def transport_pywinusb(monkeypatch):
+    # just enough of pywinusb to import the transport off Windows
+    hid = types.ModuleType("pywinusb.hid")
+    hid.HIDError = type("HIDError", (Exception,), {})
+    package = types.ModuleType("pywinusb")
+    package.hid = hid
+    monkeypatch.setitem(sys.modules, "pywinusb", package)
+    monkeypatch.setitem(sys.modules, "pywinusb.hid", hid)
+    monkeypatch.delitem(sys.modules, "transport_pywinusb", raising=False)
+    yield importlib.import_module("transport_pywinusb")
+    sys.modules.pop("transport_pywinusb", None)
+
+def test_pywinusb_reports_carry_arrival_time(transport_pywinusb):
+    hid_device = FakeHidDevice()
+    device = transport_pywinusb.PywinusbDevice(hid_device)
+    device.open()
+    hid_device.handler([1, 2, 0, 3, 4])
+    device.close()
+
+    # a report from the previous session is dropped on open
+    device.open()
+    hid_device.handler([1, 5, 0, 6, 7])
+    buffer = bytearray(64)
+    assert device.read_input_report(buffer, 0) == 5
+    assert buffer[:5] == bytes([1, 5, 0, 6, 7])
+    arrived = device.last_input_time
+    assert arrived is not None
+    assert device.read_input_report(buffer, 0) == 0
+    assert hid_device.handlers_set == 1
+
+    hid_device.handler([1, 0, 0, 0, 0])
+    assert device.read_input_report(buffer, 0) == 5
+    assert device.last_input_time > arrived
+
+def test_monitor_uses_arrival_time():
+    class QueuedDevice:
+        serial_number = "QUEUED"
+
+        def __init__(self):
+            self.reports = [(10.0, b"\x01\x00\x00\x00\x00"), (10.001, b"\x01\x00\x00\x00\x00")]
+            self.last_input_time = None
+
+        def open(self):
+            pass
+
+        def close(self):
+            pass
+
+        def read_input_report(self, buffer, timeout):
+            if not self.reports:
+                monitor.stop_event.set()
+                return 0
+            self.last_input_time, data = self.reports.pop(0)
+            buffer[:len(data)] = data
+            return len(data)
+
+    monitor = InputMonitor(QueuedDevice(), expected_interval=0.001)
+    monitor.start()
+    monitor.thread.join(5)
+    timestamps = monitor.ring.snapshot()[0]
+    assert list(timestamps) == [10.0, 10.001]
+    assert monitor.stats.dropped == 0
+
+def test_failed_open_keeps_its_error():
+    class UnpluggedDevice:
+        serial_number = "GONE"
+        closed = False
+
+        def open(self):
+            raise OSError("open failed")
+
+        def close(self):
+            # closing a handle that was never opened fails on some backends
+            self.closed = True
+            raise OSError("not open")
+
+    device = UnpluggedDevice()
+    monitor = InputMonitor(device)
+    monitor.start()
+    monitor.thread.join(5)
+    assert str(monitor.error) == "open failed"
+    assert not device.closed
+
+def read_times(count, interval, delay, drop=()):
+    # report k is sent at k * interval and read up to `delay` intervals later
+    rng = random.Random(1)
+    times = []
+    for k in range(count):
+        if k in drop:
+            continue
+        times.append(10.0 + (k + rng.uniform(0, delay)) * interval)
+    return times
+
+def interval_stats(times, expected_interval):
+    stats = IntervalStats(expected_interval)
+    for t in times:
+        stats.add(t)
+    return stats
+
+def test_read_jitter_is_not_counted_as_drops():
+    stats = interval_stats(read_times(3001, 0.001, 0.9), 0.001)
+    assert stats.summary()["reports"] == 3001
+    # late reads leave plenty of intervals past 1.5 ms
+    assert stats.longest > 0.0015
+    assert stats.dropped == 0
+
+def test_clock_off_the_nominal_rate_is_not_counted_as_drops():
+    # 999.6 Hz for 10 s is four reports short of 1000 Hz, but none is missing
+    assert interval_stats(read_times(10000, 0.0010004, 0.3), 0.001).dropped == 0
+    assert interval_stats(read_times(10000, 0.0009996, 0.3), 0.001).dropped == 0
+
+def test_gaps_are_counted_as_drops():
+    drop = {5, 400, 401, 402, 1500, 2980}
+    stats = interval_stats(read_times(3001, 0.001, 0.9, drop), 0.001)
+    assert stats.dropped == len(drop)
+    # a drop is told from a late read once DROP_TAIL more reports came in
+    stats.add(stats.last + 0.002)
+    assert stats.dropped == len(drop)
+    for i in range(DROP_TAIL):
+        stats.add(stats.last + 0.001)
+    assert stats.dropped == len(drop) + 1
+    # at 250 Hz a whole second missing
+    drop = set(range(100, 350))
+    assert interval_stats(read_times(1000, 0.004, 0.5, drop), 0.004).dropped == 250
+
+def test_no_drop_count_without_expected_interval():
+    stats = interval_stats([0.0, 0.001, 0.005], None)
+    assert stats.summary()["dropped"] is None
@@ -0,0 +1,45 @@
+import json
+import pytest
+import provision
+from arcin_config import conf_to_dict
+from arcin_emulator import DEFAULT_CONFIG
+
+@pytest.mark.parametrize("profile", [
+    {"label": 5},
+    dict(conf_to_dict(DEFAULT_CONFIG), keycodes=[300]),
+    dict(conf_to_dict(DEFAULT_CONFIG), flags="all"),
+    dict(conf_to_dict(DEFAULT_CONFIG), label="much too long for twelve bytes"),
+    [1, 2, 3],
+])
+def test_invalid_profile_touches_no_device(tmp_path, monkeypatch, capsys, profile):
+    path = tmp_path / "profile.json"
+    path.write_text(json.dumps(profile))
+    monkeypatch.setattr(provision, "get_devices", pytest.fail)
+    assert provision.main([str(path)]) == 1
+    assert capsys.readouterr().out.startswith(f"{path}: invalid profile: ")
+
+def test_unreadable_profile(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(provision, "get_devices", pytest.fail)
+    path = tmp_path / "missing.json"
+    assert provision.main([str(path)]) == 1
+    (tmp_path / "broken.json").write_text("{")
+    assert provision.main([str(tmp_path / "broken.json")]) == 1
+    out = capsys.readouterr().out
+    assert out.startswith(f"{path}: ")
+    assert "invalid profile" in out
+
+def test_valid_profile(tmp_path):
+    path = tmp_path / "profile.json"
+    path.write_text(json.dumps(conf_to_dict(DEFAULT_CONFIG)))
+    assert provision.load_profile(str(path)) == DEFAULT_CONFIG._replace(
+        keycodes=bytes(DEFAULT_CONFIG.keycodes))
+
+def test_corrupt_journal(tmp_path, sim, capsys):
+    bus = sim(1)
+    profile = tmp_path / "profile.json"
+    profile.write_text(json.dumps(conf_to_dict(DEFAULT_CONFIG)))
+    journal = tmp_path / "journal.jsonl"
+    journal.write_text("not json\n")
+    assert provision.main([str(profile), "--journal", str(journal)]) == 1
+    assert capsys.readouterr().out == f"{journal}:1: corrupt journal entry\n"
+    assert bus.find("SIM00000").writes == 0
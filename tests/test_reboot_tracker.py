@@ -0,0 +1,51 @@
+from arcin_device import get_devices, with_device, save_to_device
+from arcin_device import read_config_report, parse_device
+from device_watcher import DeviceWatcher
+from reboot_tracker import RebootTracker
+
+class StubWatcher:
+
+    def add_listener(self, on_added=None, on_removed=None):
+        self.on_added = on_added
+
+    def remove_listener(self, on_added=None, on_removed=None):
+        pass
+
+class BrokenDevice:
+
+    serial_number = "BROKEN"
+
+    # a transport error that isn't an OSError
+    def open(self):
+        raise RuntimeError("transport fell over")
+
+    def close(self):
+        pass
+
+def test_recovers_after_save(sim):
+    sim(2)
+    watcher = DeviceWatcher(poll_interval=0.02)
+    watcher.start()
+    tracker = RebootTracker(watcher)
+    try:
+        device = get_devices()[0]
+        conf = parse_device(with_device(device, read_config_report))._replace(label="tracked")
+        tracker.expect(device.serial_number)
+        ok, _ = save_to_device(device, conf)
+        assert ok
+        recovery = tracker.wait(device.serial_number, timeout=5, expected=conf)
+        assert recovery.ok
+        assert recovery.matches
+        assert recovery.ready >= recovery.enumerated
+    finally:
+        tracker.close()
+        watcher.stop()
+
+def test_readback_error_is_a_failed_recovery():
+    watcher = StubWatcher()
+    tracker = RebootTracker(watcher)
+    tracker.expect("BROKEN")
+    watcher.on_added(BrokenDevice())
+    recovery = tracker.wait("BROKEN", timeout=0.2)
+    assert not recovery.ok
+    assert "transport fell over" in recovery.error
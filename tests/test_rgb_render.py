@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from arcin_config import RGB_MODE_OPTIONS, RgbConfig, Rgb, idle_speed_value, tt_speed_value
+from arcin_config import ARCIN_RGB_NUM_LEDS_MAX, ARCIN_RGB_FLAG_FLIP_DIRECTION
+from palette_data import PALETTE_LUTS
+from rgb_render import RgbRenderer, PALETTE_MODES
+from rgb_render import RGB_MODE_BREATHE, RGB_MODE_TRICOLOR, RGB_MODE_RAINBOW_GLOW
+
+def rgb_config(mode, num_leds=12, idle_speed=120, darkness=0, flags=0, mode_options=3 << 5):
+    return RgbConfig(
+        flags, Rgb(200, 100, 50), darkness, Rgb(0, 255, 0), Rgb(0, 0, 255), mode,
+        num_leds, idle_speed, 0, 0, mode_options)
+
+@pytest.mark.parametrize("mode", range(len(RGB_MODE_OPTIONS)))
+@pytest.mark.parametrize("num_leds", [1, 12, ARCIN_RGB_NUM_LEDS_MAX])
+def test_every_mode_renders_a_frame(mode, num_leds):
+    renderer = RgbRenderer(rgb_config(mode, num_leds))
+    for t in (0.0, 0.016, 0.5, 3.7):
+        frame = renderer.render(t)
+        assert frame.shape == (num_leds, 3)
+        assert frame.dtype == np.uint8
+
+def test_num_leds_is_clamped():
+    for num_leds in (0, ARCIN_RGB_NUM_LEDS_MAX + 1, 255):
+        renderer = RgbRenderer(rgb_config(RGB_MODE_TRICOLOR, num_leds))
+        assert renderer.num_leds == ARCIN_RGB_NUM_LEDS_MAX
+        assert renderer.render(1.0).shape == (ARCIN_RGB_NUM_LEDS_MAX, 3)
+
+def test_darkness_scales_brightness():
+    # a breathe without idle speed is the primary color, steady
+    def level(darkness):
+        frame = RgbRenderer(rgb_config(RGB_MODE_BREATHE, idle_speed=0, darkness=darkness)).render(1.0)
+        assert (frame == frame[0]).all()
+        return tuple(int(c) for c in frame[0])
+
+    assert level(0) == (200, 100, 50)
+    assert level(255) == (0, 0, 0)
+    assert level(204) == (40, 20, 10)
+
+def test_idle_and_tt_speed_values():
+    assert idle_speed_value(120, "RPM") == 60
+    assert idle_speed_value(255, "BPM") == 255
+    assert idle_speed_value(51, "BPM") == pytest.approx(10.2)
+    assert idle_speed_value(7, "") == 7
+    assert tt_speed_value(-15) == -1.5
+    assert tt_speed_value(100) == 10
+
+    renderer = RgbRenderer(rgb_config(RGB_MODE_BREATHE, idle_speed=51))
+    assert renderer.speed == pytest.approx(10.2)
+    assert RgbRenderer(rgb_config(RGB_MODE_TRICOLOR, idle_speed=120)).speed == 60
+
+def test_breathe_follows_the_beat():
+    # 255 BPM: dark at the start of each beat, full in the middle
+    renderer = RgbRenderer(rgb_config(RGB_MODE_BREATHE, idle_speed=255))
+    beat = 60 / 255
+    assert renderer.render(0.0).max() == 0
+    assert tuple(renderer.render(beat / 2)[0]) == (200, 100, 50)
+    assert renderer.render(beat).max() <= 1
+
+def test_tricolor_turns_at_the_idle_speed():
+    # 60 RPM: a quarter turn after 0.25 s, the same frame after a full turn
+    renderer = RgbRenderer(rgb_config(RGB_MODE_TRICOLOR, num_leds=8, idle_speed=120))
+    start = renderer.render(0.0).copy()
+    assert (renderer.render(0.25) == np.roll(start, -2, axis=0)).all()
+    assert (renderer.render(1.0) == start).all()
+
+    flipped = RgbRenderer(rgb_config(
+        RGB_MODE_TRICOLOR, num_leds=8, flags=ARCIN_RGB_FLAG_FLIP_DIRECTION)).render(0.0)
+    assert (flipped == start[::-1]).all()
+
+def test_palette_without_a_gradient_has_no_preview():
+    unknown = [i for i, lut in enumerate(PALETTE_LUTS) if lut is None]
+    if not unknown:
+        pytest.skip("every palette has a gradient")
+    for mode in PALETTE_MODES:
+        renderer = RgbRenderer(rgb_config(mode, mode_options=(3 << 5) | unknown[0]))
+        assert not renderer.has_preview
+        assert renderer.render(1.0).max() == 0
+    renderer = RgbRenderer(rgb_config(RGB_MODE_TRICOLOR, mode_options=unknown[0]))
+    assert renderer.has_preview
+    assert RgbRenderer(rgb_config(RGB_MODE_RAINBOW_GLOW, mode_options=0)).has_preview
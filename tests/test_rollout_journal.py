@@ -0,0 +1,72 @@
+import time
+import pytest
+from arcin_device import get_devices
+from arcin_emulator import DEFAULT_CONFIG
+from provision import Provisioner
+from rollout_journal import RolloutJournal, config_hash, STATE_BEGIN, STATE_FAILED
+
+CONF = DEFAULT_CONFIG._replace(label="journal")
+DIGEST = config_hash(CONF)
+
+def test_replay_after_reopen(tmp_path):
+    path = str(tmp_path / "rollout.journal")
+    with RolloutJournal(path) as journal:
+        journal.begin("A", DIGEST)
+        journal.finish("A", DIGEST, True, "Saved")
+        journal.begin("B", DIGEST)
+        journal.finish("B", DIGEST, False, "Timeout")
+        journal.begin("C", DIGEST)
+
+    with RolloutJournal(path) as journal:
+        assert journal.is_done("A", DIGEST)
+        assert not journal.is_done("A", config_hash(DEFAULT_CONFIG))
+        assert journal.state("B", DIGEST) == STATE_FAILED
+        assert journal.state("C", DIGEST) == STATE_BEGIN
+        assert journal.interrupted() == [("C", DIGEST)]
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    path = tmp_path / "rollout.journal"
+    with RolloutJournal(str(path)) as journal:
+        journal.begin("A", DIGEST)
+        journal.finish("A", DIGEST, True)
+    with open(path, "ab") as f:
+        f.write(b'{"serial": "B", "con')
+
+    with RolloutJournal(str(path)) as journal:
+        assert journal.is_done("A", DIGEST)
+        assert journal.state("B", DIGEST) is None
+        journal.begin("B", DIGEST)
+    with RolloutJournal(str(path)) as journal:
+        assert journal.interrupted() == [("B", DIGEST)]
+
+def test_corrupt_entry_is_an_error(tmp_path):
+    path = tmp_path / "rollout.journal"
+    path.write_bytes(b"not json\n")
+    with pytest.raises(ValueError):
+        RolloutJournal(str(path))
+
+def test_rerun_skips_finished_devices(sim, tmp_path):
+    bus = sim(3)
+    path = str(tmp_path / "rollout.journal")
+    devices = get_devices()
+    with RolloutJournal(path) as journal:
+        # the first run dies after one device
+        provisioner = Provisioner(CONF, journal=journal)
+        _, ok, _, _ = provisioner.provision_device(devices[0])
+        assert ok
+
+    # the first device is still rebooting
+    deadline = time.monotonic() + 5
+    devices = get_devices()
+    while len(devices) < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+        devices = get_devices()
+    writes = {d.serial_number: bus.find(d.serial_number).writes for d in devices}
+    with RolloutJournal(path) as journal:
+        results, _ = Provisioner(CONF, journal=journal).run(devices, 2)
+    messages = {device.serial_number: message for device, _, message, _ in results}
+    assert all(ok for _, ok, _, _ in results)
+    assert messages[devices[0].serial_number] == "Done in a previous run"
+    assert bus.find(devices[0].serial_number).writes == writes[devices[0].serial_number]
+    for device in devices[1:]:
+        assert bus.find(device.serial_number).writes == writes[device.serial_number] + 1
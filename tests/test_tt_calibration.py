@@ -0,0 +1,65 @@
+import numpy as np
+import tt_calibration
+from arcin_config import unpack_config
+from tt_calibration import unwrap_axis, encoder_deltas, simulate_options, rank_options
+
+def test_unwrap_axis_wraps_around():
+    assert list(unwrap_axis([250, 254, 2, 6])) == [4, 4, 4]
+    assert list(unwrap_axis([6, 2, 254, 250])) == [-4, -4, -4]
+    # half a turn or more is read as the other direction
+    assert list(unwrap_axis([0, 127, 0, 128])) == [127, -127, -128]
+
+def test_encoder_deltas_undo_the_recorded_sens():
+    axis = [0, 4, 8]
+    assert list(encoder_deltas(axis, 0)) == [4, 4]
+    assert list(encoder_deltas(axis, -2)) == [8, 8]
+    assert list(encoder_deltas(axis, 2)) == [2, 2]
+
+def test_simulate_and_rank_options():
+    options = {"1:4": -4, "1:1": 0, "4:1": 4}
+    # 2 revolutions of 512 counts, 8 counts per report
+    deltas = np.full(128, 8)
+    results = {r[0]: r for r in simulate_options(deltas, 2, options)}
+    assert results["1:1"] == ("1:1", 0, 512.0, 0)
+    assert results["1:4"] == ("1:4", -4, 128.0, 0)
+    # 32 counts per report still fits the 8-bit axis
+    assert results["4:1"] == ("4:1", 4, 2048.0, 0)
+
+    ranked = rank_options(list(results.values()), 256)
+    assert [r[0] for r in ranked] == ["1:4", "1:1", "4:1"]
+
+def test_rank_puts_aliasing_options_last():
+    options = {"1:1": 0, "8:1": 8}
+    # 8:1 moves 160 counts per report, more than the axis can carry
+    deltas = np.full(64, 20)
+    results = simulate_options(deltas, 1, options)
+    assert dict((r[0], r[3]) for r in results) == {"1:1": 0, "8:1": 64}
+    assert rank_options(results, 10000)[0][0] == "1:1"
+
+def spin(t):
+    return (0, int(t * 2000) & 0xff, 0)
+
+def test_aborts_without_movement(sim):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    assert tt_calibration.main(
+        ["--revolutions", "1", "--seconds", "0.3", "--apply"]) == 1
+    assert arcin.writes == 0
+
+def test_aborts_without_reports(sim, monkeypatch):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    arcin.input_state = spin
+    monkeypatch.setattr(tt_calibration, "MIN_REPORTS", 100000)
+    assert tt_calibration.main(
+        ["--revolutions", "1", "--seconds", "0.3", "--apply"]) == 1
+    assert arcin.writes == 0
+
+def test_apply(sim):
+    bus = sim(1)
+    arcin = bus.find("SIM00000")
+    arcin.input_state = spin
+    assert tt_calibration.main(
+        ["--revolutions", "1", "--seconds", "0.3", "--apply"]) == 0
+    assert arcin.writes == 1
+    assert unpack_config(arcin.config).qe1_sens != 0
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from arcin_emulator import DEFAULT_CONFIG
+from provision import Provisioner
+from usb_topology import TopologyScheduler, group_devices, parse_usb_location, hub_name
+
+def fake_device(serial_number, usb_location):
+    return SimpleNamespace(serial_number=serial_number, usb_location=usb_location)
+
+def test_group_devices_by_bus_and_hub():
+    devices = [
+        fake_device("a", "1-1.1"), fake_device("b", "2-3"), fake_device("c", "1-1.2"),
+        fake_device("d", None)]
+    lanes = group_devices(devices)
+    assert list(lanes) == ["usb1", "usb2", "unknown"]
+    assert [d.serial_number for d in lanes["usb1"]["1-1"]] == ["a", "c"]
+    assert list(lanes["usb2"]) == ["usb2"]
+    assert hub_name(parse_usb_location("1-2.3.4")) == "1-2.3"
+
+def test_scheduler_reports_exceptions_as_failures():
+    devices = [fake_device(s, f"1-1.{i + 1}") for i, s in enumerate("abc")]
+
+    def func(device):
+        if device.serial_number == "b":
+            raise OSError("broken")
+        return True
+
+    seen = []
+    results, lanes = TopologyScheduler(per_hub=2).run(
+        devices, func, on_result=lambda d, r: seen.append(d.serial_number))
+    assert [d.serial_number for d, _ in results] == ["a", "b", "c"]
+    assert isinstance(results[1][1], OSError)
+    assert sorted(seen) == ["a", "b", "c"]
+    assert (lanes[0].devices, lanes[0].ok, lanes[0].failed) == (3, 2, 1)
+
+class RaisingProvisioner(Provisioner):
+
+    def provision_device(self, device):
+        if device.serial_number == "b":
+            raise OSError("fsync failed")
+        return (device, True, "Success", 0.0)
+
+def check_failed_results(results, capsys):
+    assert [(d.serial_number, ok) for d, ok, _, _ in results] == [
+        ("a", True), ("b", False), ("c", True)]
+    assert "fsync failed" in results[1][2]
+    output = capsys.readouterr().out
+    assert "b\t" in output and "FAIL" in output
+
+def test_run_by_topology_maps_exceptions_to_failed_results(capsys):
+    devices = [fake_device(s, f"1-1.{i + 1}") for i, s in enumerate("abc")]
+    results, total, lanes = RaisingProvisioner(DEFAULT_CONFIG).run_by_topology(
+        devices, TopologyScheduler(per_hub=1))
+    check_failed_results(results, capsys)
+    assert lanes[0].failed == 1
+
+    # run() must not let the exception escape and drop the other results
+    results, total = RaisingProvisioner(DEFAULT_CONFIG).run(devices, jobs=2)
+    check_failed_results(results, capsys)
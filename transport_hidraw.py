@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# Linux HID transport talking to /dev/hidraw* directly with the
+# HIDIOCGFEATURE / HIDIOCSFEATURE ioctls (see linux/hidraw.h).
+
+import fcntl
+import os
+import re
+import select
+
+SYSFS_HIDRAW = "/sys/class/hidraw"
+
+# sysfs name of a USB device: bus-port[.port...], e.g. "1-2.3"
+USB_DEVICE_NAME = re.compile(r"^\d+-\d+(\.\d+)*$")
+
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+def _ioc(direction, type_, nr, size):
+    return (direction << 30) | (size << 16) | (ord(type_) << 8) | nr
+
+def HIDIOCSFEATURE(size):
+    return _ioc(_IOC_WRITE | _IOC_READ, 'H', 0x06, size)
+
+def HIDIOCGFEATURE(size):
+    return _ioc(_IOC_WRITE | _IOC_READ, 'H', 0x07, size)
+
+def read_uevent(path):
+    values = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                key, _, value = line.rstrip("\n").partition("=")
+                values[key] = value
+    except OSError:
+        pass
+    return values
+
+# .../usb1/1-2/1-2.3/1-2.3:1.0/0003:1CCF:8048.0001 => .../usb1/1-2/1-2.3
+def usb_device_dir(node):
+    path = os.path.realpath(os.path.join(SYSFS_HIDRAW, node, "device"))
+    while path != os.sep:
+        if USB_DEVICE_NAME.match(os.path.basename(path)):
+            return path
+        path = os.path.dirname(path)
+    return None
+
+# the kernel gives a device a new number every time it enumerates, so
+# "busnum:devnum" changes across a reboot even when the hidraw node doesn't
+def enumeration_id(usb_dir):
+    try:
+        with open(os.path.join(usb_dir, "busnum")) as f:
+            busnum = f.read().strip()
+        with open(os.path.join(usb_dir, "devnum")) as f:
+            devnum = f.read().strip()
+    except (OSError, TypeError):
+        return None
+    return f"{busnum}:{devnum}"
+
+class HidrawDevice:
+
+    def __init__(self, node, product_name, serial_number, usb_location=None,
+                 enumeration_id=None):
+        self.path = os.path.join("/dev", node)
+        self.node = node
+        self.product_name = product_name
+        self.serial_number = serial_number
+        self.usb_location = usb_location
+        self.enumeration_id = enumeration_id
+        self.fd = None
+        self.poller = None
+
+    def open(self):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR)
+            self.poller = select.poll()
+            self.poller.register(self.fd, select.POLLIN)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.poller = None
+
+    # a handle closed underneath the caller (e.g. by DevicePool) must fail
+    # like any other transfer, not with a TypeError from the fd being None
+    def __fd__(self):
+        fd = self.fd
+        if fd is None:
+            raise IOError(f"{self.path}: device not open")
+        return fd
+
+    def get_feature_report(self, report_id, size):
+        buf = bytearray(size)
+        buf[0] = report_id
+        length = fcntl.ioctl(self.__fd__(), HIDIOCGFEATURE(size), buf, True)
+        return bytes(buf[0:length])
+
+    def send_feature_report(self, data):
+        buf = bytearray(data)
+        fcntl.ioctl(self.__fd__(), HIDIOCSFEATURE(len(buf)), buf, True)
+
+    def read_input_report(self, buffer, timeout):
+        fd = self.__fd__()
+        poller = self.poller
+        if poller is None:
+            raise IOError(f"{self.path}: device not open")
+        if not poller.poll(timeout * 1000):
+            return 0
+        # hidraw hands out one report per read; readv fills the caller's buffer
+        return os.readv(fd, [buffer])
+
+class HidrawTransport:
+
+    name = "hidraw"
+
+    def enumerate(self, vendor_id, product_id):
+        devices = []
+        try:
+            nodes = sorted(os.listdir(SYSFS_HIDRAW))
+        except OSError:
+            return devices
+
+        for node in nodes:
+            # HID_ID=0003:00001CCF:00008048 (bus:vendor:product)
+            uevent = read_uevent(os.path.join(SYSFS_HIDRAW, node, "device", "uevent"))
+            try:
+                _, vid, pid = uevent["HID_ID"].split(":")
+            except (KeyError, ValueError):
+                continue
+            if int(vid, 16) != vendor_id or int(pid, 16) != product_id:
+                continue
+            usb_dir = usb_device_dir(node)
+            devices.append(HidrawDevice(
+                node, uevent.get("HID_NAME", ""), uevent.get("HID_UNIQ", ""),
+                os.path.basename(usb_dir) if usb_dir else None,
+                enumeration_id(usb_dir)))
+        return devices
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+# Windows HID transport on top of pywinusb.
+#
+# pywinusb reports failures as HIDError, which is not an OSError, and some
+# calls just return False; both are turned into IOError here so callers (the
+# device pool, the reboot tracker) only need to handle one error type on every
+# transport.
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import pywinusb.hid as hid
+from hid_metrics import span
+
+# input reports kept while nobody is reading
+INPUT_QUEUE_SIZE = 4096
+
+@contextmanager
+def _hid_errors(operation):
+    try:
+        yield
+    except hid.HIDError as e:
+        raise IOError(f"{operation} failed: {e}") from e
+
+class PywinusbDevice:
+
+    def __init__(self, device):
+        self.device = device
+        self.product_name = device.product_name
+        self.serial_number = device.serial_number
+        self.path = device.device_path
+        # the HID device path carries no port information, nor anything that
+        # changes when the controller re-enumerates
+        self.usb_location = None
+        self.enumeration_id = None
+        # report_id => HidReport, discovered once per open handle
+        self.feature_reports = None
+        # pywinusb pushes input reports from its own thread; each is queued
+        # as (arrival time, data), stamped there rather than when read
+        self.input_reports = deque(maxlen=INPUT_QUEUE_SIZE)
+        self.input_event = threading.Event()
+        self.last_input_time = None
+        self.device.set_raw_data_handler(self.__on_input_report__)
+
+    def open(self):
+        # reports left over from a previous session are stale
+        self.input_reports.clear()
+        self.last_input_time = None
+        with _hid_errors("open"):
+            self.device.open()
+
+    def close(self):
+        self.feature_reports = None
+        with _hid_errors("close"):
+            self.device.close()
+
+    def __on_input_report__(self, data):
+        self.input_reports.append((time.perf_counter(), data))
+        self.input_event.set()
+
+    def get_feature_report(self, report_id, size):
+        if self.feature_reports is None:
+            with span("find_feature_reports"), _hid_errors("find_feature_reports"):
+                self.feature_reports = {
+                    report.report_id: report
+                    for report in self.device.find_feature_reports()}
+        if report_id not in self.feature_reports:
+            raise IOError(f"Feature report 0x{report_id:02x} not found")
+        report = self.feature_reports[report_id]
+        with span("report_get"), _hid_errors("get_feature_report"):
+            report.get()
+            return bytes(report.get_raw_data()[0:size])
+
+    def send_feature_report(self, data):
+        with _hid_errors("send_feature_report"):
+            if not self.device.send_feature_report(list(data)):
+                raise IOError("send_feature_report failed")
+
+    def read_input_report(self, buffer, timeout):
+        if not self.input_reports:
+            self.input_event.clear()
+            if not self.input_reports and not self.input_event.wait(timeout):
+                return 0
+        self.last_input_time, data = self.input_reports.popleft()
+        length = min(len(data), len(buffer))
+        buffer[0:length] = bytes(data[0:length])
+        return length
+
+class PywinusbTransport:
+
+    name = "pywinusb"
+
+    def enumerate(self, vendor_id, product_id):
+        hid_filter = hid.HidDeviceFilter(vendor_id=vendor_id, product_id=product_id)
+        with _hid_errors("enumerate"):
+            return [PywinusbDevice(d) for d in hid_filter.get_devices()]
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+# Turntable (QE1) sensitivity calibration.
+#
+# Record the encoder while the player does a known number of full reference
+# spins, then replay the recording through every SENS_OPTIONS ratio the way
+# the firmware applies it: the running encoder count is divided (1:n) or
+# multiplied (n:1) and reported as an 8-bit axis, which the host unwraps
+# again from one report to the next. Fast spins at high multipliers move the
+# axis by half a turn or more between reports; the host then can't tell the
+# direction anymore, which shows up here as aliased reports.
+#
+# Options are ranked by how close their counts per revolution come to the
+# target, with aliasing options last. Record at 1:1 for full resolution.
+#
+#   python tt_calibration.py --revolutions 5 --target 256 --apply
+
+import argparse
+import sys
+import time
+import numpy as np
+from arcin_config import SENS_OPTIONS
+from arcin_device import get_devices, load_from_device
+from device_lock import save_locked
+from input_monitor import InputMonitor
+
+DEFAULT_TARGET = 256
+
+# an 8-bit axis can only carry deltas in [-128, 127] between two reports
+AXIS_RANGE = 256
+
+# fewer reports than this means the device stopped reporting early
+MIN_REPORTS = 100
+
+def unwrap_axis(axis):
+    axis = np.asarray(axis, dtype=np.int64)
+    return ((np.diff(axis, axis=-1) + AXIS_RANGE // 2) % AXIS_RANGE) - AXIS_RANGE // 2
+
+# Raw encoder deltas from axis values recorded with the given qe1_sens.
+# Anything but 1:1 loses resolution (1:n) or has to be scaled back (n:1).
+def encoder_deltas(axis, recorded_sens=0):
+    deltas = unwrap_axis(axis)
+    if recorded_sens < 0:
+        return deltas * -recorded_sens
+    if recorded_sens > 0:
+        return deltas // recorded_sens
+    return deltas
+
+# For every option: (name, sens, counts per revolution, aliased reports), all
+# options computed together over a (options x reports) array.
+def simulate_options(deltas, revolutions, options=SENS_OPTIONS):
+    names = list(options.keys())
+    sens = np.array(list(options.values()), dtype=np.int64)[:, None]
+
+    count = np.concatenate(([0], np.cumsum(deltas, dtype=np.int64)))[None, :]
+    divided = np.floor_divide(count, np.where(sens < 0, -sens, 1))
+    multiplied = count * np.where(sens > 0, sens, 1)
+    reported = np.where(sens < 0, divided, multiplied) % AXIS_RANGE
+
+    true_deltas = np.diff(np.where(sens < 0, divided, multiplied), axis=-1)
+    seen_deltas = unwrap_axis(reported)
+    aliased = (true_deltas != seen_deltas).sum(axis=-1)
+    per_revolution = np.abs(seen_deltas.sum(axis=-1)) / revolutions
+
+    return [
+        (names[i], int(sens[i, 0]), float(per_revolution[i]), int(aliased[i]))
+        for i in range(len(names))]
+
+def rank_options(results, target):
+    return sorted(results, key=lambda r: (r[3] > 0, abs(r[2] - target)))
+
+class SpinRecorder:
+
+    def __init__(self):
+        self.chunks = []
+        self.current = []
+
+    # InputMonitor handler
+    def add_report(self, timestamp, buttons, axis_x, axis_y):
+        self.current.append(axis_x)
+        if len(self.current) >= 4096:
+            self.chunks.append(np.array(self.current, dtype=np.uint8))
+            self.current = []
+
+    def axis(self):
+        return np.concatenate(self.chunks + [np.array(self.current, dtype=np.uint8)])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Pick qe1_sens from recorded reference turntable spins.")
+    parser.add_argument("--serial", default=None, help="device to record (default: first)")
+    parser.add_argument("--transport", default=None)
+    parser.add_argument("--revolutions", type=float, required=True,
+        help="number of full turntable revolutions in the recording")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET,
+        help=f"wanted axis counts per revolution (default {DEFAULT_TARGET})")
+    parser.add_argument("--seconds", type=float, default=10.0,
+        help="recording length")
+    parser.add_argument("--apply", action="store_true",
+        help="write the best option into the device config")
+    args = parser.parse_args(argv)
+
+    devices = get_devices(transport=args.transport)
+    if args.serial:
+        devices = [d for d in devices if d.serial_number == args.serial]
+    if len(devices) == 0:
+        print("No devices found.")
+        return 1
+    device = devices[0]
+
+    conf = load_from_device(device)
+    if conf is None:
+        print("Failed to read config from device.")
+        return 1
+    if conf.qe1_sens != 0:
+        print("Note: recording at a sensitivity other than 1:1 reduces accuracy.")
+
+    recorder = SpinRecorder()
+    monitor = InputMonitor(device, capacity=1)
+    monitor.handlers.append(recorder.add_report)
+    monitor.start()
+    print(f"Recording for {args.seconds:.0f} s: spin the turntable "
+          f"{args.revolutions:g} full revolution(s) in one direction.")
+    try:
+        time.sleep(args.seconds)
+    except KeyboardInterrupt:
+        pass
+    monitor.stop()
+    if monitor.error is not None:
+        print(f"Recording stopped: {monitor.error}")
+        return 1
+
+    axis = recorder.axis()
+    if len(axis) < MIN_REPORTS:
+        print(f"Recording failed: only {len(axis)} report(s) received.")
+        return 1
+    deltas = encoder_deltas(axis, conf.qe1_sens)
+    if np.abs(deltas).sum() == 0:
+        print("Recording failed: the turntable didn't move.")
+        return 1
+    ranked = rank_options(simulate_options(deltas, args.revolutions), args.target)
+
+    print(f"{'option':>6} {'counts/rev':>10} {'aliased':>8}")
+    for name, _, per_revolution, aliased in ranked:
+        print(f"{name:>6} {per_revolution:>10.1f} {aliased:>8}")
+
+    best_name, best_sens, _, best_aliased = ranked[0]
+    print(f"Recommendation: {best_name}")
+    if best_aliased:
+        print("Warning: every option aliases at this spin speed.")
+
+    if args.apply:
+        result, message = save_locked(device, conf._replace(qe1_sens=best_sens))
+        print(message)
+        return 0 if result else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
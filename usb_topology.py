@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Batch scheduling by USB topology.
+#
+# Controllers behind one hub share its bandwidth, and a hub only passes so
+# many transfers at once, while controllers on another bus (root hub) are
+# independent of them. The scheduler groups devices by their usb_location
+# (see hid_transport.py) into one lane per bus and, within a lane, one queue
+# per hub served by at most per_hub workers, optionally capped at per_bus
+# transfers in flight on the whole bus. Devices whose location is unknown
+# (pywinusb) share a lane of their own with `fallback_jobs` workers.
+#
+#   scheduler = TopologyScheduler(per_hub=2)
+#   results, lanes = scheduler.run(devices, provision_device)
+#   print(format_lanes(lanes))
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PER_HUB = 2
+DEFAULT_FALLBACK_JOBS = 4
+
+UNKNOWN_LANE = "unknown"
+
+# "1-2.3" => UsbLocation(1, (2, 3))
+UsbLocation = namedtuple("UsbLocation", "bus ports")
+
+# throughput of one lane (bus) or hub; elapsed is from the first operation
+# starting to the last one finishing
+LaneStats = namedtuple("LaneStats", "name devices ok failed elapsed hubs")
+
+def parse_usb_location(location):
+    try:
+        bus, ports = location.split("-", 1)
+        return UsbLocation(int(bus), tuple(int(p) for p in ports.split(".")))
+    except (AttributeError, ValueError):
+        return None
+
+def lane_name(location):
+    if location is None:
+        return UNKNOWN_LANE
+    return f"usb{location.bus}"
+
+# the hub a device hangs off, named like its sysfs directory ("usb1" for the
+# root hub)
+def hub_name(location):
+    if location is None:
+        return UNKNOWN_LANE
+    if len(location.ports) == 1:
+        return f"usb{location.bus}"
+    return f"{location.bus}-" + ".".join(str(p) for p in location.ports[:-1])
+
+def device_location(device):
+    return parse_usb_location(getattr(device, "usb_location", None))
+
+# {lane: {hub: [devices]}}, hubs and lanes in order of first appearance
+def group_devices(devices):
+    lanes = {}
+    for device in devices:
+        location = device_location(device)
+        hubs = lanes.setdefault(lane_name(location), {})
+        hubs.setdefault(hub_name(location), []).append(device)
+    return lanes
+
+class LaneCounter:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.devices = 0
+        self.ok = 0
+        self.failed = 0
+        self.started = None
+        self.finished = None
+
+    def add(self, started, finished, ok):
+        with self.lock:
+            self.devices += 1
+            if ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+            if self.started is None or started < self.started:
+                self.started = started
+            if self.finished is None or finished > self.finished:
+                self.finished = finished
+
+    def stats(self, name, hubs=()):
+        elapsed = 0.0 if self.started is None else self.finished - self.started
+        return LaneStats(name, self.devices, self.ok, self.failed, elapsed, list(hubs))
+
+class TopologyScheduler:
+
+    # per_bus: transfers in flight per bus, None for no limit beyond per_hub
+    def __init__(self, per_hub=DEFAULT_PER_HUB, per_bus=None,
+                 fallback_jobs=DEFAULT_FALLBACK_JOBS):
+        self.per_hub = max(1, per_hub)
+        self.per_bus = per_bus
+        self.fallback_jobs = max(1, fallback_jobs)
+
+    def plan(self, devices):
+        return group_devices(devices)
+
+    # func(device) => result; is_ok(result) decides what counts as a failure
+    # in the lane stats, exceptions always do. on_result(device, result) is
+    # called from the worker threads as devices finish.
+    # Returns ([(device, result or exception)] in the order of devices, [LaneStats]).
+    def run(self, devices, func, is_ok=bool, on_result=None):
+        lanes = self.plan(devices)
+        results = {}
+        counters = {}
+        executors = []
+
+        def work(device, semaphore, lane_counter, hub_counter):
+            if semaphore is not None:
+                semaphore.acquire()
+            started = time.perf_counter()
+            try:
+                result = func(device)
+                ok = is_ok(result)
+            except Exception as e:
+                result = e
+                ok = False
+            finally:
+                finished = time.perf_counter()
+                if semaphore is not None:
+                    semaphore.release()
+            lane_counter.add(started, finished, ok)
+            hub_counter.add(started, finished, ok)
+            results[id(device)] = result
+            if on_result is not None:
+                on_result(device, result)
+
+        try:
+            for lane, hubs in lanes.items():
+                lane_counter = LaneCounter()
+                counters[lane] = (lane_counter, {})
+                semaphore = None
+                if self.per_bus is not None and lane != UNKNOWN_LANE:
+                    semaphore = threading.Semaphore(max(1, self.per_bus))
+                for hub, hub_devices in hubs.items():
+                    hub_counter = counters[lane][1][hub] = LaneCounter()
+                    workers = self.fallback_jobs if lane == UNKNOWN_LANE else self.per_hub
+                    executor = ThreadPoolExecutor(
+                        min(workers, len(hub_devices)), thread_name_prefix=f"lane-{hub}")
+                    executors.append(executor)
+                    for device in hub_devices:
+                        executor.submit(work, device, semaphore, lane_counter, hub_counter)
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
+
+        lane_stats = [
+            lane_counter.stats(lane, (c.stats(hub) for hub, c in hub_counters.items()))
+            for lane, (lane_counter, hub_counters) in counters.items()]
+        return ([(d, results[id(d)]) for d in devices], lane_stats)
+
+def format_lanes(lanes):
+    lines = [f"{'lane':<12} {'devices':>7} {'ok':>5} {'failed':>6} {'seconds':>8} {'dev/s':>7}"]
+
+    def line(stats, indent):
+        rate = stats.devices / stats.elapsed if stats.elapsed > 0 else 0.0
+        return (f"{indent + stats.name:<12} {stats.devices:>7} {stats.ok:>5} "
+                f"{stats.failed:>6} {stats.elapsed:>8.2f} {rate:>7.1f}")
+
+    for lane in lanes:
+        lines.append(line(lane, ""))
+        if len(lane.hubs) > 1:
+            for hub in lane.hubs:
+                lines.append(line(hub, "  "))
+    return "\n".join(lines)